@@ -1,15 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 from pydantic import ValidationError
 
+from core.utils import canonical_hash
+
 
 logger = logging.getLogger(__name__)
 
 class BaseAgent(ABC):
     """Base class for all agents"""
     
+    # Workflow fields the agent reads; declaring them makes its results cacheable
+    cache_fields: Tuple[str, ...] = ()
+    # Optional quantization steps for continuous cache fields
+    cache_quantize: Dict[str, float] = {}
+    # Results depend on the component catalog, so cache keys carry its version
+    uses_catalog: bool = False
+    # With uses_catalog: results also depend on the catalog's rating
+    # columns, so cache keys carry its ratings version too
+    uses_ratings: bool = False
+    
     def __init__(self, name: str):
         self.name = name
         self.logger = logging.getLogger(f"agent.{name}")
@@ -23,4 +35,34 @@ class BaseAgent(ABC):
         """Validate required input fields"""
         missing_fields = [field for field in required_fields if field not in input_data]
         if missing_fields:
-            raise ValidationError(f"{self.name}: Missing required fields: {missing_fields}")
\ No newline at end of file
+            raise ValidationError(f"{self.name}: Missing required fields: {missing_fields}")
+    
+    def cache_inputs(self, input_data: Dict[str, Any], quantize: bool = False) -> Dict[str, Any]:
+        """Extract the declared cache fields, optionally quantized"""
+        values = {field: input_data.get(field) for field in self.cache_fields}
+        if quantize:
+            values.update(self.quantized_inputs(input_data))
+        return values
+    
+    def quantized_inputs(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Snap continuous cache fields to their quantization grid"""
+        quantized = {}
+        for field, step in self.cache_quantize.items():
+            value = input_data.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and step > 0:
+                quantized[field] = round(round(value / step) * step, 6)
+        return quantized
+    
+    def cache_key(self, input_data: Dict[str, Any], quantize: bool = False) -> Optional[str]:
+        """Digest of the inputs this agent reads, or None if it is not cacheable"""
+        if not self.cache_fields:
+            return None
+        
+        values = self.cache_inputs(input_data, quantize)
+        if self.uses_catalog:
+            from core.catalog import get_catalog
+            catalog = get_catalog()
+            values['catalog_version'] = catalog.version
+            if self.uses_ratings:
+                values['ratings_version'] = catalog.ratings_version
+        return canonical_hash(values)
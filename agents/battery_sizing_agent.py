@@ -7,6 +7,10 @@ import math
 class BatterySizingAgent(BaseAgent):
     """Sizes battery system requirements"""
     
+    cache_fields = ('daily_consumption_kwh', 'backup_hours', 'system_voltage')
+    cache_quantize = {'daily_consumption_kwh': 0.1, 'backup_hours': 1}
+    uses_catalog = True
+    
     def __init__(self):
         super().__init__("BatterySizing")
     
@@ -20,7 +24,7 @@ class BatterySizingAgent(BaseAgent):
             
             # Calculate battery requirements
             required_capacity_ah = SolarCalculations.calculate_battery_requirements(
-                daily_consumption, backup_hours/24, system_voltage=system_voltage
+                daily_consumption, backup_hours/24, battery_voltage=system_voltage
             )
             
             # Load available batteries
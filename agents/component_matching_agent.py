@@ -1,10 +1,33 @@
 from .base_agent import BaseAgent
 from typing import Any, Dict
+import numpy as np
+from config.settings import settings
+from core.calculations import SolarCalculations
 from core.utils import load_component_data
 
+# Highest feedback rating; scores are scaled to 0-1 against it
+MAX_RATING = 5
+
+# Start-up surge an inverter carries for a few seconds, as a multiple of its
+# continuous rating
+INVERTER_SURGE_RATIO = 2.0
+
+def required_inverter_watts(peak_load_watts, surge_peak_watts=0.0):
+    """
+    Continuous inverter rating needed: the running peak with a 25% margin,
+    and enough surge headroom for the largest start; broadcasts over arrays
+    """
+    return np.maximum(SolarCalculations.calculate_inverter_requirements(peak_load_watts),
+                      np.divide(surge_peak_watts, INVERTER_SURGE_RATIO))
+
 class ComponentMatchingAgent(BaseAgent):
     """Matches compatible system components"""
     
+    cache_fields = ('recommended_panels', 'recommended_batteries', 'peak_load_watts', 'surge_peak_watts')
+    cache_quantize = {'peak_load_watts': 50, 'surge_peak_watts': 50}
+    uses_catalog = True
+    uses_ratings = True
+    
     def __init__(self):
         super().__init__("ComponentMatching")
     
@@ -14,7 +37,8 @@ class ComponentMatchingAgent(BaseAgent):
             # Get component recommendations
             panels = input_data.get('recommended_panels', [])
             batteries = input_data.get('recommended_batteries', [])
-            peak_load = input_data.get('peak_load_watts', 0)
+            required_inverter = float(required_inverter_watts(input_data.get('peak_load_watts', 0),
+                                                              input_data.get('surge_peak_watts') or 0))
             
             # Load inverters and controllers
             inverters_df = load_component_data('inverter')
@@ -22,7 +46,7 @@ class ComponentMatchingAgent(BaseAgent):
             
             # Create system configurations
             system_configs = self._create_system_configurations(
-                panels, batteries, inverters_df, controllers_df, peak_load
+                panels, batteries, inverters_df, controllers_df, required_inverter
             )
             
             return {
@@ -38,16 +62,22 @@ class ComponentMatchingAgent(BaseAgent):
                 "error": str(e)
             }
     
-    def _create_system_configurations(self, panels, batteries, inverters_df, controllers_df, peak_load):
+    def _create_system_configurations(self, panels, batteries, inverters_df, controllers_df, required_inverter):
         """Create complete system configurations"""
         configurations = []
         
         # Get suitable inverters
-        suitable_inverters = self._find_suitable_inverters(inverters_df, peak_load)
+        suitable_inverters = self._find_suitable_inverters(inverters_df, required_inverter)
         
         # Get suitable controllers  
         suitable_controllers = self._find_suitable_controllers(controllers_df, panels)
         
+        # Smoothed feedback scores for the candidate panels and batteries
+        rating_scores = {
+            **self._rating_scores('panel', [p.get('model') for p in panels[:3]]),
+            **self._rating_scores('battery', [b.get('model') for b in batteries[:3]])
+        }
+        
         # Create configurations (top 5 combinations)
         for i, panel_config in enumerate(panels[:3]):
             for j, battery_config in enumerate(batteries[:3]):
@@ -68,17 +98,22 @@ class ComponentMatchingAgent(BaseAgent):
                             'inverter': inverter,
                             'controller': controller,
                             'total_system_cost': total_cost,
-                            'cost_per_watt': total_cost / panel_config.get('total_capacity', 1)
+                            'cost_per_watt': total_cost / panel_config.get('total_capacity', 1),
+                            'reliability_score': self._reliability_score([
+                                rating_scores.get(panel_config.get('model')),
+                                rating_scores.get(battery_config.get('model')),
+                                inverter.get('rating_score'),
+                                controller.get('rating_score')
+                            ])
                         })
         
         # Sort by total cost
         configurations.sort(key=lambda x: x['total_system_cost'])
         return configurations[:10]
     
-    def _find_suitable_inverters(self, inverters_df, peak_load):
-        """Find suitable inverters for peak load"""
+    def _find_suitable_inverters(self, inverters_df, required_capacity):
+        """Find inverters with at least the required continuous rating"""
         suitable = []
-        required_capacity = peak_load * 1.25  # 25% safety margin
         
         for _, inverter in inverters_df.iterrows():
             power_rating = inverter.get('power_rating', 0)
@@ -88,10 +123,12 @@ class ComponentMatchingAgent(BaseAgent):
                     'power_rating': power_rating,
                     'price': inverter.get('price', 0),
                     'efficiency': inverter.get('efficiency', 0.9),
-                    'input_voltage': inverter.get('input_voltage', 12)
+                    'input_voltage': inverter.get('input_voltage', 12),
+                    'rating_score': inverter.get('rating_score', settings.FEEDBACK_PRIOR_MEAN)
                 })
         
-        return sorted(suitable, key=lambda x: x['price'])
+        # Cheapest first; better-rated models win ties
+        return sorted(suitable, key=lambda x: (x['price'], -x['rating_score']))
     
     def _find_suitable_controllers(self, controllers_df, panels):
         """Find suitable charge controllers"""
@@ -110,10 +147,24 @@ class ComponentMatchingAgent(BaseAgent):
                     'max_current': max_current,
                     'price': controller.get('price', 0),
                     'efficiency': controller.get('efficiency', 0.98),
-                    'voltage': controller.get('voltage', 12)
+                    'voltage': controller.get('voltage', 12),
+                    'rating_score': controller.get('rating_score', settings.FEEDBACK_PRIOR_MEAN)
                 })
         
-        return sorted(suitable, key=lambda x: x['price'])
+        return sorted(suitable, key=lambda x: (x['price'], -x['rating_score']))
+    
+    def _rating_scores(self, component_type, models):
+        """Smoothed feedback score per model from the catalog's rating columns"""
+        df = load_component_data(component_type)
+        if 'rating_score' not in df.columns:
+            return {}
+        rated = df.loc[df['model'].isin(models), ['model', 'rating_score']]
+        return dict(zip(rated['model'], rated['rating_score']))
+    
+    def _reliability_score(self, scores):
+        """Mean component feedback score scaled to 0-1 (unrated components count as average)"""
+        scores = [settings.FEEDBACK_PRIOR_MEAN if score is None else float(score) for score in scores]
+        return round((sum(scores) / len(scores) - 1) / (MAX_RATING - 1), 3)
     
     def _create_compatibility_matrix(self, panels, batteries):
         """Create component compatibility matrix"""
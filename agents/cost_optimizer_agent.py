@@ -1,9 +1,15 @@
 from .base_agent import BaseAgent
 from typing import Any, Dict
 
+# Savings estimate: full-sun hours per day and grid tariff displaced (₦ per kWh)
+SAVINGS_SUN_HOURS = 6
+GRID_TARIFF_NAIRA_KWH = 45
+
 class CostOptimizerAgent(BaseAgent):
     """Optimizes system cost within budget constraints"""
     
+    cache_fields = ('budget', 'system_configurations', 'priority')
+    
     def __init__(self):
         super().__init__("CostOptimizer")
     
@@ -62,17 +68,17 @@ class CostOptimizerAgent(BaseAgent):
         
         for config in configs[:3]:
             panel_capacity = config.get('panel', {}).get('total_capacity', 0)
-            monthly_generation = panel_capacity * 6 * 30 / 1000  # kWh/month (rough estimate)
-            monthly_savings = monthly_generation * 45  # ₦45 per kWh
+            monthly_generation = panel_capacity * SAVINGS_SUN_HOURS * 30 / 1000  # kWh/month (rough estimate)
+            monthly_savings = monthly_generation * GRID_TARIFF_NAIRA_KWH
             
             system_cost = config.get('total_system_cost', 0)
-            payback_years = system_cost / (monthly_savings * 12) if monthly_savings > 0 else float('inf')
+            payback_years = system_cost / (monthly_savings * 12) if monthly_savings > 0 else None
             
             analysis.append({
                 'config_id': config.get('config_id'),
                 'monthly_savings': monthly_savings,
                 'annual_savings': monthly_savings * 12,
-                'payback_period_years': round(payback_years, 1),
+                'payback_period_years': round(payback_years, 1) if payback_years is not None else None,
                 'roi_percentage': round((monthly_savings * 12) / system_cost * 100, 1) if system_cost > 0 else 0
             })
         
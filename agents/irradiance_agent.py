@@ -1,12 +1,33 @@
 from .base_agent import BaseAgent
 from core.calculations import SolarCalculations
+from config.settings import settings
+import numpy as np
 import requests
 from datetime import datetime
 from typing import Any, Dict
 
+# Stored irradiance by location name
+STORED_IRRADIANCE = {
+    'lagos': {'daily_average': 4.8, 'peak_sun_hours': 5.8},
+    'abuja': {'daily_average': 5.2, 'peak_sun_hours': 6.2},
+    'kano': {'daily_average': 5.8, 'peak_sun_hours': 6.8}
+}
+
+# Offline estimate for Nigeria: peak sun hours per kWh/m²/day of irradiance
+PEAK_SUN_HOURS_RATIO = 1.2
+
+def estimate_irradiance(latitude):
+    """Daily irradiance (kWh/m²) by latitude band; broadcasts over arrays of latitudes"""
+    latitude = np.asarray(latitude, dtype=float)
+    # Northern Nigeria, Middle Belt, Southern Nigeria
+    return np.select([latitude > 12, latitude > 8], [5.8, 5.2], 4.8)
+
 class IrradianceAgent(BaseAgent):
     """Handles solar irradiance calculations and data"""
     
+    cache_fields = ('location', 'latitude', 'longitude')
+    cache_quantize = {'latitude': 0.25, 'longitude': 0.25}  # ~28 km location cell
+    
     def __init__(self):
         super().__init__("IrradianceAgent")
         self.nasa_api_base = "https://power.larc.nasa.gov/api/temporal/daily/point"
@@ -19,8 +40,10 @@ class IrradianceAgent(BaseAgent):
             location = input_data.get('location', 'Unknown')
             
             # Try to get real-time data first
-            if latitude and longitude:
+            if latitude and longitude and settings.NASA_POWER_ENABLED:
                 irradiance_data = self._get_nasa_irradiance(latitude, longitude)
+            elif latitude and longitude:
+                irradiance_data = self._get_fallback_irradiance(latitude)
             else:
                 # **INPUT YOUR LOCATION-TO-COORDINATES MAPPING HERE**
                 # Use your stored data or coordinate lookup
@@ -84,14 +107,8 @@ class IrradianceAgent(BaseAgent):
         # Load from your irradiance_monthly.csv file
         
         # Placeholder implementation
-        location_data = {
-            'lagos': {'daily_average': 4.8, 'peak_sun_hours': 5.8},
-            'abuja': {'daily_average': 5.2, 'peak_sun_hours': 6.2},
-            'kano': {'daily_average': 5.8, 'peak_sun_hours': 6.8}
-        }
-        
         location_key = location.lower()
-        data = location_data.get(location_key, {'daily_average': 5.0, 'peak_sun_hours': 6.0})
+        data = dict(STORED_IRRADIANCE.get(location_key, {'daily_average': 5.0, 'peak_sun_hours': 6.0}))
         data['source'] = 'stored_data'
         
         return data
@@ -99,16 +116,10 @@ class IrradianceAgent(BaseAgent):
     def _get_fallback_irradiance(self, lat: float) -> Dict[str, Any]:
         """Fallback irradiance estimation"""
         # Simple latitude-based estimation for Nigeria
-        base_irradiance = 5.0
-        if lat > 12:  # Northern Nigeria
-            base_irradiance = 5.8
-        elif lat > 8:  # Middle Belt
-            base_irradiance = 5.2
-        else:  # Southern Nigeria
-            base_irradiance = 4.8
+        base_irradiance = float(estimate_irradiance(lat))
         
         return {
             'daily_average': base_irradiance,
-            'peak_sun_hours': base_irradiance * 1.2,
+            'peak_sun_hours': base_irradiance * PEAK_SUN_HOURS_RATIO,
             'source': 'estimated'
         }
\ No newline at end of file
@@ -1,10 +1,12 @@
 from .base_agent import BaseAgent
-from core.calculations import SolarCalculations
-from typing import Any, Dict, List
+from core.load_profile import LoadProfile
+from typing import Any, Dict
 
 class LoadCalculatorAgent(BaseAgent):
     """Calculates energy load requirements"""
     
+    cache_fields = ('appliances', 'backup_hours')
+    
     def __init__(self):
         super().__init__("LoadCalculator")
     
@@ -15,20 +17,23 @@ class LoadCalculatorAgent(BaseAgent):
             
             appliances = input_data['appliances']
             
-            # Calculate energy requirements
-            daily_consumption = SolarCalculations.calculate_daily_energy_consumption(appliances)
-            peak_load = SolarCalculations.calculate_peak_load(appliances)
+            # Hourly load curve: daily energy, running and surge peaks
+            profile = LoadProfile(appliances)
+            daily_consumption = profile.total_energy_kwh
             
-            # Calculate backup requirements
+            # Backup energy at the highest hourly average demand
             backup_hours = input_data.get('backup_hours', 4)
-            backup_energy = (peak_load * backup_hours) / 1000  # kWh
+            backup_energy = (profile.coincident_peak_w * backup_hours) / 1000  # kWh
             
             results = {
                 "status": "success",
                 "daily_consumption_kwh": daily_consumption,
-                "peak_load_watts": peak_load,
+                # Instantaneous demand the inverter must carry continuously
+                "peak_load_watts": profile.running_peak_w,
+                "surge_peak_watts": profile.surge_peak_w,
+                "connected_load_watts": profile.connected_load_w,
                 "backup_energy_kwh": backup_energy,
-                "load_profile": self._create_load_profile(appliances)
+                "load_profile": profile.to_dict()
             }
             
             self.logger.info(f"Load calculation complete: {daily_consumption:.2f} kWh/day")
@@ -40,38 +45,3 @@ class LoadCalculatorAgent(BaseAgent):
                 "status": "error",
                 "error": str(e)
             }
-    
-    def _create_load_profile(self, appliances: List[Dict]) -> Dict[str, Any]:
-        """Create detailed load profile"""
-        profile = {
-            "total_appliances": len(appliances),
-            "appliance_breakdown": [],
-            "load_categories": {"lighting": 0, "cooling": 0, "electronics": 0, "other": 0}
-        }
-        
-        for appliance in appliances:
-            power = appliance.get('power_rating', 0)
-            hours = appliance.get('hours_per_day', 0)
-            qty = appliance.get('quantity', 1)
-            
-            daily_energy = (power * hours * qty) / 1000
-            
-            profile["appliance_breakdown"].append({
-                "name": appliance.get('appliance', 'Unknown'),
-                "power_watts": power * qty,
-                "hours_per_day": hours,
-                "daily_energy_kwh": daily_energy
-            })
-            
-            # Categorize (basic categorization)
-            appliance_name = appliance.get('appliance', '').lower()
-            if any(word in appliance_name for word in ['light', 'bulb', 'lamp']):
-                profile["load_categories"]["lighting"] += daily_energy
-            elif any(word in appliance_name for word in ['fan', 'air', 'cool']):
-                profile["load_categories"]["cooling"] += daily_energy
-            elif any(word in appliance_name for word in ['tv', 'laptop', 'phone', 'computer']):
-                profile["load_categories"]["electronics"] += daily_energy
-            else:
-                profile["load_categories"]["other"] += daily_energy
-        
-        return profile
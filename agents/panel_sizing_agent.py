@@ -7,6 +7,10 @@ from typing import Any, Dict
 class PanelSizingAgent(BaseAgent):
     """Sizes solar panel requirements"""
     
+    cache_fields = ('daily_consumption_kwh', 'peak_sun_hours', 'system_efficiency')
+    cache_quantize = {'daily_consumption_kwh': 0.1, 'peak_sun_hours': 0.1}
+    uses_catalog = True
+    
     def __init__(self):
         super().__init__("PanelSizing")
     
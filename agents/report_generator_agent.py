@@ -1,8 +1,12 @@
 from .base_agent import BaseAgent
+from core.utils import to_columnar
 from datetime import datetime
 import json 
 from typing import Any, Dict
 
+# Report sections materialized at each detail level
+REPORT_DETAIL_LEVELS = ('summary', 'standard', 'full')
+
 class ReportGeneratorAgent(BaseAgent):
     """Generates comprehensive system reports"""
     
@@ -12,23 +16,30 @@ class ReportGeneratorAgent(BaseAgent):
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate comprehensive system report"""
         try:
+            detail = input_data.get('report_detail', 'full')
+            if detail not in REPORT_DETAIL_LEVELS:
+                raise ValueError(f"Unknown report detail level: {detail}")
+            
             # Compile all data
             report = self._compile_comprehensive_report(input_data)
             
-            # Generate different report formats
-            executive_summary = self._generate_executive_summary(report)
-            technical_details = self._generate_technical_details(report)
-            financial_analysis = self._generate_financial_analysis(report)
-            
-            return {
+            # Generate only the report formats the detail level asks for
+            result = {
                 "status": "success",
                 "report_generated": datetime.now().isoformat(),
-                "executive_summary": executive_summary,
-                "technical_details": technical_details,
-                "financial_analysis": financial_analysis,
-                "full_report": report
+                "detail": detail,
+                "executive_summary": self._generate_executive_summary(report)
             }
             
+            if detail in ('standard', 'full'):
+                result["technical_details"] = self._generate_technical_details(report)
+                result["financial_analysis"] = self._generate_financial_analysis(report)
+            
+            if detail == 'full':
+                result["full_report"] = self._columnar_time_series(report)
+            
+            return result
+            
         except Exception as e:
             self.logger.error(f"Report generation failed: {e}")
             return {
@@ -38,27 +49,48 @@ class ReportGeneratorAgent(BaseAgent):
     
     def _compile_comprehensive_report(self, input_data):
         """Compile all analysis results into comprehensive report"""
+        # Savings analysis is a per-configuration list; report the selected (first) one
+        savings_analysis = input_data.get('savings_analysis') or {}
+        if isinstance(savings_analysis, list):
+            savings_analysis = savings_analysis[0] if savings_analysis else {}
+        
         return {
             'project_info': {
                 'location': input_data.get('location', 'Unknown'),
                 'analysis_date': datetime.now().strftime('%Y-%m-%d'),
                 'budget': input_data.get('budget', 0)
             },
-            'load_analysis': input_data.get('load_analysis', {}),
+            'load_analysis': {
+                'daily_consumption_kwh': input_data.get('daily_consumption_kwh', 0),
+                'peak_load_watts': input_data.get('peak_load_watts', 0),
+                'surge_peak_watts': input_data.get('surge_peak_watts', 0),
+                'backup_energy_kwh': input_data.get('backup_energy_kwh', 0),
+                'load_profile': input_data.get('load_profile', {})
+            },
             'system_design': input_data.get('selected_configuration', {}),
             'performance_simulation': input_data.get('simulation_results', {}),
-            'financial_projections': input_data.get('savings_analysis', {}),
+            'financial_projections': savings_analysis,
             'recommendations': input_data.get('recommendations', [])
         }
     
+    def _columnar_time_series(self, report):
+        """Encode the daily simulation series as columns instead of per-day records"""
+        simulation = report.get('performance_simulation') or {}
+        if isinstance(simulation.get('daily_results'), list):
+            simulation = {**simulation, 'daily_results': to_columnar(simulation['daily_results'])}
+            report = {**report, 'performance_simulation': simulation}
+        return report
+    
     def _generate_executive_summary(self, report):
         """Generate executive summary"""
         system_cost = report.get('system_design', {}).get('total_system_cost', 0)
         daily_consumption = report.get('load_analysis', {}).get('daily_consumption_kwh', 0)
         annual_savings = report.get('financial_projections', {}).get('annual_savings', 0)
+        panel_capacity = report.get('system_design', {}).get('panel', {}).get('total_capacity', 0)
         
         return {
             'recommended_system_cost': system_cost,
+            'system_size_kw': round(panel_capacity / 1000, 3),
             'daily_energy_needs': daily_consumption,
             'projected_annual_savings': annual_savings,
             'payback_period': report.get('financial_projections', {}).get('payback_period_years', 0),
@@ -111,9 +143,10 @@ class ReportGeneratorAgent(BaseAgent):
         return {
             'initial_investment': system_cost,
             'annual_savings_year_1': annual_savings,
-            'payback_period_years': system_cost / annual_savings if annual_savings > 0 else float('inf'),
+            'payback_period_years': system_cost / annual_savings if annual_savings > 0 else None,  # never pays back
             'net_savings_25_years': cumulative_savings[-1] if cumulative_savings else 0,
             'roi_percentage': (cumulative_savings[-1] / system_cost * 100) if system_cost > 0 and cumulative_savings else 0,
             'break_even_year': next((i+1 for i, val in enumerate(cumulative_savings) if val > 0), None),
+            'cumulative_savings': [round(value, 2) for value in cumulative_savings],
             'financing_options': report.get('financing_options', [])
         }
\ No newline at end of file
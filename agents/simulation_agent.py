@@ -1,11 +1,68 @@
 from .base_agent import BaseAgent
+from core.load_profile import annual_load_curve
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Any, Dict
 
+# Fraction of nameplate output delivered after temperature, wiring and soiling losses
+SYSTEM_DERATE = 0.8
+
+# Battery bank model: bus voltage, starting and minimum state of charge
+BATTERY_VOLTAGE = 12
+INITIAL_SOC = 0.8
+MIN_SOC = 0.2
+
+# Irradiance simulated when the irradiance stage resolved none (kWh/m²/day)
+DEFAULT_DAILY_IRRADIANCE = 5.0
+
+def simulation_irradiance(irradiance: Dict[str, Any]) -> float:
+    """
+    Average daily irradiance (kWh/m²) a site is simulated at, from its
+    irradiance stage result (or workflow data holding it). The agent, the
+    vectorized sweep and the fleet baseline all read it through here.
+    """
+    value = irradiance.get('daily_irradiance_kwh_m2')
+    return float(value) if value is not None else DEFAULT_DAILY_IRRADIANCE
+
+def expected_generation_kwh(panel_capacity_w, daily_irradiance_kwh_m2):
+    """Simulated daily generation; broadcasts over arrays of systems and days"""
+    return np.multiply(panel_capacity_w, daily_irradiance_kwh_m2) * SYSTEM_DERATE / 1000
+
+def daily_loads_kwh(load_profile):
+    """Daily consumption over a year, from the seasonal hourly load curve when available"""
+    if load_profile.get('category_hourly_watts'):
+        hourly_load = annual_load_curve(load_profile['category_hourly_watts'])
+        return hourly_load.reshape(365, 24).sum(axis=1) / 1000  # kWh
+    return np.full(365, load_profile.get('total_energy_kwh', 5.0))
+
+def simulate_energy_balance(daily_generation_kwh, daily_loads_kwh, battery_capacity_ah):
+    """
+    Day-by-day battery state of charge and grid import.
+
+    Broadcasts over systems: generation and capacity are per system (or
+    scalars) and daily_loads_kwh has the days on its last axis. Returns
+    (state_of_charge, grid_import_kwh), each systems × days.
+    """
+    generation = np.asarray(daily_generation_kwh, dtype=float)
+    storage_kwh = np.asarray(battery_capacity_ah, dtype=float) * BATTERY_VOLTAGE / 1000
+    loads = np.asarray(daily_loads_kwh, dtype=float)
+    shape = np.broadcast_shapes(generation.shape, storage_kwh.shape, loads.shape[:-1]) + loads.shape[-1:]
+
+    soc = np.full(shape[:-1], INITIAL_SOC)
+    state_of_charge, grid_import = np.empty(shape), np.empty(shape)
+    for day in range(shape[-1]):
+        excess = generation - loads[..., day]
+        change = soc + excess / storage_kwh
+        soc = np.where(excess > 0, np.minimum(1.0, change), np.maximum(MIN_SOC, change))
+        state_of_charge[..., day] = soc
+        grid_import[..., day] = np.where(soc <= MIN_SOC, np.maximum(0, -excess), 0)
+    return state_of_charge, grid_import
+
 class SimulationAgent(BaseAgent):
     """Simulates system performance over time"""
     
+    cache_fields = ('selected_configuration', 'load_profile', 'daily_irradiance_kwh_m2')
+    
     def __init__(self):
         super().__init__("SystemSimulation")
     
@@ -15,11 +72,11 @@ class SimulationAgent(BaseAgent):
             # Get system configuration
             system_config = input_data.get('selected_configuration', {})
             load_profile = input_data.get('load_profile', {})
-            irradiance_data = input_data.get('irradiance_data', {})
+            daily_irradiance = simulation_irradiance(input_data)
             
             # Run simulation
             simulation_results = self._run_annual_simulation(
-                system_config, load_profile, irradiance_data
+                system_config, load_profile, daily_irradiance
             )
             
             return {
@@ -36,7 +93,7 @@ class SimulationAgent(BaseAgent):
                 "error": str(e)
             }
     
-    def _run_annual_simulation(self, system_config, load_profile, irradiance_data):
+    def _run_annual_simulation(self, system_config, load_profile, daily_irradiance):
         """Run 365-day system simulation"""
         results = {
             'daily_results': [],
@@ -49,41 +106,28 @@ class SimulationAgent(BaseAgent):
         battery_capacity = system_config.get('battery', {}).get('total_capacity_ah', 0)
         inverter_efficiency = system_config.get('inverter', {}).get('efficiency', 0.9)
         
-        # Daily simulation
-        battery_soc = 0.8  # Start at 80% SOC
+        # Daily consumption
+        daily_loads = daily_loads_kwh(load_profile)
+        
+        # Solar generation from the site's average daily irradiance
+        daily_generation = float(expected_generation_kwh(panel_capacity, daily_irradiance))  # kWh
+        
+        # Daily simulation: battery charges on surplus days and the grid
+        # covers deficits once it reaches its minimum state of charge
+        if not battery_capacity:
+            raise ValueError("Selected configuration has no battery capacity")
+        battery_soc, grid_import = simulate_energy_balance(daily_generation, daily_loads, battery_capacity)
         
         for day in range(365):
-            month = (day // 30) + 1
-            if month > 12:
-                month = 12
-            
-            # Get daily irradiance (use monthly average)
-            daily_irradiance = irradiance_data.get('daily_irradiance_kwh_m2', 5.0)
-            
-            # Solar generation
-            daily_generation = (panel_capacity * daily_irradiance * 0.8) / 1000  # kWh
-            
-            # Load consumption
-            daily_consumption = load_profile.get('total_energy_kwh', 5.0)
-            
-            # Battery simulation
+            daily_consumption = float(daily_loads[day])
             excess_energy = daily_generation - daily_consumption
             
-            if excess_energy > 0:
-                # Charge battery
-                battery_soc = min(1.0, battery_soc + (excess_energy / (battery_capacity * 12 / 1000)))
-            else:
-                # Discharge battery
-                battery_soc = max(0.2, battery_soc + (excess_energy / (battery_capacity * 12 / 1000)))
-            
-            grid_import = max(0, -excess_energy) if battery_soc <= 0.2 else 0
-            
             results['daily_results'].append({
                 'day': day + 1,
                 'generation_kwh': daily_generation,
                 'consumption_kwh': daily_consumption,
-                'battery_soc': battery_soc,
-                'grid_import_kwh': grid_import,
+                'battery_soc': float(battery_soc[day]),
+                'grid_import_kwh': float(grid_import[day]),
                 'excess_energy_kwh': max(0, excess_energy)
             })
         
@@ -0,0 +1,80 @@
+from typing import Dict, Optional
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from core.catalog import COMPONENT_FILES, DEFAULT_DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+# Where generated catalogs are written, one directory per size
+DEFAULT_CATALOG_ROOT = "benchmarks/data"
+
+# Rows written at a time, so multi-million-row catalogs never sit in memory whole
+CHUNK_ROWS = 250_000
+
+# Synthetic prices vary by up to this fraction around the sampled row's price
+PRICE_JITTER = 0.1
+PRICE_COLUMN = 'price_NGN'
+
+def synthetic_catalog_path(rows: int, root: str = DEFAULT_CATALOG_ROOT) -> str:
+    """Directory holding the generated catalog of a given size"""
+    return os.path.join(root, f"catalog_{rows}")
+
+def generate_catalog(rows: int, output_path: Optional[str] = None, seed: int = 0,
+                     source_path: str = DEFAULT_DATA_PATH) -> str:
+    """
+    Write panel, battery, inverter and controller CSVs of `rows` rows each
+    in the raw catalog schema, returning their directory.
+
+    Rows are resampled from the source catalog with jittered prices and
+    fresh IDs, so column types and value distributions follow the real
+    data. A catalog already generated with the same size and seed is kept.
+    """
+    output_path = output_path or synthetic_catalog_path(rows)
+    manifest_path = os.path.join(output_path, 'manifest.json')
+    manifest = {'rows': rows, 'seed': seed, 'files': sorted(COMPONENT_FILES.values())}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return output_path
+
+    os.makedirs(output_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for component_type, filename in sorted(COMPONENT_FILES.items()):
+        source = pd.read_csv(os.path.join(source_path, filename))
+        id_column = source.columns[0]
+        # IDs end in a row number ('Trina Solar_380W_Monocrystalline_0'); keep the descriptive part
+        prefixes = source[id_column].str.rsplit('_', n=1).str[0].to_numpy()
+
+        path = os.path.join(output_path, filename)
+        partial = f"{path}.partial"
+        for start in range(0, rows, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, rows - start)
+            picks = rng.integers(0, len(source), count)
+            chunk = source.iloc[picks].reset_index(drop=True)
+            chunk[id_column] = pd.Series(prefixes[picks]) + '_' + pd.Series(np.arange(start, start + count)).astype(str)
+            jitter = rng.uniform(1 - PRICE_JITTER, 1 + PRICE_JITTER, count)
+            chunk[PRICE_COLUMN] = np.maximum(np.round(chunk[PRICE_COLUMN].to_numpy() * jitter), 1).astype(np.int64)
+            chunk.to_csv(partial, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        os.replace(partial, path)
+        logger.info(f"Generated {rows} {component_type} rows in {path}")
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return output_path
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    parser = argparse.ArgumentParser(description="Generate synthetic component catalogs for benchmarks")
+    parser.add_argument('rows', type=int, nargs='+')
+    parser.add_argument('--root', default=DEFAULT_CATALOG_ROOT)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for rows in args.rows:
+        print(generate_catalog(rows, synthetic_catalog_path(rows, args.root), args.seed))
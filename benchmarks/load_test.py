@@ -0,0 +1,399 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from config.settings import settings
+from services.database import Database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKLOAD = os.path.join(settings.DATA_PATH, "sample", "requests.jsonl")
+DEFAULT_OUTPUT_PATH = "benchmarks/results/load"
+CALCULATE_PATH = "/api/v1/calculate"
+
+# Recorded traffic replayed from a calculation-history database, newest last
+RECORDED_LIMIT = 10000
+
+# Histogram precision, as in HdrHistogram: values are kept to this many
+# significant decimal digits (1 microsecond resolution at the bottom)
+SIGNIFICANT_DIGITS = 3
+
+LATENCY_PERCENTILES = (50, 95, 99, 99.9)
+SERVER_START_TIMEOUT = 60
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of durations in the style of HdrHistogram: each
+    power-of-two range is split into equal sub-buckets, so any recorded
+    value is kept to a fixed relative precision in constant memory.
+    """
+
+    def __init__(self, significant_digits: int = SIGNIFICANT_DIGITS):
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_count = 2 ** self.sub_bucket_bits
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def _index(self, value: int) -> int:
+        bucket = max(0, value.bit_length() - self.sub_bucket_bits)
+        return bucket * (self.sub_bucket_count // 2) + (value >> bucket)
+
+    def _highest_equivalent(self, index: int) -> int:
+        half = self.sub_bucket_count // 2
+        bucket = 0 if index < self.sub_bucket_count else index // half - 1
+        sub_bucket = index - bucket * half
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, milliseconds: float) -> None:
+        value = max(0, round(milliseconds * 1000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum_us += value
+        self.max_us = max(self.max_us, value)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, percentile: float) -> float:
+        """Smallest recorded value (ms) at or above the given percentile"""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def mean(self) -> float:
+        return self.sum_us / self.total / 1000 if self.total else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Mean, max and standard percentiles in milliseconds"""
+        summary = {f"p{str(p).replace('.', '')}_ms": round(self.percentile(p), 3) for p in LATENCY_PERCENTILES}
+        summary['mean_ms'] = round(self.mean(), 3)
+        summary['max_ms'] = round(self.max_us / 1000, 3)
+        return summary
+
+    def percentile_distribution(self) -> str:
+        """The distribution in HdrHistogram's .hgrm text format, values in milliseconds"""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            value = min(self._highest_equivalent(index), self.max_us) / 1000
+            fraction = seen / self.total
+            if seen < self.total:
+                lines.append(f"{value:12.3f} {fraction:14.12f} {seen:10d} {1 / (1 - fraction):14.2f}")
+            else:
+                lines.append(f"{value:12.3f} {fraction:14.12f} {seen:10d}")
+        mean = self.mean()
+        variance = sum(count * (self._highest_equivalent(index) / 1000 - mean) ** 2
+                       for index, count in self.counts.items()) / max(self.total, 1)
+        lines.append(f"#[Mean    = {mean:12.3f}, StdDeviation   = {math.sqrt(variance):12.3f}]")
+        lines.append(f"#[Max     = {self.max_us / 1000:12.3f}, Total count    = {self.total:12d}]")
+        lines.append(f"#[Buckets = {len(self.counts):12d}, SubBuckets     = {self.sub_bucket_count:12d}]")
+        return "\n".join(lines) + "\n"
+
+def load_workload(sources: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Requests to replay: UserInput objects from JSON lines or JSON array
+    files, and recorded inputs from calculation-history databases (.db).
+    """
+    workload = []
+    for source in sources:
+        if source.endswith(('.db', '.sqlite', '.sqlite3')):
+            rows = Database(source).query(
+                "SELECT input_data FROM user_calculations WHERE input_data IS NOT NULL ORDER BY id DESC LIMIT ?",
+                (RECORDED_LIMIT,))
+            workload.extend(json.loads(row['input_data']) for row in reversed(rows))
+            continue
+        with open(source, encoding='utf-8') as f:
+            if source.endswith('.json'):
+                workload.extend(json.load(f))
+            else:
+                workload.extend(json.loads(line) for line in f if line.strip())
+    if not workload:
+        raise ValueError(f"No requests found in {list(sources)}")
+    return workload
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Stage durations (ms) from a Server-Timing header"""
+    timings = {}
+    for metric in filter(None, (part.strip() for part in header.split(','))):
+        name, *params = [param.strip() for param in metric.split(';')]
+        for param in params:
+            if param.startswith('dur='):
+                timings[name] = float(param[4:])
+    return timings
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams, reconnecting after failures"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b'') -> Tuple[int, Dict[str, str], bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                               f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+            await self.writer.drain()
+
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("Connection closed by server")
+            status = int(status_line.split()[1])
+            headers = {}
+            while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get('transfer-encoding') == 'chunked':
+                content = b''
+                while size := int((await self.reader.readline()).split(b';')[0], 16):
+                    content += (await self.reader.readexactly(size + 2))[:-2]
+                await self.reader.readline()
+            else:
+                content = await self.reader.readexactly(int(headers.get('content-length', 0)))
+            if headers.get('connection') == 'close':
+                await self.close()
+            return status, headers, content
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+class LoadResults:
+    """Latencies, statuses and server-side stage timings of a load test"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, milliseconds: float, status: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.latency.record(milliseconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        for stage, duration in parse_server_timing((headers or {}).get('server-timing', '')).items():
+            self.stages.setdefault(stage, LatencyHistogram()).record(duration)
+
+    @property
+    def errors(self) -> int:
+        return sum(count for status, count in self.statuses.items() if not status.startswith('2'))
+
+async def _send(connection: HTTPConnection, path: str, payload: Dict[str, Any],
+                results: Optional[LoadResults], scheduled: float) -> None:
+    """One request; latency runs from when it was scheduled, so queueing delay counts"""
+    try:
+        status, headers, _ = await connection.request('POST', path, json.dumps(payload).encode())
+        status, error = str(status), None
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        status, headers, error = 'connection_error', None, e
+        logger.debug(f"Request failed: {error}")
+    if results is not None:
+        results.record((time.perf_counter() - scheduled) * 1000, status, headers)
+
+async def generate_load(host: str, port: int, workload: List[Dict[str, Any]], path: str = CALCULATE_PATH,
+                        concurrency: int = 8, rate: Optional[float] = None, duration: Optional[float] = None,
+                        requests: Optional[int] = None, warmup: int = 0) -> Dict[str, Any]:
+    """
+    Replay the workload in order (cycling) against a running API.
+
+    Without a rate, concurrency clients each send their next request as soon
+    as the last one finishes (closed loop). With a rate, requests are sent
+    on a fixed schedule over up to concurrency connections (open loop) and
+    latency is measured from the scheduled time. The test stops after
+    duration seconds or the given number of requests; the first warmup
+    requests are not measured.
+    """
+    if duration is None and requests is None:
+        raise ValueError("Give a duration or a number of requests")
+    payloads = itertools.cycle(workload)
+    connections: asyncio.Queue = asyncio.Queue()
+    for _ in range(concurrency):
+        connections.put_nowait(HTTPConnection(host, port))
+
+    for _ in range(warmup):
+        connection = await connections.get()
+        await _send(connection, path, next(payloads), None, time.perf_counter())
+        connections.put_nowait(connection)
+
+    results = LoadResults()
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else math.inf
+    sent = 0
+
+    def more() -> bool:
+        return (requests is None or sent < requests) and time.perf_counter() < deadline
+
+    async def client() -> None:
+        nonlocal sent
+        connection = await connections.get()
+        while more():
+            sent += 1
+            await _send(connection, path, next(payloads), results, time.perf_counter())
+        connections.put_nowait(connection)
+
+    async def scheduled(payload: Dict[str, Any], at: float) -> None:
+        connection = await connections.get()
+        try:
+            await _send(connection, path, payload, results, at)
+        finally:
+            connections.put_nowait(connection)
+
+    if rate is None:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    else:
+        tasks = []
+        while more():
+            at = started + sent / rate
+            await asyncio.sleep(max(0.0, at - time.perf_counter()))
+            tasks.append(asyncio.ensure_future(scheduled(next(payloads), at)))
+            sent += 1
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    while not connections.empty():
+        await connections.get_nowait().close()
+
+    return {
+        'mode': 'open' if rate is not None else 'closed',
+        'concurrency': concurrency,
+        'target_rate': rate,
+        'elapsed_s': round(elapsed, 3),
+        'requests': results.latency.total,
+        'throughput_rps': round(results.latency.total / elapsed, 2) if elapsed else 0.0,
+        'statuses': results.statuses,
+        'errors': results.errors,
+        'error_rate': round(results.errors / results.latency.total, 4) if results.latency.total else 0.0,
+        'latency': results.latency.summary(),
+        'stages': {stage: histogram.summary() for stage, histogram in results.stages.items()},
+        'histograms': {'latency': results.latency, **{f"stage.{stage}": histogram
+                                                      for stage, histogram in results.stages.items()}}
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def local_server(port: Optional[int] = None, workers: int = 1,
+                 environment: Optional[Dict[str, str]] = None) -> Iterator[int]:
+    """
+    Run the API under uvicorn on localhost for the duration, yielding its
+    port. The server works offline (NASA POWER disabled), records
+    calculations into a throwaway database and logs to a file beside it.
+    """
+    port = port or free_port()
+    with tempfile.TemporaryDirectory() as scratch, open(os.path.join(scratch, 'server.log'), 'w+') as log:
+        env = {**os.environ, 'NASA_POWER_ENABLED': 'false',
+               'DATABASE_PATH': os.path.join(scratch, 'load_test.db'), **(environment or {})}
+        server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'services.api.main:app', '--host', '127.0.0.1',
+                                   '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+                                  env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                if server.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(f"API server exited with status {server.returncode}: {log.read()[-2000:]}")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=1):
+                        break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"API server did not start within {SERVER_START_TIMEOUT}s")
+                    time.sleep(0.2)
+            yield port
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+def run_load_test(workload_sources: Sequence[str] = (DEFAULT_WORKLOAD,), host: Optional[str] = None,
+                  port: Optional[int] = None, workers: int = 1, detail: str = 'standard', exact: bool = False,
+                  **load) -> Dict[str, Any]:
+    """
+    Load-test /api/v1/calculate with the given workload. Without a host a
+    local server is started for the test; load is passed to generate_load.
+    """
+    workload = load_workload(workload_sources)
+    path = f"{CALCULATE_PATH}?detail={detail}" + ("&exact=true" if exact else "")
+    if host is not None:
+        report = asyncio.run(generate_load(host, port or settings.API_PORT, workload, path, **load))
+    else:
+        with local_server(port, workers) as local_port:
+            report = asyncio.run(generate_load('127.0.0.1', local_port, workload, path, **load))
+    report.update({'workload': list(workload_sources), 'workload_size': len(workload),
+                   'detail': detail, 'exact': exact, 'server_workers': workers if host is None else None})
+    return report
+
+def save_report(report: Dict[str, Any], output_path: str = DEFAULT_OUTPUT_PATH) -> str:
+    """Write the report as JSON and each histogram as an .hgrm file, returning the report's path"""
+    os.makedirs(output_path, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    for name, histogram in report['histograms'].items():
+        with open(os.path.join(output_path, f"{stamp}.{name}.hgrm"), 'w') as f:
+            f.write(histogram.percentile_distribution())
+    path = os.path.join(output_path, f"{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump({key: value for key, value in report.items() if key != 'histograms'}, f, indent=2)
+    return path
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    parser = argparse.ArgumentParser(description="Load-test the calculation API with replayed requests")
+    parser.add_argument('--workload', nargs='+', default=[DEFAULT_WORKLOAD],
+                        help="JSON lines / JSON files of inputs, or calculation-history databases (.db)")
+    parser.add_argument('--host', default=None, help="Test a running API instead of starting one")
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=None, help="Requests per second (open loop)")
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--requests', type=int, default=None)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--detail', default='standard', choices=['summary', 'standard', 'full'])
+    parser.add_argument('--exact', action='store_true')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH)
+    args = parser.parse_args()
+
+    report = run_load_test(args.workload, args.host, args.port, args.workers, args.detail, args.exact,
+                           concurrency=args.concurrency, rate=args.rate, duration=args.duration,
+                           requests=args.requests, warmup=args.warmup)
+    print(f"{report['requests']} requests in {report['elapsed_s']}s: {report['throughput_rps']} req/s, "
+          f"{report['errors']} errors ({report['error_rate']:.2%})")
+    print("latency " + ", ".join(f"{name}={value}" for name, value in report['latency'].items()))
+    for stage, timing in report['stages'].items():
+        print(f"  {stage:<16} " + ", ".join(f"{name}={value}" for name, value in timing.items()))
+    print(f"Report written to {save_report(report, args.output)}")
@@ -0,0 +1,239 @@
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+import argparse
+import copy
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from config.settings import settings
+from benchmarks.load_test import DEFAULT_WORKLOAD, load_workload
+from services.orchestrator import SolarSystemOrchestrator
+
+logger = logging.getLogger(__name__)
+
+# The agent behind each orchestrator stage event
+STAGE_AGENTS = {
+    'validation': 'input_validator',
+    'load_analysis': 'load_calculator',
+    'irradiance': 'irradiance_agent',
+    'panel_sizing': 'panel_sizing',
+    'battery_sizing': 'battery_sizing',
+    'configurations': 'component_matching',
+    'optimization': 'cost_optimizer',
+    'simulation': 'simulation',
+    'report': 'report_generator'
+}
+
+TOP_SITES = 10
+TRACEBACK_FRAMES = 1
+
+# Soak runs: memory is sampled every SOAK_SAMPLE_EVERY requests, growth is
+# fitted after the warm-up fraction (while bounded caches fill), and growth
+# beyond the limit per 1000 requests is reported as a leak
+SOAK_SAMPLE_EVERY = 100
+SOAK_WARMUP_FRACTION = 0.25
+SOAK_GROWTH_LIMIT_KB = 512
+
+# Soak inputs vary budget and backup hours by up to this fraction, so
+# requests miss the caches as production traffic does
+SOAK_INPUT_JITTER = 0.2
+
+# Allocations made by the instrumentation itself
+_IGNORED_FILES = {tracemalloc.__file__, __file__, '<unknown>'}
+
+def rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+@contextmanager
+def tracing(frames: int = TRACEBACK_FRAMES) -> Iterator[None]:
+    """Trace allocations for the duration, unless tracing was already on"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+def site_sizes(snapshot: tracemalloc.Snapshot) -> Dict[str, Tuple[int, int]]:
+    """Memory (bytes, blocks) held by each allocation site in a snapshot"""
+    sizes = {}
+    for statistic in snapshot.statistics('lineno'):
+        frame = statistic.traceback[0]
+        if frame.filename not in _IGNORED_FILES:
+            sizes[f"{frame.filename}:{frame.lineno}"] = (statistic.size, statistic.count)
+    return sizes
+
+def top_sites(before: Dict[str, Tuple[int, int]], after: Dict[str, Tuple[int, int]],
+              limit: int = TOP_SITES) -> List[Dict[str, Any]]:
+    """Allocation sites with the largest net growth between two site_sizes results"""
+    growth = []
+    for site, (size, count) in after.items():
+        size_before, count_before = before.get(site, (0, 0))
+        if size > size_before:
+            growth.append({
+                'site': site,
+                'size_diff_bytes': size - size_before,
+                'count_diff': count - count_before,
+                'size_bytes': size
+            })
+    return sorted(growth, key=lambda site: site['size_diff_bytes'], reverse=True)[:limit]
+
+def stage_memory(orchestrator: SolarSystemOrchestrator, user_input: Dict[str, Any], detail: str = 'full',
+                 exact: bool = False, limit: int = 5) -> Dict[str, Any]:
+    """
+    Run one calculation, recording each stage's net and peak allocations
+    and its top allocation sites, plus the sites retaining the most memory
+    once the calculation is done.
+
+    Peaks are measured from the memory in use when the stage started. All
+    snapshots are held until the end so that freeing one never shows up as
+    a later stage's allocation.
+    """
+    with tracing():
+        first = tracemalloc.take_snapshot()
+        stages, snapshots = [], [first]
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = None
+
+        for event in orchestrator.iter_calculation(user_input, detail, exact=exact):
+            current, peak = tracemalloc.get_traced_memory()
+            snapshots.append(tracemalloc.take_snapshot())
+            stages.append({
+                'stage': event['stage'],
+                'agent': STAGE_AGENTS.get(event['stage']),
+                'net_bytes': current - baseline,
+                'peak_bytes': peak - baseline
+            })
+            result = event['result']
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        sizes = [site_sizes(snapshot) for snapshot in snapshots]
+        for position, stage in enumerate(stages):
+            stage['top_sites'] = top_sites(sizes[position], sizes[position + 1], limit)
+        retained = top_sites(sizes[0], sizes[-1], limit)
+
+    return {
+        'status': result.get('status') if result else 'error',
+        'stages': stages,
+        'net_bytes': sum(stage['net_bytes'] for stage in stages),
+        'peak_bytes': max((stage['peak_bytes'] for stage in stages), default=0),
+        'retained_sites': retained
+    }
+
+def varied_inputs(workload: List[Dict[str, Any]], seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Cycle through the workload with budget and backup hours jittered per request"""
+    rng = np.random.default_rng(seed)
+    while True:
+        for user_input in workload:
+            varied = copy.deepcopy(user_input)
+            scale = rng.uniform(1 - SOAK_INPUT_JITTER, 1 + SOAK_INPUT_JITTER, 2)
+            varied['budget'] = round(varied['budget'] * scale[0], -3)
+            varied['backup_hours'] = min(72.0, max(1.0, round(varied.get('backup_hours', 4) * scale[1], 1)))
+            yield varied
+
+def growth_per_thousand(requests: Sequence[int], values: Sequence[float]) -> float:
+    """Least-squares growth of values per 1000 requests"""
+    if len(requests) < 2:
+        return 0.0
+    return float(np.polyfit(np.asarray(requests, dtype=float), np.asarray(values, dtype=float), 1)[0] * 1000)
+
+def soak(orchestrator: SolarSystemOrchestrator, workload: List[Dict[str, Any]], requests: int,
+         sample_every: int = SOAK_SAMPLE_EVERY, trace: bool = True, detail: str = 'standard',
+         growth_limit_kb: float = SOAK_GROWTH_LIMIT_KB, seed: int = 0, limit: int = TOP_SITES) -> Dict[str, Any]:
+    """
+    Run many calculations in this process, sampling RSS (and traced memory)
+    as it goes. Growth is fitted over the samples after the warm-up; with
+    tracing, the allocation sites that grew since the warm-up are listed.
+    """
+    warmup = int(requests * SOAK_WARMUP_FRACTION)
+    samples, warm_sizes, failures = [], None, 0
+    inputs = varied_inputs(workload, seed)
+    started = time.perf_counter()
+
+    with (tracing() if trace else nullcontext()):
+        for position in range(1, requests + 1):
+            result = orchestrator.calculate_solar_system(next(inputs), detail)
+            failures += result.get('status') != 'success'
+            if position % sample_every == 0 or position == requests:
+                samples.append({
+                    'request': position,
+                    'rss_bytes': rss_bytes(),
+                    'traced_bytes': tracemalloc.get_traced_memory()[0] if trace else None
+                })
+                logger.info(f"Soak {position}/{requests}: {samples[-1]}")
+            if trace and position == warmup:
+                warm_sizes = site_sizes(tracemalloc.take_snapshot())
+        growth_sites = top_sites(warm_sizes, site_sizes(tracemalloc.take_snapshot()), limit) if warm_sizes else []
+
+    measured = [sample for sample in samples if sample['request'] > warmup] or samples
+    positions = [sample['request'] for sample in measured]
+    rss_growth = growth_per_thousand(positions, [sample['rss_bytes'] for sample in measured])
+    traced_growth = (growth_per_thousand(positions, [sample['traced_bytes'] for sample in measured])
+                     if trace else None)
+    # Traced memory pins leaks to Python objects; RSS also catches native growth but is noisier
+    growing = (traced_growth if trace else rss_growth) > growth_limit_kb * 1024
+
+    return {
+        'requests': requests,
+        'failures': failures,
+        'elapsed_s': round(time.perf_counter() - started, 2),
+        'warmup_requests': warmup,
+        'samples': samples,
+        'rss_growth_bytes_per_1k': round(rss_growth),
+        'traced_growth_bytes_per_1k': round(traced_growth) if traced_growth is not None else None,
+        'growth_limit_bytes_per_1k': growth_limit_kb * 1024,
+        'growing': bool(growing),
+        'growth_sites': growth_sites
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Per-stage memory accounting and soak tests")
+    parser.add_argument('--workload', nargs='+', default=[DEFAULT_WORKLOAD])
+    parser.add_argument('--soak', type=int, default=None, metavar='REQUESTS',
+                        help="Run this many requests and report memory growth")
+    parser.add_argument('--sample-every', type=int, default=SOAK_SAMPLE_EVERY)
+    parser.add_argument('--growth-limit-kb', type=float, default=SOAK_GROWTH_LIMIT_KB)
+    parser.add_argument('--no-trace', action='store_true', help="Soak with RSS sampling only (no tracemalloc overhead)")
+    parser.add_argument('--exact', action='store_true')
+    parser.add_argument('--persist', action='store_true', help="Record calculations as the API does")
+    parser.add_argument('--nasa', action='store_true', help="Query NASA POWER for inputs with coordinates")
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    settings.PERSIST_CALCULATIONS = args.persist
+    settings.NASA_POWER_ENABLED = args.nasa
+    workload = load_workload(args.workload)
+    orchestrator = SolarSystemOrchestrator()
+    if args.soak:
+        report = soak(orchestrator, workload, args.soak, args.sample_every, not args.no_trace,
+                      growth_limit_kb=args.growth_limit_kb)
+    else:
+        report = {'calculations': [stage_memory(orchestrator, user_input, exact=args.exact)
+                                   for user_input in workload]}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    if args.soak and report['growing']:
+        sys.exit(1)
@@ -0,0 +1,142 @@
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# What each process kind imports and builds before it can serve work
+STARTUP_TARGETS = {
+    'api': "import services.api.main",
+    'worker': ("import services.job_queue\n"
+               "from services.orchestrator import SolarSystemOrchestrator\n"
+               "orchestrator = SolarSystemOrchestrator()"),
+    'orchestrator': "import services.orchestrator"
+}
+
+# Seconds from process launch until the target is ready (fastest of the runs)
+STARTUP_BUDGETS = {'api': 1.0, 'worker': 0.5, 'orchestrator': 0.5}
+
+# Modules that only requests should load; finding one at startup means an
+# eager import crept back in
+HEAVY_MODULES = ('pandas', 'numpy', 'scipy', 'requests', 'agents')
+
+TOP_IMPORTS = 15
+
+# Runs in the child process after the target: reports the import time
+# measured in-process and which heavy modules were loaded
+_REPORT = """
+import json, sys, time
+_imported = time.perf_counter() - _started
+_timings = {{}}
+if {warm_up}:
+    from services.orchestrator import SolarSystemOrchestrator
+    _timings = (orchestrator if 'orchestrator' in globals() else SolarSystemOrchestrator()).warm_up()
+print(json.dumps({{
+    'import_s': _imported,
+    'warm_up_s': _timings,
+    'heavy_modules': sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+}}))
+"""
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Modules from a `python -X importtime` report, with self and cumulative microseconds"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        # One space follows the separator, then two per nesting level
+        name = fields[2].rstrip()[1:]
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(fields[0]),
+            'cumulative_us': int(fields[1])
+        })
+    return modules
+
+def top_imports(modules: List[Dict[str, Any]], limit: int = TOP_IMPORTS) -> List[Dict[str, Any]]:
+    """Modules imported directly by the target's own imports, by cumulative time, slowest first"""
+    direct = [module for module in modules if module['depth'] == 1]
+    return sorted(direct, key=lambda module: module['cumulative_us'], reverse=True)[:limit]
+
+def _run_target(code: str, importtime: bool, warm_up: bool, env: Dict[str, str]) -> Dict[str, Any]:
+    script = (f"import time\n_started = time.perf_counter()\n{code}\n"
+              + _REPORT.format(warm_up=warm_up, heavy=HEAVY_MODULES))
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', script]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup target failed:\n{completed.stderr[-2000:]}")
+    return {'wall_s': wall, 'stderr': completed.stderr, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+def measure_startup(target: str, runs: int = 5, warm_up: bool = False,
+                    limit: int = TOP_IMPORTS) -> Dict[str, Any]:
+    """
+    Start a fresh interpreter for the target `runs` times, recording the
+    fastest wall time (launch to ready) and in-process import time, then
+    once more under -X importtime for the per-module report. With warm_up,
+    a further run times the orchestrator's warm-up after startup.
+    """
+    code = STARTUP_TARGETS[target]
+    with tempfile.TemporaryDirectory() as scratch:
+        env = {**os.environ, 'PYTHONPATH': os.getcwd(), 'NASA_POWER_ENABLED': 'false',
+               'DATABASE_PATH': os.path.join(scratch, 'startup.db')}
+        samples = [_run_target(code, False, False, env) for _ in range(runs)]
+        traced = _run_target(code, True, False, env)
+        warmed = _run_target(code, False, True, env) if warm_up else None
+
+    return {
+        'target': target,
+        'runs': runs,
+        'wall_s': round(min(sample['wall_s'] for sample in samples), 3),
+        'import_s': round(min(sample['import_s'] for sample in samples), 3),
+        'heavy_modules': traced['heavy_modules'],
+        'warm_up_s': warmed['warm_up_s'] if warmed else None,
+        'top_imports': top_imports(parse_importtime(traced['stderr']), limit)
+    }
+
+def check_budgets(results: Sequence[Dict[str, Any]],
+                  budgets: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Targets whose startup wall time exceeds their budget"""
+    budgets = {**STARTUP_BUDGETS, **(budgets or {})}
+    return [{'target': result['target'], 'wall_s': result['wall_s'], 'budget_s': budgets[result['target']]}
+            for result in results
+            if result['target'] in budgets and result['wall_s'] > budgets[result['target']]]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Measure API and worker startup time against a budget")
+    parser.add_argument('--targets', nargs='+', choices=list(STARTUP_TARGETS), default=list(STARTUP_TARGETS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warm-up', action='store_true', help="Also time loading agents and data after startup")
+    parser.add_argument('--budget', nargs='+', default=[], metavar='TARGET=SECONDS')
+    parser.add_argument('--top', type=int, default=TOP_IMPORTS)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    budgets = {target: float(seconds) for target, seconds in (item.split('=', 1) for item in args.budget)}
+    results = [measure_startup(target, args.runs, args.warm_up, args.top) for target in args.targets]
+    over = check_budgets(results, budgets)
+
+    output = json.dumps({'results': results, 'over_budget': over}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    for result in results:
+        if result['heavy_modules']:
+            print(f"{result['target']} loads heavy modules at startup: {', '.join(result['heavy_modules'])}",
+                  file=sys.stderr)
+    for item in over:
+        print(f"OVER BUDGET {item['target']}: {item['wall_s']}s > {item['budget_s']}s", file=sys.stderr)
+    sys.exit(1 if over else 0)
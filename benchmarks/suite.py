@@ -0,0 +1,235 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from config.settings import settings
+from benchmarks.catalog import DEFAULT_CATALOG_ROOT, generate_catalog, synthetic_catalog_path
+from core import catalog as catalog_module
+from core.catalog import ComponentCatalog
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+
+logger = logging.getLogger(__name__)
+
+# Catalog sizes (rows per component type) benchmarked by default
+DEFAULT_SCALES = (5_000, 50_000, 500_000, 5_000_000)
+DEFAULT_RESULTS_PATH = "benchmarks/results"
+
+# A typical household request, calculated in full at every scale
+BENCHMARK_REQUEST = {
+    "location": "Kano",
+    "budget": 1500000,
+    "backup_hours": 6,
+    "appliances": [
+        {"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+        {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1},
+        {"appliance": "Television", "power_rating": 100, "hours_per_day": 5, "quantity": 1},
+        {"appliance": "Ceiling Fan", "power_rating": 75, "hours_per_day": 8, "quantity": 2}
+    ]
+}
+
+# Median slowdown flagged as a regression, and the smallest change in
+# milliseconds worth flagging (below it, timer noise dominates)
+REGRESSION_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 2.0
+
+def time_call(function: Callable[[], Any], repeats: int, budget_seconds: float) -> Dict[str, Any]:
+    """Time repeated calls, stopping early once the budget is spent"""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+        if sum(samples) > budget_seconds * 1000:
+            break
+    return {
+        'runs': len(samples),
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3)
+    }
+
+@contextmanager
+def use_catalog(catalog: ComponentCatalog) -> Iterator[ComponentCatalog]:
+    """Serve every agent from another component catalog for the duration"""
+    with catalog_module._catalog_lock:
+        previous, catalog_module._catalog = catalog_module._catalog, catalog
+    try:
+        yield catalog
+    finally:
+        with catalog_module._catalog_lock:
+            catalog_module._catalog = previous
+
+def record_stage_inputs(orchestrator: SolarSystemOrchestrator, request: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """The input each agent receives during one full calculation, by stage"""
+    inputs: Dict[str, Dict[str, Any]] = {}
+    originals = {stage: agent.process for stage, agent in orchestrator.agents.items()}
+
+    def recording(stage):
+        def process(input_data):
+            inputs.setdefault(stage, copy.deepcopy(input_data))
+            return originals[stage](input_data)
+        return process
+
+    for stage, agent in orchestrator.agents.items():
+        agent.process = recording(stage)
+    try:
+        orchestrator.stage_cache.clear()
+        orchestrator.calculate_solar_system(request, 'full', exact=True)
+    finally:
+        for stage, agent in orchestrator.agents.items():
+            agent.process = originals[stage]
+    return inputs
+
+def benchmark_scale(rows: int, repeats: int, budget_seconds: float, skip: Dict[str, str],
+                    catalog_root: str = DEFAULT_CATALOG_ROOT,
+                    request: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Time catalog loading, each agent, the pipeline and the API over a
+    generated catalog of `rows` rows per component type. Benchmarks named
+    in skip are recorded with the reason instead of being run.
+    """
+    from fastapi.testclient import TestClient
+    from services.api import main as api
+
+    request = request or BENCHMARK_REQUEST
+    path = generate_catalog(rows, synthetic_catalog_path(rows, catalog_root))
+    results: Dict[str, Dict[str, Any]] = {}
+    catalog = None
+
+    def build_catalog():
+        nonlocal catalog
+        catalog = ComponentCatalog(path)
+
+    results['catalog.load'] = time_call(build_catalog, 1, budget_seconds)
+    logger.info(f"{rows} rows catalog.load: {results['catalog.load']}")
+
+    with use_catalog(catalog):
+        orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+        client = TestClient(api.app)
+
+        def cold_pipeline():
+            orchestrator.stage_cache.clear()
+            orchestrator.calculate_solar_system(request, 'full', exact=True)
+
+        def api_calculate():
+            if api.orchestrator.stage_cache is not None:
+                api.orchestrator.stage_cache.clear()
+            response = client.post("/api/v1/calculate", params={'exact': 'true'}, json=request)
+            response.raise_for_status()
+
+        benchmarks: Dict[str, Callable[[], Any]] = {}
+        for stage, input_data in record_stage_inputs(orchestrator, request).items():
+            benchmarks[f"agent.{stage}"] = (lambda agent, data: lambda: agent.process(data))(
+                orchestrator.agents[stage], input_data)
+        benchmarks['pipeline.cold'] = cold_pipeline
+        benchmarks['pipeline.warm'] = lambda: orchestrator.calculate_solar_system(request, 'full', exact=True)
+        benchmarks['api.calculate'] = api_calculate
+
+        for name, function in benchmarks.items():
+            if name in skip:
+                results[name] = {'skipped': skip[name]}
+                continue
+            results[name] = time_call(function, repeats, budget_seconds)
+            if results[name]['median_ms'] > budget_seconds * 1000:
+                skip[name] = f"over the {budget_seconds:g}s budget at {rows} rows"
+            logger.info(f"{rows} rows {name}: {results[name]}")
+    return results
+
+def run_benchmarks(scales: Sequence[int] = DEFAULT_SCALES, repeats: int = 5, budget_seconds: float = 60,
+                   catalog_root: str = DEFAULT_CATALOG_ROOT,
+                   request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Benchmark every scale, smallest first. A benchmark whose median exceeds
+    the budget at one scale is skipped at the larger ones.
+    """
+    persist = settings.PERSIST_CALCULATIONS
+    settings.PERSIST_CALCULATIONS = False
+    try:
+        skip: Dict[str, str] = {}
+        results = {str(rows): benchmark_scale(rows, repeats, budget_seconds, skip, catalog_root, request)
+                   for rows in sorted(scales)}
+    finally:
+        settings.PERSIST_CALCULATIONS = persist
+
+    return {
+        'commit': _git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeats': repeats,
+        'results': results
+    }
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD,
+                    noise_floor_ms: float = NOISE_FLOOR_MS) -> List[Dict[str, Any]]:
+    """Benchmarks whose median slowed by more than threshold (and the noise floor) since the baseline"""
+    regressions = []
+    for scale, benchmarks in current['results'].items():
+        for name, timing in benchmarks.items():
+            before = baseline['results'].get(scale, {}).get(name, {})
+            if 'median_ms' not in timing or 'median_ms' not in before:
+                continue
+            slowdown = timing['median_ms'] - before['median_ms']
+            if timing['median_ms'] > before['median_ms'] * (1 + threshold) and slowdown > noise_floor_ms:
+                regressions.append({
+                    'scale': scale,
+                    'benchmark': name,
+                    'baseline_ms': before['median_ms'],
+                    'current_ms': timing['median_ms'],
+                    'ratio': round(timing['median_ms'] / before['median_ms'], 2)
+                })
+    return regressions
+
+def save_results(results: Dict[str, Any], path: Optional[str] = None) -> str:
+    """Write results as JSON, by default named after the commit they were taken at"""
+    path = path or os.path.join(DEFAULT_RESULTS_PATH, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def _git_commit() -> str:
+    """Short hash of the checked-out commit, with '-dirty' for uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return time.strftime('unversioned-%Y%m%d%H%M%S')
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Benchmark agents, the pipeline and the API over growing catalogs")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget-seconds', type=float, default=60)
+    parser.add_argument('--catalog-root', default=DEFAULT_CATALOG_ROOT)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--baseline', default=None, help="Results file to check for slowdowns against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.repeats, args.budget_seconds, args.catalog_root)
+    print(f"Results written to {save_results(results, args.output)}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(json.load(f), results, args.threshold)
+        for regression in regressions:
+            print(f"SLOWER {regression['benchmark']} at {regression['scale']} rows: "
+                  f"{regression['baseline_ms']} -> {regression['current_ms']} ms ({regression['ratio']}x)")
+        sys.exit(1 if regressions else 0)
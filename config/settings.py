@@ -1,10 +1,14 @@
-from pydantic import BaseSettings
-from typing import Optional
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:  # pydantic v1
+    from pydantic import BaseSettings
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./solar_calculator.db"
+    DATABASE_PATH: str = "data/solar_calculator.db"
     
     # Redis Cache
     REDIS_URL: str = "redis://localhost:6379"
@@ -12,6 +16,7 @@ class Settings(BaseSettings):
     # NASA POWER API
     NASA_POWER_API_BASE: str = "https://power.larc.nasa.gov/api"
     NASA_POWER_API_TIMEOUT: int = 30
+    NASA_POWER_ENABLED: bool = True  # off: coordinates use the offline latitude estimate
     
     # File paths
     DATA_PATH: str = "data"
@@ -25,20 +30,122 @@ class Settings(BaseSettings):
     PANELS_CSV: str = "data/raw/panels.csv"
     APPLIANCES_CSV: str = "data/raw/appliances.csv"
     
+    # Component catalog hot reload: the catalog is built from the raw CSVs,
+    # or from the newest complete snapshot directory under
+    # CATALOG_SNAPSHOT_PATH when set. Running processes check the source
+    # every CATALOG_RELOAD_INTERVAL_SECONDS (0 disables) and swap in a
+    # rebuilt catalog once a change has been stable for one interval.
+    CATALOG_SNAPSHOT_PATH: Optional[str] = None
+    CATALOG_RELOAD_INTERVAL_SECONDS: float = 30.0
+    
     # System constants
     DEFAULT_SYSTEM_EFFICIENCY: float = 0.8
     DEFAULT_BATTERY_DOD: float = 0.8
     DEFAULT_PEAK_SUN_HOURS: float = 6.0
     
+    # Stage cache (per-agent memoization of intermediate results)
+    STAGE_CACHE_ENABLED: bool = True
+    STAGE_CACHE_DEFAULT_SIZE: int = 256
+    STAGE_CACHE_SIZES: Dict[str, int] = {
+        "load_calculator": 1024,
+        "irradiance_agent": 2048,
+        "panel_sizing": 1024,
+        "battery_sizing": 1024,
+        "component_matching": 512,
+        "cost_optimizer": 512,
+        "simulation": 256
+    }
+    STAGE_CACHE_QUANTIZE: bool = False
+    
+    # Calculation snapshots kept for incremental recalculation
+    CALCULATION_STORE_SIZE: int = 64
+    
+    # Calculation history (written in batches off the request path)
+    PERSIST_CALCULATIONS: bool = True
+    DB_WRITE_BATCH_SIZE: int = 200
+    DB_WRITE_FLUSH_SECONDS: float = 0.5
+    DB_WRITE_QUEUE_SIZE: int = 10000
+    
+    # Installed-system telemetry
+    TELEMETRY_RAW_RETENTION_DAYS: int = 90
+    TELEMETRY_MAX_BODY_BYTES: int = 64 * 1024 * 1024
+    
+    # Component feedback: ratings are smoothed towards the mean rating of the
+    # component type as if each model had this many extra average ratings
+    FEEDBACK_PRIOR_WEIGHT: float = 5.0
+    FEEDBACK_PRIOR_MEAN: float = 3.0
+    
+    # Fleet actual-vs-simulated analysis
+    FLEET_ANALYSIS_DAYS: int = 30
+    FLEET_ANALYSIS_WORKERS: int = 4
+    FLEET_CHUNK_SIZE: int = 2000
+    FLEET_MIN_PERFORMANCE_RATIO: float = 0.75
+    FLEET_ANOMALY_THRESHOLD: float = 3.0
+    FLEET_MIN_DAYS: int = 3
+    
+    # Quick-estimate surrogate model (python -m services.surrogate trains it)
+    SURROGATE_MODEL_PATH: str = "data/models/surrogate.npz"
+    SURROGATE_TRAINING_SAMPLES: int = 1500
+    SURROGATE_COVERAGE: float = 0.9
+    
+    # Precomputed design lookup table (python -m services.design_table builds
+    # it per catalog version); grid points for each axis. Opt-in: tabled
+    # designs are sized for the request snapped up to the grid (10.1 kWh/day
+    # is sized as the next grid point), so they can be larger and costlier
+    # than the exact calculation.
+    DESIGN_TABLE_ENABLED: bool = False
+    DESIGN_TABLE_PATH: str = "data/models/design_table_{version}.npz"
+    DESIGN_TABLE_WORKERS: int = 4
+    DESIGN_TABLE_AXES: Dict[str, List[float]] = {
+        "daily_consumption_kwh": [1, 1.25, 1.5, 1.75, 2, 2.5, 3, 3.5, 4, 5, 6, 7, 8, 10, 12, 14, 17, 20, 25, 30],
+        "peak_sun_hours": [4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0],
+        "backup_hours": [4, 6, 8, 12, 16, 24, 36, 48],
+        "peak_load_watts": [250, 350, 500, 700, 1000, 1400, 2000, 2800, 4000, 5600, 8000]
+    }
+    
+    # Parameter sweeps (/api/v1/sweep): largest grid evaluated in one request
+    SWEEP_MAX_POINTS: int = 2500
+    
+    # Batch calculations
+    BATCH_MAX_WORKERS: int = 4
+    BATCH_MAX_IN_FLIGHT: int = 32
+    BATCH_DEDUP_CACHE_SIZE: int = 256
+    BATCH_MAX_RECORDS: int = 100000
+    
+    # Job queue
+    JOB_WORKERS: int = 2
+    JOB_EMBEDDED_WORKERS: int = 0  # worker processes started inside the API process
+    JOB_MAX_RUNNING_PER_CLIENT: int = 2
+    JOB_MAX_PENDING_PER_CLIENT: int = 50
+    JOB_RESULT_TTL_SECONDS: int = 24 * 3600
+    JOB_STALE_SECONDS: int = 3600
+    JOB_POLL_INTERVAL_SECONDS: float = 0.5
+    
     # API settings
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     API_WORKERS: int = 1
     
+    # Agents, the catalog and the design table load on first use, so API
+    # and worker processes start fast. STARTUP_WARM_UP loads them during
+    # startup instead, trading a slower start for no cold first request.
+    STARTUP_WARM_UP: bool = False
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/solar_calculator.log"
     
+    # Per-request profiling: requests carrying PROFILE_ADMIN_TOKEN in an
+    # X-Profile header (or ?profile=) are profiled, as is a random
+    # PROFILE_SAMPLE_RATE fraction of all requests. With neither set the
+    # profiling middleware is not installed at all.
+    PROFILE_ADMIN_TOKEN: Optional[str] = None
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_MODE: str = "sampling"  # or "tracing" (every call, slower but exact)
+    PROFILE_INTERVAL_MS: float = 1.0
+    PROFILE_FORMAT: str = "speedscope"  # or "collapsed" (flamegraph.pl stacks)
+    PROFILE_OUTPUT_PATH: str = "logs/profiles"
+    
     # Security
     SECRET_KEY: str = "your-secret-key-here"  # Change in production
     
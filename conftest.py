@@ -0,0 +1,5 @@
+import tempfile
+from config.settings import settings
+
+# Keep the calculation history and job queue written during tests out of data/
+settings.DATABASE_PATH = f"{tempfile.mkdtemp(prefix='solar-tests-')}/solar_calculator.db"
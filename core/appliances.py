@@ -0,0 +1,181 @@
+import bisect
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from config.settings import settings
+from core.exceptions import DataNotFoundError
+
+# Raw appliance CSV columns renamed to library fields
+APPLIANCE_COLUMNS = {
+    'Category': 'category',
+    'Appliance': 'appliance',
+    'Type/Variant': 'variant',
+    'Min Power (W)': 'min_power_w',
+    'Max Power (W)': 'max_power_w',
+    'Surge Factor': 'surge_factor',
+    'Typical Hours/day': 'hours_range',
+    'Notes': 'notes'
+}
+
+# Minimum trigram similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric tokens"""
+    return _TOKEN_PATTERN.findall((text or '').lower())
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of the padded, normalized text"""
+    padded = f"  {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def parse_hours_range(value: Any) -> Tuple[float, float]:
+    """Parse typical hours such as '0.5–2', '24' or '<1' into (min, max)"""
+    text = str(value).strip().replace('—', '–').replace('-', '–')
+    if text.startswith('<'):
+        return 0.0, float(text[1:])
+    if '–' in text:
+        low, high = text.split('–', 1)
+        return float(low), float(high)
+    hours = float(text)
+    return hours, hours
+
+def normalize_appliance_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Map the raw appliance CSV onto numeric, fully populated library columns"""
+    df = df.rename(columns=lambda column: APPLIANCE_COLUMNS.get(column.strip(), column.strip()))
+
+    # Blank appliance cells continue the appliance named on an earlier row
+    df['appliance'] = df['appliance'].ffill()
+    df['variant'] = df['variant'].fillna('Standard')
+    df['notes'] = df['notes'].fillna('')
+
+    hours = df['hours_range'].map(parse_hours_range)
+    df['min_hours'] = hours.str[0]
+    df['max_hours'] = hours.str[1]
+
+    df['min_power_w'] = df['min_power_w'].astype(float)
+    df['max_power_w'] = df['max_power_w'].astype(float)
+    # A zero surge factor means "not recorded": assume no surge
+    df['surge_factor'] = df['surge_factor'].where(df['surge_factor'] > 0, 1.0)
+
+    # Defaults used to prefill a load survey
+    df['power_rating'] = ((df['min_power_w'] + df['max_power_w']) / 2).round(1)
+    df['hours_per_day'] = ((df['min_hours'] + df['max_hours']) / 2).round(2)
+    df['name'] = df['appliance'] + ' - ' + df['variant']
+
+    df.insert(0, 'id', range(1, len(df) + 1))
+    return df.drop(columns=['hours_range'])
+
+class ApplianceLibrary:
+    """Appliance library parsed once, with a token prefix index and a trigram index for typeahead"""
+
+    def __init__(self, data_path: Optional[str] = None):
+        self.data_path = data_path or settings.APPLIANCES_CSV
+        if not os.path.exists(self.data_path):
+            raise DataNotFoundError(f"Appliance data file not found: {self.data_path}")
+
+        with open(self.data_path, 'rb') as f:
+            content = f.read()
+        self.version = hashlib.sha1(content).hexdigest()[:16]
+
+        self.df = normalize_appliance_frame(pd.read_csv(io.BytesIO(content), encoding='utf-8-sig'))
+        self.records: List[Dict[str, Any]] = self.df.to_dict('records')
+        self.categories = sorted(self.df['category'].unique().tolist())
+        self._names = [' '.join(tokenize(record['name'])) for record in self.records]
+
+        # Prefix index: sorted (token, row) pairs searched with bisect
+        pairs = set()
+        self._trigram_index: Dict[str, Set[int]] = defaultdict(set)
+        self._trigrams: List[Set[str]] = []
+        for row, record in enumerate(self.records):
+            searchable = f"{record['appliance']} {record['variant']}"
+            for token in tokenize(searchable):
+                pairs.add((token, row))
+            grams = trigrams(searchable)
+            self._trigrams.append(grams)
+            for gram in grams:
+                self._trigram_index[gram].add(row)
+
+        self._tokens = sorted(pairs)
+        self._token_keys = [token for token, _ in self._tokens]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _prefix_rows(self, prefix: str) -> Set[int]:
+        """Rows with any token starting with prefix"""
+        start = bisect.bisect_left(self._token_keys, prefix)
+        stop = bisect.bisect_left(self._token_keys, prefix + '￿')
+        return {row for _, row in self._tokens[start:stop]}
+
+    def _fuzzy_rows(self, query: str) -> List[Tuple[float, int]]:
+        """(similarity, row) for rows sharing enough trigrams with the query"""
+        grams = trigrams(query)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for row in self._trigram_index.get(gram, ()):
+                shared[row] += 1
+
+        scored = []
+        for row, count in shared.items():
+            similarity = count / len(grams | self._trigrams[row])
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((similarity, row))
+        return scored
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Typeahead search over appliance and variant names.
+
+        Every query token must prefix-match a name token; exact-prefix hits
+        rank first (names starting with the query ahead of the rest), then
+        fuzzy trigram matches fill the remaining slots so typos still
+        return suggestions.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        rows = self._prefix_rows(tokens[0])
+        for token in tokens[1:]:
+            rows &= self._prefix_rows(token)
+
+        normalized = ' '.join(tokens)
+        ranked = sorted(
+            rows,
+            key=lambda row: (not self._names[row].startswith(normalized), len(self._names[row]), row)
+        )
+        def in_category(row):
+            return not category or self.records[row]['category'].lower() == category.lower()
+
+        # Filter by category before counting, so fuzzy matches fill any slots
+        # the category leaves open
+        matches = [(1.0, row) for row in ranked if in_category(row)]
+
+        if len(matches) < limit:
+            fuzzy = sorted(self._fuzzy_rows(query), key=lambda item: (-item[0], item[1]))
+            matches += [(score, row) for score, row in fuzzy if row not in rows and in_category(row)]
+
+        return [{**self.records[row], 'score': round(score, 3)} for score, row in matches[:limit]]
+
+_library: Optional[ApplianceLibrary] = None
+_library_lock = threading.Lock()
+
+def get_appliance_library() -> ApplianceLibrary:
+    """Return the process-wide appliance library, parsing the CSV on first use"""
+    global _library
+
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = ApplianceLibrary()
+    return _library
@@ -0,0 +1,365 @@
+import base64
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from core.exceptions import ValidationError
+from core.validators import validate_component_data
+
+# Raw CSV columns renamed to the fields in data/schemas/component_schemas.py
+COLUMN_MAPS = {
+    'panel': {'panel_id': 'model', 'panel_type': 'type', 'rated_power_w': 'power_rating', 'price_NGN': 'price'},
+    'battery': {'battery_id': 'model', 'price_NGN': 'price'},
+    'inverter': {'inverter_id': 'model', 'mode': 'type', 'rated_power_w': 'power_rating',
+                 'voltage_input': 'input_voltage', 'derating_factor': 'efficiency', 'price_NGN': 'price'},
+    'controller': {'controller_id': 'model', 'max_current_A': 'max_current', 'max_voltage_V': 'voltage',
+                   'derating_factor': 'efficiency', 'price_NGN': 'price'}
+}
+
+DEFAULT_DATA_PATH = "data/raw/"
+
+COMPONENT_FILES = {
+    'battery': 'batteries.csv',
+    'controller': 'controllers.csv',
+    'inverter': 'inverters.csv',
+    'panel': 'panels.csv'
+}
+
+# Range filters exposed by the API, mapped to catalog columns per component type
+RANGE_FILTERS = {
+    'panel': {'power': 'power_rating', 'voltage': 'voltage', 'price': 'price'},
+    'battery': {'capacity': 'capacity_ah', 'voltage': 'voltage', 'price': 'price'},
+    'inverter': {'power': 'power_rating', 'voltage': 'input_voltage', 'price': 'price'},
+    'controller': {'current': 'max_current', 'voltage': 'voltage', 'price': 'price'}
+}
+
+CATEGORY_FILTERS = ('brand', 'type')
+
+# Feedback-derived columns on every component type: number of ratings, mean
+# rating and smoothed score (see ComponentCatalog.with_ratings)
+RATING_COLUMNS = ('rating_count', 'rating_mean', 'rating_score')
+
+def normalize_component_frame(df: pd.DataFrame, component_type: str) -> pd.DataFrame:
+    """Map a raw component CSV onto the component schema columns"""
+    df = df.rename(columns=COLUMN_MAPS.get(component_type, {}))
+
+    if component_type == 'panel' and 'area_m2' in df.columns and 'efficiency' not in df.columns:
+        # Module efficiency: rated watts per m² at 1000 W/m² irradiance
+        df['efficiency'] = (df['power_rating'] / (df['area_m2'] * 1000)).round(4)
+
+    df = validate_component_data(df.copy(), component_type)
+    leading = [column for column in ('model', 'brand', 'type') if column in df.columns]
+    return df[leading + [column for column in df.columns if column not in leading]].reset_index(drop=True)
+
+class ComponentIndex:
+    """Prebuilt lookup structures for one component type"""
+
+    def __init__(self, component_type: str, df: pd.DataFrame):
+        self.component_type = component_type
+        self.df = df
+        self.columns = list(df.columns)
+        # Materialized once so requests only slice and project
+        self.records = json.loads(df.to_json(orient='records'))
+
+        # Range filters: values sorted once, queried by binary search
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.sort_orders: Dict[str, np.ndarray] = {}
+        self.ranks: Dict[str, np.ndarray] = {}
+        for column in df.columns:
+            if pd.api.types.is_numeric_dtype(df[column]):
+                self._sort_column(column)
+
+        self.model_rows = {model: row for row, model in enumerate(df['model'])} if 'model' in df.columns else {}
+
+        # Category filters: row ids per lower-cased value
+        self.categories: Dict[str, Dict[str, np.ndarray]] = {}
+        for column in CATEGORY_FILTERS:
+            if column in df.columns:
+                groups = df.groupby(df[column].str.lower(), sort=False).indices
+                self.categories[column] = {key: np.sort(ids) for key, ids in groups.items()}
+
+    def _sort_column(self, column: str) -> None:
+        values = self.df[column].to_numpy()
+        order = np.argsort(values, kind='stable')
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        self.sort_orders[column] = order
+        self.sorted_values[column] = values[order]
+        self.ranks[column] = ranks
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def with_ratings(self, ratings: Dict[str, Tuple[int, float, float]], default_score: float) -> 'ComponentIndex':
+        """
+        A copy of this index with (count, mean, score) per model in the
+        rating columns; unrated models get default_score. This index is left
+        untouched, as catalogs in use may hold it.
+        """
+        index = copy.copy(self)
+        index.df = self.df.copy()
+        index.columns = list(self.columns)
+        index.records = [dict(record) for record in self.records]
+        index.sorted_values = dict(self.sorted_values)
+        index.sort_orders = dict(self.sort_orders)
+        index.ranks = dict(self.ranks)
+        index._set_ratings(ratings, default_score)
+        return index
+
+    def _set_ratings(self, ratings: Dict[str, Tuple[int, float, float]], default_score: float) -> None:
+        counts = np.zeros(len(self.df), dtype=np.int64)
+        means = np.full(len(self.df), np.nan)
+        scores = np.full(len(self.df), float(default_score))
+        for model, (count, mean, score) in ratings.items():
+            row = self.model_rows.get(model)
+            if row is not None:
+                counts[row], means[row], scores[row] = count, mean, score
+
+        for column, values in zip(RATING_COLUMNS, (counts, means, scores)):
+            self.df[column] = values
+            self._sort_column(column)
+        if 'rating_count' not in self.columns:
+            self.columns += list(RATING_COLUMNS)
+
+        for record, count, mean, score in zip(self.records, counts.tolist(), means.tolist(), scores.tolist()):
+            record['rating_count'] = count
+            record['rating_mean'] = None if mean != mean else round(mean, 3)
+            record['rating_score'] = round(score, 3)
+
+    def range_ids(self, column: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        """Row ids with low <= value <= high"""
+        values = self.sorted_values[column]
+        start = np.searchsorted(values, low, side='left') if low is not None else 0
+        stop = np.searchsorted(values, high, side='right') if high is not None else len(values)
+        return self.sort_orders[column][start:stop]
+
+    def category_ids(self, column: str, values: List[str]) -> np.ndarray:
+        """Row ids matching any of the given category values"""
+        groups = self.categories.get(column, {})
+        matches = [groups[value.lower()] for value in values if value.lower() in groups]
+        return np.concatenate(matches) if matches else np.empty(0, dtype=np.int64)
+
+class ComponentCatalog:
+    """In-memory, versioned component catalog built from the raw CSVs"""
+
+    def __init__(self, data_path: str = DEFAULT_DATA_PATH):
+        self.data_path = data_path
+        self.indexes: Dict[str, ComponentIndex] = {}
+        digest = hashlib.sha1()
+
+        for component_type, filename in sorted(COMPONENT_FILES.items()):
+            file_path = os.path.join(data_path, filename)
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Component data file not found: {file_path}")
+
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            digest.update(content)
+
+            raw = pd.read_csv(io.BytesIO(content))
+            self.indexes[component_type] = ComponentIndex(
+                component_type, normalize_component_frame(raw, component_type)
+            )
+            # Unrated until feedback aggregates are applied
+            self.indexes[component_type]._set_ratings({}, settings.FEEDBACK_PRIOR_MEAN)
+
+        self.content_version = digest.hexdigest()
+        self.version = self.content_version[:16]
+        self._ratings: Dict[str, Any] = {}
+        self.ratings_version = _ratings_version(self._ratings)
+
+    def index(self, component_type: str) -> ComponentIndex:
+        """Get the index for a component type"""
+        if component_type not in self.indexes:
+            raise ValidationError(f"Unknown component type: {component_type}")
+        return self.indexes[component_type]
+
+    def with_ratings(self, ratings: Dict[str, Dict[str, Any]]) -> 'ComponentCatalog':
+        """
+        A copy of this catalog with feedback aggregates in the rating columns.
+
+        ratings maps component type to {'default_score': score for unrated
+        models, 'models': {model: (count, mean, score)}}; types not in it
+        keep their current ratings and share this catalog's index. A catalog
+        is never modified once built, so calculations pinned to it see the
+        same rows throughout. version follows the component data only;
+        ratings_version follows the ratings.
+        """
+        catalog = copy.copy(self)
+        catalog.indexes = dict(self.indexes)
+        catalog._ratings = dict(self._ratings)
+        for component_type, entry in ratings.items():
+            if component_type in self.indexes:
+                catalog.indexes[component_type] = self.indexes[component_type].with_ratings(
+                    entry['models'], entry['default_score']
+                )
+                catalog._ratings[component_type] = entry
+        catalog.ratings_version = _ratings_version(catalog._ratings)
+        return catalog
+
+    def query_version(self, sort: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+        """
+        Version of what a query returns: the data version, plus the ratings
+        version when the query sorts by or returns rating columns.
+        """
+        reads_ratings = (not fields or any(field in RATING_COLUMNS for field in fields)
+                         or (sort or '').lstrip('-') in RATING_COLUMNS)
+        return f"{self.version}.{self.ratings_version}" if reads_ratings else self.version
+
+    def frame(self, component_type: str) -> pd.DataFrame:
+        """Normalized DataFrame for a component type (shared; do not modify)"""
+        return self.index(component_type).df
+
+    def query(self, component_type: str, ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+              categories: Optional[Dict[str, List[str]]] = None, sort: Optional[str] = None,
+              offset: int = 0, limit: int = 50, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Filter, sort and page one component type using the prebuilt indexes.
+
+        ranges maps API filter names (power, voltage, price, ...) to (min, max);
+        categories maps 'brand'/'type' to accepted values; sort is a column
+        name, prefixed with '-' for descending order.
+        """
+        index = self.index(component_type)
+        allowed_ranges = RANGE_FILTERS[component_type]
+        selected: Optional[np.ndarray] = None
+
+        def narrow(ids: np.ndarray) -> None:
+            nonlocal selected
+            mask = np.zeros(len(index), dtype=bool)
+            mask[ids] = True
+            selected = mask if selected is None else selected & mask
+
+        for name, (low, high) in (ranges or {}).items():
+            if low is None and high is None:
+                continue
+            if name not in allowed_ranges:
+                raise ValidationError(f"Filter '{name}' is not available for {component_type}")
+            narrow(index.range_ids(allowed_ranges[name], low, high))
+
+        for column, values in (categories or {}).items():
+            if values:
+                narrow(index.category_ids(column, values))
+
+        ids = np.flatnonzero(selected) if selected is not None else np.arange(len(index))
+
+        if sort:
+            column = sort.lstrip('-')
+            if column not in index.ranks:
+                raise ValidationError(f"Cannot sort {component_type} by '{column}'")
+            ids = ids[np.argsort(index.ranks[column][ids], kind='stable')]
+            if sort.startswith('-'):
+                ids = ids[::-1]
+
+        if fields:
+            unknown = set(fields) - set(index.columns)
+            if unknown:
+                raise ValidationError(f"Unknown fields for {component_type}: {sorted(unknown)}")
+
+        page = ids[offset:offset + limit]
+        records = index.records
+        if fields:
+            components = [{field: records[i][field] for field in fields} for i in page]
+        else:
+            components = [records[i] for i in page]
+
+        next_offset = offset + limit
+        return {
+            'total': int(len(ids)),
+            'components': components,
+            'next_offset': next_offset if next_offset < len(ids) else None
+        }
+
+def _ratings_version(ratings: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(ratings, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def encode_cursor(offset: int, version: str) -> str:
+    """Opaque pagination cursor tied to a catalog version"""
+    payload = json.dumps({'o': offset, 'v': version}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, version: str) -> int:
+    """Offset from a cursor; cursors from another catalog version are rejected"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset, cursor_version = int(payload['o']), payload['v']
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError("Invalid pagination cursor")
+
+    if cursor_version != version:
+        raise ValidationError("Pagination cursor is from an older catalog version")
+    return offset
+
+def content_version(data_path: str = DEFAULT_DATA_PATH) -> str:
+    """Digest of the component files' contents, as in ComponentCatalog.content_version"""
+    digest = hashlib.sha1()
+    for _, filename in sorted(COMPONENT_FILES.items()):
+        with open(os.path.join(data_path, filename), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def catalog_source() -> str:
+    """
+    Directory the catalog is built from: the newest complete snapshot (by
+    name) under CATALOG_SNAPSHOT_PATH when that is set, else the raw data.
+    """
+    root = settings.CATALOG_SNAPSHOT_PATH
+    if root and os.path.isdir(root):
+        for name in sorted(os.listdir(root), reverse=True):
+            snapshot = os.path.join(root, name)
+            if all(os.path.exists(os.path.join(snapshot, filename)) for filename in COMPONENT_FILES.values()):
+                return snapshot
+    return DEFAULT_DATA_PATH
+
+_catalog: Optional[ComponentCatalog] = None
+_catalog_lock = threading.Lock()
+
+# The catalog a calculation started with. While it is set, get_catalog()
+# returns it, so a catalog swapped in mid-request never mixes versions
+_pinned_catalog: ContextVar[Optional[ComponentCatalog]] = ContextVar('pinned_catalog', default=None)
+
+def get_catalog() -> ComponentCatalog:
+    """Return the process-wide component catalog (or the pinned one), building it on first use"""
+    global _catalog
+
+    pinned = _pinned_catalog.get()
+    if pinned is not None:
+        return pinned
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ComponentCatalog(catalog_source())
+    return _catalog
+
+def loaded_catalog() -> Optional[ComponentCatalog]:
+    """The process-wide catalog if it has been built, without building it"""
+    return _catalog
+
+def swap_catalog(catalog: ComponentCatalog) -> Optional[ComponentCatalog]:
+    """Make catalog the process-wide catalog, returning the one it replaces"""
+    global _catalog
+
+    with _catalog_lock:
+        previous, _catalog = _catalog, catalog
+    return previous
+
+@contextmanager
+def pinned_catalog(catalog: Optional[ComponentCatalog] = None) -> Iterator[ComponentCatalog]:
+    """Serve get_catalog() from one catalog (by default the current one) for the duration"""
+    catalog = catalog or get_catalog()
+    token = _pinned_catalog.set(catalog)
+    try:
+        yield catalog
+    finally:
+        _pinned_catalog.reset(token)
@@ -0,0 +1,214 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+
+from core.exceptions import DataNotFoundError
+
+# Load categories in match order (first match wins, so "LED TV" is electronics)
+LOAD_CATEGORIES = (
+    'air_conditioning', 'refrigeration', 'electronics', 'cooling',
+    'lighting', 'water_pumping', 'kitchen', 'laundry', 'other'
+)
+
+CATEGORY_KEYWORDS = {
+    'air_conditioning': r'air ?con|a/c\b|ac\b|split unit|hvac',
+    'refrigeration': r'fridge|refrigerat|freezer|chiller|cold room',
+    'electronics': r'tv\b|television|laptop|computer|desktop|phone|router|decoder|monitor|printer|radio|speaker|charger|modem',
+    'cooling': r'fan\b|fans\b|cooler',
+    'lighting': r'light|bulb|lamp|led\b|lantern|flood',
+    'water_pumping': r'pump|borehole',
+    'kitchen': r'microwave|kettle|cooker|oven|blender|toaster|stove|hot ?plate|rice',
+    'laundry': r'wash|iron|dryer|vacuum'
+}
+
+# One compiled matcher of anchored lookaheads, tried in category order; the
+# group that matched names the category
+_CATEGORY_MATCHER = re.compile(
+    '|'.join(f'(?P<{name}>(?=.*?\\b(?:{pattern})))' for name, pattern in CATEGORY_KEYWORDS.items())
+)
+
+# Relative likelihood of use for each hour 0-23; an appliance's daily hours
+# are placed in its category's highest-weighted hours
+USAGE_TEMPLATES = {
+    'lighting':         [3, 3, 3, 3, 3, 6, 6, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 10, 10, 10, 10, 9, 8],
+    'air_conditioning': [8, 8, 8, 3, 3, 3, 1, 1, 1, 2, 2, 3, 5, 9, 9, 9, 9, 9, 5, 5, 8, 8, 8, 8],
+    'cooling':          [6, 6, 6, 6, 6, 6, 3, 3, 3, 4, 5, 6, 9, 9, 9, 9, 9, 9, 7, 7, 8, 8, 8, 8],
+    'refrigeration':    [1] * 24,
+    'electronics':      [3, 1, 1, 1, 1, 1, 2, 5, 5, 4, 4, 4, 4, 4, 4, 4, 4, 4, 10, 10, 10, 10, 10, 3],
+    'kitchen':          [1, 1, 1, 1, 1, 1, 10, 10, 10, 2, 2, 2, 6, 6, 2, 2, 2, 2, 10, 10, 10, 2, 1, 1],
+    'laundry':          [1, 1, 1, 1, 1, 1, 1, 1, 4, 8, 8, 8, 8, 8, 8, 8, 8, 4, 1, 1, 1, 1, 1, 1],
+    'water_pumping':    [1, 1, 1, 1, 1, 1, 10, 10, 10, 10, 6, 6, 6, 6, 6, 6, 6, 1, 1, 1, 1, 1, 1, 1],
+    'other':            [1, 1, 1, 1, 1, 1, 1, 1, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 1, 1, 1]
+}
+
+# Fraction of running time compressor loads actually draw nameplate power
+DUTY_CYCLES = {'air_conditioning': 0.6, 'refrigeration': 0.4}
+
+# Start-up surge multipliers when neither the input nor the library gives one
+DEFAULT_SURGE_FACTORS = {
+    'air_conditioning': 3.0, 'refrigeration': 3.0, 'water_pumping': 3.0,
+    'cooling': 1.5, 'laundry': 1.5, 'kitchen': 1.2
+}
+
+# Monthly usage multipliers; cooling loads peak in the hot season (Feb-May)
+SEASONAL_FACTORS = {
+    'air_conditioning': [0.9, 1.1, 1.25, 1.25, 1.15, 0.95, 0.8, 0.8, 0.85, 0.95, 1.0, 0.9],
+    'cooling':          [0.9, 1.1, 1.2, 1.2, 1.1, 0.95, 0.85, 0.85, 0.9, 0.95, 1.0, 0.9]
+}
+
+DAYS_PER_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+_CATEGORY_IDS = {name: index for index, name in enumerate(LOAD_CATEGORIES)}
+_TEMPLATES = np.array([USAGE_TEMPLATES[name] for name in LOAD_CATEGORIES], dtype=float)
+# Rank of each hour within its category's template (0 = most likely hour)
+_HOUR_RANKS = np.argsort(np.argsort(-_TEMPLATES, axis=1, kind='stable'), axis=1).astype(float)
+_DUTY = np.array([DUTY_CYCLES.get(name, 1.0) for name in LOAD_CATEGORIES])
+_DEFAULT_SURGE = np.array([DEFAULT_SURGE_FACTORS.get(name, 1.0) for name in LOAD_CATEGORIES])
+_SEASONAL = np.array([SEASONAL_FACTORS.get(name, [1.0] * 12) for name in LOAD_CATEGORIES])
+_DAY_MONTH = np.repeat(np.arange(12), DAYS_PER_MONTH)
+
+@lru_cache(maxsize=4096)
+def classify_appliance(name: str) -> str:
+    """Load category for an appliance name"""
+    match = _CATEGORY_MATCHER.match(name.lower())
+    return match.lastgroup if match else 'other'
+
+@lru_cache(maxsize=1)
+def _library_surge_factors() -> Dict[str, float]:
+    """Median surge factor per lower-cased appliance and appliance/variant name"""
+    from core.appliances import get_appliance_library
+    try:
+        df = get_appliance_library().df
+    except DataNotFoundError:
+        return {}
+
+    factors = df.groupby(df['appliance'].str.lower())['surge_factor'].median().to_dict()
+    factors.update(zip(df['name'].str.lower(), df['surge_factor']))
+    return factors
+
+class LoadProfile:
+    """Hourly load curve for a set of appliances, built with array operations"""
+
+    def __init__(self, appliances: List[Dict[str, Any]]):
+        count = len(appliances)
+        names = [appliance.get('appliance', 'Unknown') for appliance in appliances]
+        self.names = names
+        self.power = np.fromiter((appliance.get('power_rating', 0) for appliance in appliances), float, count)
+        self.hours = np.fromiter((appliance.get('hours_per_day', 0) for appliance in appliances), float, count)
+        self.quantity = np.fromiter((appliance.get('quantity', 1) for appliance in appliances), float, count)
+
+        self.category_ids = np.fromiter(
+            (_CATEGORY_IDS[classify_appliance(name)] for name in names), np.int64, count
+        )
+
+        library_surge = _library_surge_factors()
+        self.surge_factors = np.fromiter(
+            (appliance.get('surge_factor') or library_surge.get(name.lower(), np.nan)
+             for appliance, name in zip(appliances, names)),
+            float, count
+        )
+        missing = np.isnan(self.surge_factors)
+        self.surge_factors[missing] = _DEFAULT_SURGE[self.category_ids[missing]]
+
+        # Average draw while "on": nameplate × quantity × duty cycle
+        self.running_watts = self.power * self.quantity * _DUTY[self.category_ids]
+        self.daily_energy_kwh = self.running_watts * self.hours / 1000
+
+        # Fraction of each hour the appliance is on: its hours fill the
+        # template's best-ranked hours first, the last one partially
+        on_fraction = np.clip(self.hours[:, None] - _HOUR_RANKS[self.category_ids], 0, 1)
+
+        # Per-category hourly curves (categories × 24), summed without
+        # materializing an appliance × hour matrix per category
+        self.category_hourly_w = np.zeros((len(LOAD_CATEGORIES), 24))
+        np.add.at(self.category_hourly_w, self.category_ids, on_fraction * self.running_watts[:, None])
+        self.hourly_w = self.category_hourly_w.sum(axis=0)
+
+        # Instantaneous draw: appliances on in the same hour can all run at
+        # once, at nameplate power (duty cycles and partial hours only lower
+        # the average), and no less than the largest single load
+        self.nameplate_w = self.power * self.quantity
+        self.hourly_nameplate_w = self.nameplate_w @ (on_fraction > 0)
+
+    @property
+    def total_energy_kwh(self) -> float:
+        return float(self.daily_energy_kwh.sum())
+
+    @property
+    def connected_load_w(self) -> float:
+        """Sum of nameplate ratings (everything on at once)"""
+        return float((self.power * self.quantity).sum())
+
+    @property
+    def coincident_peak_w(self) -> float:
+        """Highest hourly average demand"""
+        return float(self.hourly_w.max()) if len(self.names) else 0.0
+
+    @property
+    def running_peak_w(self) -> float:
+        """Highest instantaneous demand: the nameplate loads that can be on together"""
+        if not len(self.names):
+            return 0.0
+        return float(max(self.hourly_nameplate_w.max(), self.nameplate_w.max()))
+
+    @property
+    def surge_peak_w(self) -> float:
+        """
+        Running peak plus the largest single motor/compressor start, and at
+        least any appliance line starting all its units at once
+        """
+        if not len(self.names):
+            return 0.0
+        single_start = self.running_peak_w + float(((self.surge_factors - 1) * self.power).max())
+        return max(single_start, float((self.surge_factors * self.nameplate_w).max()))
+
+    def category_energy_kwh(self) -> Dict[str, float]:
+        """Daily energy per load category"""
+        totals = np.bincount(self.category_ids, weights=self.daily_energy_kwh, minlength=len(LOAD_CATEGORIES))
+        return {name: float(total) for name, total in zip(LOAD_CATEGORIES, totals)}
+
+    def annual_hourly_w(self) -> np.ndarray:
+        """8760-hour load curve with seasonal scaling of cooling loads"""
+        return annual_load_curve(self.category_hourly_w)
+
+    def to_dict(self, breakdown: bool = True) -> Dict[str, Any]:
+        """JSON-ready summary passed between agents"""
+        result = {
+            "total_appliances": len(self.names),
+            "total_energy_kwh": round(self.total_energy_kwh, 4),
+            "connected_load_watts": self.connected_load_w,
+            "coincident_peak_watts": round(self.coincident_peak_w, 2),
+            "running_peak_watts": round(self.running_peak_w, 2),
+            "surge_peak_watts": round(self.surge_peak_w, 2),
+            "load_categories": {name: round(value, 4) for name, value in self.category_energy_kwh().items() if value},
+            "hourly_load_watts": np.round(self.hourly_w, 2).tolist(),
+            # Rows follow "categories"; annual_load_curve() expands them to 8760 hours
+            "categories": list(LOAD_CATEGORIES),
+            "category_hourly_watts": np.round(self.category_hourly_w, 2).tolist()
+        }
+
+        if breakdown:
+            result["appliance_breakdown"] = [
+                {
+                    "name": name,
+                    "category": LOAD_CATEGORIES[category],
+                    "power_watts": float(power * quantity),
+                    "hours_per_day": float(hours),
+                    "daily_energy_kwh": float(energy),
+                    "surge_factor": float(surge)
+                }
+                for name, category, power, quantity, hours, energy, surge in zip(
+                    self.names, self.category_ids, self.power, self.quantity,
+                    self.hours, self.daily_energy_kwh, self.surge_factors
+                )
+            ]
+        return result
+
+def annual_load_curve(category_hourly_w: Any) -> np.ndarray:
+    """Expand per-category 24-hour curves into an 8760-hour curve"""
+    category_hourly_w = np.asarray(category_hourly_w, dtype=float)
+    # (365 days × categories) seasonal weights against (categories × 24) curves
+    daily = _SEASONAL[:, _DAY_MONTH].T @ category_hourly_w
+    return daily.reshape(-1)
@@ -1,34 +1,52 @@
-import pandas as pd
+import hashlib
 import json
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 import os
 
-def load_component_data(component_type: str, data_path: str = "data/raw/") -> pd.DataFrame:
-    """Load component data from CSV files"""
-    # **INPUT YOUR CSV FILE PATHS HERE**
-    file_map = {
-        'battery': f"{data_path}batteries.csv",
-        'controller': f"{data_path}controllers.csv", 
-        'inverter': f"{data_path}inverters.csv",
-        'panel': f"{data_path}panels.csv"
-    }
-    
-    if component_type not in file_map:
+# pandas and the data modules are imported on first use: hashing and
+# formatting helpers are needed by modules that never touch a DataFrame
+if TYPE_CHECKING:
+    import pandas as pd
+
+@lru_cache(maxsize=16)
+def _read_csv_cached(file_path: str, mtime: float) -> 'pd.DataFrame':
+    """Read a CSV once per file version (keyed on modification time)"""
+    import pandas as pd
+    return pd.read_csv(file_path)
+
+def load_component_data(component_type: str, data_path: str = "data/raw/") -> 'pd.DataFrame':
+    """Load component data, normalized to the component schema columns"""
+    from core.catalog import COMPONENT_FILES, DEFAULT_DATA_PATH, get_catalog, normalize_component_frame
+    
+    if component_type not in COMPONENT_FILES:
         raise ValueError(f"Unknown component type: {component_type}")
     
-    file_path = file_map[component_type]
+    if os.path.abspath(data_path) == os.path.abspath(DEFAULT_DATA_PATH):
+        # Shared across requests; callers must not modify the returned frame
+        return get_catalog().frame(component_type)
+    
+    file_path = os.path.join(data_path, COMPONENT_FILES[component_type])
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Component data file not found: {file_path}")
     
-    return pd.read_csv(file_path)
+    raw = _read_csv_cached(file_path, os.path.getmtime(file_path))
+    return normalize_component_frame(raw, component_type)
 
-def load_appliance_data(data_path: str = "data/raw/appliances.csv") -> pd.DataFrame:
-    """Load appliance data"""
-    # **INPUT YOUR APPLIANCE CSV FILE PATH HERE**
+def load_appliance_data(data_path: str = "data/raw/appliances.csv") -> 'pd.DataFrame':
+    """Load appliance data, normalized to numeric power/hour ranges"""
+    import pandas as pd
+    from core.appliances import get_appliance_library, normalize_appliance_frame
+    
+    library = get_appliance_library()
+    if os.path.abspath(data_path) == os.path.abspath(library.data_path):
+        # Shared across requests; callers must not modify the returned frame
+        return library.df
+    
     if not os.path.exists(data_path):
         raise FileNotFoundError(f"Appliance data file not found: {data_path}")
     
-    return pd.read_csv(data_path)
+    return normalize_appliance_frame(pd.read_csv(data_path, encoding='utf-8-sig'))
 
 def save_results(results: Dict[str, Any], filename: str, output_dir: str = "outputs/"):
     """Save calculation results"""
@@ -48,4 +66,15 @@ def calculate_payback_period(system_cost: float, monthly_savings: float) -> floa
         return float('inf')
     
     annual_savings = monthly_savings * 12
-    return system_cost / annual_savings
\ No newline at end of file
+    return system_cost / annual_savings
+
+def canonical_hash(data: Any) -> str:
+    """Stable digest of JSON-like data, independent of key order"""
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def to_columnar(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Convert a list of same-shaped records into a dict of columns"""
+    if not records:
+        return {}
+    return {key: [record.get(key) for record in records] for key in records[0]}
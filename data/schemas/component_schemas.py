@@ -35,4 +35,9 @@ class PanelSchema(BaseModel):
     power_rating: float = Field(..., gt=0, description="Power rating in Watts")
     voltage: float = Field(..., gt=0, description="Panel voltage")
     price: float = Field(..., gt=0, description="Price in Naira")
-    efficiency: Optional[float] = Field(None, ge=0.15, le=0.25)
\ No newline at end of file
+    efficiency: Optional[float] = Field(None, ge=0.15, le=0.25)
+    
+class ComponentFeedback(BaseModel):
+    component_model: str = Field(..., min_length=1, description="Model name as listed in the catalog")
+    rating: int = Field(..., ge=1, le=5, description="Rating from 1 (poor) to 5 (excellent)")
+    feedback: Optional[str] = Field(None, max_length=2000, description="Free-text comments")
@@ -1,11 +1,14 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, NonNegativeInt
 from typing import List, Optional
 
+from config.settings import settings
+
 class ApplianceInput(BaseModel):
     appliance: str = Field(..., description="Appliance name")
     power_rating: float = Field(..., gt=0, description="Power rating in Watts")
     hours_per_day: float = Field(..., ge=0, le=24, description="Usage hours per day")
     quantity: int = Field(1, ge=1, description="Number of appliances")
+    surge_factor: Optional[float] = Field(None, ge=1, description="Start-up surge multiplier (defaults from the appliance library)")
 
 class UserInput(BaseModel):
     location: str = Field(..., description="User location")
@@ -15,4 +18,59 @@ class UserInput(BaseModel):
     appliances: List[ApplianceInput]
     backup_hours: float = Field(4, ge=1, le=72, description="Required backup hours")
     system_expansion: bool = Field(False, description="Plan for future expansion")
-    priority: str = Field("balanced", regex="^(cost|reliability|efficiency|balanced)$")
+    priority: str = Field("balanced", pattern="^(cost|reliability|efficiency|balanced)$")
+
+# Records accepted in one 'batch' job; larger sets go to the streaming batch endpoint
+JOB_MAX_RECORDS = 1000
+
+class CalculationJobRequest(BaseModel):
+    kind: str = Field("calculate", pattern="^(calculate|batch)$", description="Job type")
+    input: Optional[UserInput] = Field(None, description="Input for a 'calculate' job")
+    records: Optional[List[UserInput]] = Field(None, max_length=JOB_MAX_RECORDS, description="Inputs for a 'batch' job")
+    priority: int = Field(0, ge=-10, le=10, description="Higher runs first")
+    ttl_seconds: Optional[int] = Field(None, gt=0, description="How long the result is kept")
+
+class AppliancePatch(BaseModel):
+    index: int = Field(..., ge=0, description="Position of the appliance in the previous input")
+    appliance: Optional[str] = None
+    power_rating: Optional[float] = Field(None, gt=0)
+    hours_per_day: Optional[float] = Field(None, ge=0, le=24)
+    quantity: Optional[int] = Field(None, ge=1)
+    surge_factor: Optional[float] = Field(None, ge=1)
+
+class CalculationPatch(BaseModel):
+    location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    budget: Optional[float] = Field(None, gt=0)
+    backup_hours: Optional[float] = Field(None, ge=1, le=72)
+    system_expansion: Optional[bool] = None
+    priority: Optional[str] = Field(None, pattern="^(cost|reliability|efficiency|balanced)$")
+    add_appliances: List[ApplianceInput] = Field(default_factory=list, description="Appliances to append")
+    update_appliances: List[AppliancePatch] = Field(default_factory=list, description="Field changes by index")
+    remove_appliances: List[NonNegativeInt] = Field(default_factory=list, description="Indexes to remove (applied last)")
+
+class SweepAxis(BaseModel):
+    field: str = Field(..., pattern="^(budget|backup_hours|load_scale)$",
+                       description="Input to vary; load_scale multiplies the whole load profile")
+    values: Optional[List[float]] = Field(None, min_length=1, max_length=settings.SWEEP_MAX_POINTS,
+                                          description="Axis points")
+    start: Optional[float] = Field(None, description="First point of an evenly spaced range")
+    stop: Optional[float] = Field(None, description="Last point of an evenly spaced range")
+    steps: Optional[int] = Field(None, ge=2, le=settings.SWEEP_MAX_POINTS,
+                                 description="Points in the range (default 20)")
+
+class SweepRequest(BaseModel):
+    input: UserInput
+    axes: List[SweepAxis] = Field(..., min_length=1, max_length=2, description="One or two axes to vary")
+    sensitivity: bool = Field(False, description="Also return each metric's partial derivatives along the axes")
+
+class Coordinate(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    name: Optional[str] = Field(None, description="Label for the result (defaults to the coordinates)")
+
+class LocationComparisonRequest(BaseModel):
+    input: UserInput = Field(..., description="Load, budget and preferences; its location is not used")
+    by: str = Field("state", pattern="^(state|zone)$", description="Compare every state or every geopolitical zone")
+    coordinates: Optional[List[Coordinate]] = Field(None, min_length=1, description="Compare these sites instead")
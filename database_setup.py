@@ -1,6 +1,9 @@
 import os
 import sqlite3
 
+from services.database import create_schema
+from services.job_queue import JOBS_SCHEMA
+
 
 def setup_database():
     """Initialize the database with required tables"""
@@ -10,49 +13,12 @@ def setup_database():
     
     # Connect to database
     conn = sqlite3.connect("data/solar_calculator.db")
-    cursor = conn.cursor()
-    # Create tables
-    
-    # User calculations table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS user_calculations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        location TEXT NOT NULL,
-        latitude REAL,
-        longitude REAL,
-        budget REAL NOT NULL,
-        daily_consumption_kwh REAL,
-        system_cost REAL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        input_data TEXT,
-        results TEXT
-    )
-    """)
     
-    # Component feedback table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS component_feedback (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        component_type TEXT NOT NULL,
-        component_model TEXT NOT NULL,
-        rating INTEGER CHECK(rating >= 1 AND rating <= 5),
-        feedback TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    # Calculation history, feedback and performance tables with their indexes
+    create_schema(conn)
     
-    # System performance table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS system_performance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_calculation_id INTEGER,
-        actual_generation_kwh REAL,
-        actual_consumption_kwh REAL,
-        performance_ratio REAL,
-        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_calculation_id) REFERENCES user_calculations (id)
-    )
-    """)
+    # Calculation job queue
+    conn.executescript(JOBS_SCHEMA)
     
     # Commit changes and close
     conn.commit()
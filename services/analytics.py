@@ -0,0 +1,280 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import csv
+import json
+import logging
+import math
+import os
+import sqlite3
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculation_rollups (
+    day TEXT NOT NULL,
+    state TEXT NOT NULL,
+    budget_band TEXT NOT NULL,
+    size_band TEXT NOT NULL,
+    calculations INTEGER NOT NULL DEFAULT 0,
+    total_budget REAL NOT NULL DEFAULT 0,
+    total_system_cost REAL NOT NULL DEFAULT 0,
+    total_daily_kwh REAL NOT NULL DEFAULT 0,
+    total_system_kw REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, state, budget_band, size_band)
+);
+CREATE TABLE IF NOT EXISTS calculation_histograms (
+    day TEXT NOT NULL,
+    state TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, day, state, bucket)
+);
+"""
+
+# Typed columns extracted from each calculation when it is written
+EXTRACTED_COLUMNS = {
+    'state': 'TEXT',
+    'budget_band': 'TEXT',
+    'size_band': 'TEXT',
+    'system_size_kw': 'REAL',
+    'payback_years': 'REAL'
+}
+
+# (upper bound, label) pairs; values at or above the last bound get the final label
+BUDGET_BANDS = [
+    (500_000, '<0.5M'), (1_000_000, '0.5M-1M'), (2_500_000, '1M-2.5M'),
+    (5_000_000, '2.5M-5M'), (10_000_000, '5M-10M'), (math.inf, '10M+')
+]
+SIZE_BANDS = [
+    (1, '<1kW'), (3, '1-3kW'), (5, '3-5kW'), (10, '5-10kW'), (math.inf, '10kW+')
+]
+
+# Metrics with log-scale histograms for percentiles; 20 buckets per decade
+# keeps percentile estimates within about 6% of the true value
+HISTOGRAM_METRICS = ('budget', 'system_cost', 'system_size_kw', 'daily_consumption_kwh')
+BUCKETS_PER_DECADE = 20
+
+GROUP_COLUMNS = ('day', 'state', 'budget_band', 'size_band')
+
+UPSERT_ROLLUP = """
+INSERT INTO calculation_rollups
+    (day, state, budget_band, size_band, calculations, total_budget, total_system_cost, total_daily_kwh, total_system_kw)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, state, budget_band, size_band) DO UPDATE SET
+    calculations = calculations + excluded.calculations,
+    total_budget = total_budget + excluded.total_budget,
+    total_system_cost = total_system_cost + excluded.total_system_cost,
+    total_daily_kwh = total_daily_kwh + excluded.total_daily_kwh,
+    total_system_kw = total_system_kw + excluded.total_system_kw
+"""
+
+UPSERT_HISTOGRAM = """
+INSERT INTO calculation_histograms (day, state, metric, bucket, count)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (metric, day, state, bucket) DO UPDATE SET count = count + excluded.count
+"""
+
+def band(value: Optional[float], bands: List[Tuple[float, str]]) -> str:
+    """Label of the band a value falls in"""
+    if value is None:
+        return 'unknown'
+    for upper, label in bands:
+        if value < upper:
+            return label
+    return bands[-1][1]
+
+@lru_cache(maxsize=1)
+def _state_lookup() -> Dict[str, str]:
+    """Lower-cased state and weather-station city names mapped to their state"""
+    lookup = {}
+    zones_path = os.path.join(settings.DATA_PATH, 'geopolitical_zones_seasonal_factor.csv')
+    if os.path.exists(zones_path):
+        with open(zones_path, encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                for state in row['States'].split(','):
+                    lookup[state.strip().lower()] = state.strip()
+    lookup['abuja'] = 'FCT'
+
+    stations_path = os.path.join(settings.RAW_DATA_PATH, 'weather_stations.csv')
+    if os.path.exists(stations_path):
+        with open(stations_path, encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                lookup.setdefault(row['city'].strip().lower(), row['region'].strip())
+    return lookup
+
+def resolve_state(location: Optional[str]) -> str:
+    """State for a free-text location ('Ikeja, Lagos', 'Kano', ...)"""
+    lookup = _state_lookup()
+    text = (location or '').strip().lower()
+    if text in lookup:
+        return lookup[text]
+    for part in reversed([part.strip() for part in text.split(',')]):
+        if part in lookup:
+            return lookup[part]
+    return 'Unknown'
+
+def extract_columns(user_input: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Typed analytics columns for one calculation"""
+    summary = result.get('executive_summary') or {}
+    system_size_kw = summary.get('system_size_kw')
+    return {
+        'state': resolve_state(user_input.get('location')),
+        'budget_band': band(user_input.get('budget'), BUDGET_BANDS),
+        'size_band': band(system_size_kw, SIZE_BANDS),
+        'system_size_kw': system_size_kw,
+        'payback_years': summary.get('payback_period')
+    }
+
+def histogram_bucket(value: Optional[float]) -> Optional[int]:
+    """Log-scale bucket of a positive value"""
+    if value is None or value <= 0:
+        return None
+    return math.floor(math.log10(value) * BUCKETS_PER_DECADE)
+
+def bucket_midpoint(bucket: int) -> float:
+    """Representative (geometric middle) value of a bucket"""
+    return 10 ** ((bucket + 0.5) / BUCKETS_PER_DECADE)
+
+class RollupAccumulator:
+    """Aggregates calculation rows in memory before a single upsert per group"""
+
+    def __init__(self):
+        self.groups: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+        self.histograms: Dict[Tuple, int] = defaultdict(int)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Add one calculation (created_at, state, bands and metric values)"""
+        day = str(row['created_at'])[:10]
+        totals = self.groups[(day, row['state'], row['budget_band'], row['size_band'])]
+        totals[0] += 1
+        totals[1] += row.get('budget') or 0
+        totals[2] += row.get('system_cost') or 0
+        totals[3] += row.get('daily_consumption_kwh') or 0
+        totals[4] += row.get('system_size_kw') or 0
+
+        for metric in HISTOGRAM_METRICS:
+            bucket = histogram_bucket(row.get(metric))
+            if bucket is not None:
+                self.histograms[(day, row['state'], metric, bucket)] += 1
+
+    def flush(self, conn: sqlite3.Connection) -> None:
+        """Upsert the accumulated groups (inside the caller's transaction)"""
+        conn.executemany(UPSERT_ROLLUP, [key + tuple(totals) for key, totals in self.groups.items()])
+        conn.executemany(UPSERT_HISTOGRAM, [key + (count,) for key, count in self.histograms.items()])
+        self.groups.clear()
+        self.histograms.clear()
+
+def rebuild_rollups(conn: sqlite3.Connection, chunk_size: int = 1000) -> int:
+    """
+    Recompute every rollup from user_calculations in one streaming pass.
+
+    Rows written before the typed columns existed are re-extracted from their
+    JSON blobs and backfilled. Memory is bounded by the number of rollup
+    groups, not the number of rows. Returns the number of rows scanned.
+    """
+    accumulator = RollupAccumulator()
+    scanned = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM calculation_rollups")
+        conn.execute("DELETE FROM calculation_histograms")
+
+        cursor = conn.execute(
+            "SELECT id, created_at, location, budget, daily_consumption_kwh, system_cost, "
+            "state, budget_band, size_band, system_size_kw, input_data, results FROM user_calculations"
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            backfill = []
+            for row in rows:
+                row = dict(zip(
+                    ('id', 'created_at', 'location', 'budget', 'daily_consumption_kwh', 'system_cost',
+                     'state', 'budget_band', 'size_band', 'system_size_kw', 'input_data', 'results'), row
+                ))
+                if row['state'] is None:
+                    columns = extract_columns(json.loads(row['input_data'] or '{}'), json.loads(row['results'] or '{}'))
+                    row.update(columns)
+                    backfill.append(tuple(columns[name] for name in EXTRACTED_COLUMNS) + (row['id'],))
+                accumulator.add(row)
+            if backfill:
+                conn.executemany(
+                    f"UPDATE user_calculations SET {', '.join(f'{name} = ?' for name in EXTRACTED_COLUMNS)} WHERE id = ?",
+                    backfill
+                )
+            scanned += len(rows)
+
+        accumulator.flush(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    logger.info(f"Rebuilt calculation rollups from {scanned} rows")
+    return scanned
+
+def _day_range(days: int) -> Tuple[str, str]:
+    end = date.today()
+    return (end - timedelta(days=days - 1)).isoformat(), end.isoformat()
+
+def calculation_summary(conn: sqlite3.Connection, group_by: str = 'state', days: int = 30) -> List[Dict[str, Any]]:
+    """Calculation counts and averages per group over the last `days` days, read from the rollups"""
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group by '{group_by}'")
+
+    start, end = _day_range(days)
+    rows = conn.execute(
+        f"SELECT {group_by} AS grp, SUM(calculations), SUM(total_budget), SUM(total_system_cost), "
+        f"SUM(total_daily_kwh), SUM(total_system_kw) FROM calculation_rollups "
+        f"WHERE day BETWEEN ? AND ? GROUP BY {group_by} ORDER BY SUM(calculations) DESC",
+        (start, end)
+    ).fetchall()
+
+    return [
+        {
+            group_by: group,
+            'calculations': count,
+            'average_budget': round(budget / count, 2),
+            'average_system_cost': round(cost / count, 2),
+            'average_daily_kwh': round(kwh / count, 3),
+            'average_system_kw': round(kw / count, 3)
+        }
+        for group, count, budget, cost, kwh, kw in rows
+    ]
+
+def metric_percentiles(conn: sqlite3.Connection, metric: str, days: int = 30, state: Optional[str] = None,
+                       percentiles: Iterable[float] = (25, 50, 75, 90)) -> Dict[str, Any]:
+    """Approximate percentiles of a metric from the histogram rollups"""
+    if metric not in HISTOGRAM_METRICS:
+        raise ValueError(f"No histogram for metric '{metric}'")
+
+    start, end = _day_range(days)
+    sql = "SELECT bucket, SUM(count) FROM calculation_histograms WHERE metric = ? AND day BETWEEN ? AND ?"
+    params: List[Any] = [metric, start, end]
+    if state:
+        sql += " AND state = ?"
+        params.append(state)
+    buckets = conn.execute(sql + " GROUP BY bucket ORDER BY bucket", params).fetchall()
+
+    total = sum(count for _, count in buckets)
+    values = {}
+    for percentile in percentiles:
+        target, running = total * percentile / 100, 0
+        for bucket, count in buckets:
+            running += count
+            if running >= target:
+                values[f"p{percentile:g}"] = round(bucket_midpoint(bucket), 3)
+                break
+    return {'metric': metric, 'count': total, 'percentiles': values}
+
+if __name__ == "__main__":
+    from services.database import get_database
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    rebuild_rollups(get_database().connection())
@@ -1,10 +1,30 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from services.orchestrator import SolarSystemOrchestrator
-from data.schemas.user_input_schemas import UserInput
+from services.catalog_manager import get_catalog_manager
+from services.batch import BatchCalculator, detect_batch_format, iter_batch_file, shutdown_batch_executor
+from services.job_queue import JobQueue, JobWorkerPool
+from services.analytics import calculation_summary, metric_percentiles
+from services.api import serialization
+from services.api.serialization import MSGPACK_MEDIA_TYPES, encode_json, render, server_timing
+from services.database import get_database
+from services.feedback import record_feedback, refresh_catalog_ratings
+from services.profiling import ProfilingMiddleware, iterate_in_threadpool, profiling_enabled, run_in_threadpool
+from services.telemetry import get_telemetry_store, iter_telemetry_file
+from core.exceptions import DataNotFoundError, ValidationError as CatalogValidationError
+from core.utils import canonical_hash
+from data.schemas.component_schemas import ComponentFeedback, ComponentType
+from data.schemas.user_input_schemas import (UserInput, CalculationJobRequest, CalculationPatch,
+                                             LocationComparisonRequest, SweepRequest)
+from config.settings import settings
+import asyncio
 import logging
+import shutil
+import tempfile
+import threading
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -25,63 +45,529 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling, only installed when some request could be profiled
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 # Initialize orchestrator
 orchestrator = SolarSystemOrchestrator()
+job_queue = JobQueue()
+embedded_workers = None
+ratings_refresh = None  # background ratings load when startup does not wait for it
+
+# Report detail levels accepted by the calculation endpoints
+DETAIL_PATTERN = "^(summary|standard|full)$"
 
 @app.post("/api/v1/calculate")
-async def calculate_solar_system(user_input: UserInput):
-    """Calculate optimal solar system configuration"""
+async def calculate_solar_system(
+    user_input: UserInput,
+    request: Request,
+    detail: str = Query('full', pattern=DETAIL_PATTERN,
+                        description="Report detail: summary, standard or full (the default; adds full_report with "
+                                    "the simulation time series)"),
+    quick: bool = Query(False, description="Return surrogate-model estimates with error bounds instead of calculating"),
+    exact: bool = Query(False, description="Run every stage instead of reading typical designs from the design table")
+):
+    """
+    Calculate optimal solar system configuration.
+    
+    Returns the full report unless a lighter detail level is asked for, as
+    this endpoint always has; new clients can opt into summary or standard.
+    """
+    if quick:
+        from services.surrogate import get_surrogate
+        try:
+            model = get_surrogate()
+        except DataNotFoundError:
+            raise HTTPException(status_code=503, detail="Quick estimates are unavailable: no surrogate model trained")
+        return render({'status': 'success', 'mode': 'quick', 'coverage': model.coverage,
+                       **model.predict(user_input.dict())}, request)
+    
     try:
         # Convert Pydantic model to dict
         input_data = user_input.dict()
         
         # Run calculation
-        result = orchestrator.calculate_solar_system(input_data)
+        timings = {}
+        result = orchestrator.calculate_solar_system(input_data, detail, exact, timings)
         
-        return result
+        return render(result, request, headers={'Server-Timing': server_timing(timings)})
         
     except Exception as e:
         logger.error(f"API calculation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/components/{component_type}")
-async def get_components(component_type: str):
-    """Get available components by type"""
+@app.post("/api/v1/calculate/{calculation_id}/recalculate")
+async def recalculate_solar_system(
+    calculation_id: str,
+    patch: CalculationPatch,
+    request: Request,
+    detail: str = Query('standard', pattern=DETAIL_PATTERN)
+):
+    """
+    Recalculate a previous result with an input delta (changed fields,
+    added/updated/removed appliances); only stages whose inputs changed run.
+    """
     try:
-        # **LOAD YOUR COMPONENT DATA HERE**
-        from core.utils import load_component_data
-        
-        components_df = load_component_data(component_type)
-        components = components_df.to_dict('records')
-        
-        return {
-            'status': 'success',
-            'component_type': component_type,
-            'components': components
-        }
-        
+        result = await run_in_threadpool(orchestrator.recalculate, calculation_id,
+                                         patch.dict(exclude_unset=True), detail)
+    except DataNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, KeyError, TypeError) as e:
+        # A patch that does not fit the stored input (or a malformed stored record)
+        raise HTTPException(status_code=422, detail=f"Cannot apply patch: {e}")
     except Exception as e:
-        logger.error(f"Failed to load components: {e}")
+        logger.error(f"API recalculation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return render(result, request)
+
+@app.post("/api/v1/calculate/stream")
+async def calculate_solar_system_stream(
+    user_input: UserInput,
+    request: Request,
+    detail: str = Query('standard', pattern=DETAIL_PATTERN),
+    exact: bool = Query(False, description="Run every stage instead of reading typical designs from the design table")
+):
+    """
+    Calculate a solar system, streaming Server-Sent Events as each stage finishes.
+    
+    Events are named after the stage (validation, load_analysis, irradiance,
+    panel_sizing, battery_sizing, configurations, optimization, simulation,
+    report) and carry that stage's result; the workflow stops after the
+    running stage if the client disconnects.
+    """
+    events = orchestrator.iter_calculation(user_input.dict(), detail, exact=exact)
+    # Stages run on pool threads. A stream that ends while one is running
+    # cannot close the generator (it is still executing), so it only marks
+    # the calculation stopped and the pool thread closes it when the stage
+    # returns
+    state = {'stopped': False, 'running': False}
+    state_lock = threading.Lock()
+    
+    def next_event():
+        with state_lock:
+            if state['stopped']:
+                return None
+            state['running'] = True
+        event = next(events, None)
+        with state_lock:
+            state['running'] = False
+            stopped = state['stopped']
+        if stopped:
+            events.close()
+            return None
+        return event
+    
+    def stop():
+        with state_lock:
+            state['stopped'] = True
+            running = state['running']
+        if not running:
+            events.close()
+    
+    async def event_stream():
+        try:
+            sequence = 0
+            while True:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, stopping calculation")
+                    break
+                
+                event = await run_in_threadpool(next_event)
+                if event is None:
+                    break
+                
+                sequence += 1
+                data = encode_json({**event['result'], 'final': event['final']}).decode('utf-8')
+                yield f"id: {sequence}\nevent: {event['stage']}\ndata: {data}\n\n"
+                if event['final']:
+                    break
+        finally:
+            stop()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.post("/api/v1/calculate/batch")
+async def calculate_batch(request: Request, detail: str = Query('summary', pattern=DETAIL_PATTERN)):
+    """
+    Calculate many inputs in one request, streaming NDJSON results as they finish.
+
+    Accepts a JSON list, an NDJSON or CSV body, or a multipart upload in a
+    'file' field. The body is spooled to disk past 1 MB so memory stays
+    bounded; each output line carries the index of its input record.
+    """
+    content_type = request.headers.get('content-type', '')
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    
+    try:
+        if content_type.startswith('multipart/form-data'):
+            form = await request.form()
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Multipart batch needs a 'file' field")
+            batch_format = detect_batch_format(upload.content_type, upload.filename)
+            shutil.copyfileobj(upload.file, spool)
+            await form.close()
+        else:
+            batch_format = detect_batch_format(content_type)
+            async for chunk in request.stream():
+                spool.write(chunk)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    
+    def stream_results():
+        try:
+            records = iter_batch_file(spool, batch_format)
+            for line in BatchCalculator(detail=detail).run(records):
+                yield encode_json(line) + b"\n"
+        finally:
+            spool.close()
+    
+    return StreamingResponse(iterate_in_threadpool(stream_results()), media_type="application/x-ndjson")
+
+@app.post("/api/v1/sweep")
+async def sweep_solar_system(sweep: SweepRequest, request: Request):
+    """
+    Evaluate designs over one or two input axes (budget, backup_hours,
+    load_scale), returning a response surface for each metric.
+    """
+    try:
+        result = await run_in_threadpool(orchestrator.sweep, sweep.input.dict(),
+                                         [axis.dict() for axis in sweep.axes], sweep.sensitivity)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return render(result, request)
+
+@app.post("/api/v1/compare/locations")
+async def compare_locations(comparison: LocationComparisonRequest, request: Request):
+    """
+    Recommended system, cost and self-sufficiency for one load and budget
+    at every state or geopolitical zone, or at a list of coordinates.
+    Irradiance comes from stored data or the latitude estimate, never NASA
+    POWER (see irradiance_basis and irradiance_note).
+    """
+    coordinates = [site.dict() for site in comparison.coordinates] if comparison.coordinates else None
+    try:
+        result = await run_in_threadpool(orchestrator.compare_locations, comparison.input.dict(),
+                                         comparison.by, coordinates)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return render(result, request)
+
+@app.post("/api/v1/jobs", status_code=202)
+async def submit_job(job: CalculationJobRequest, request: Request):
+    """Queue a long-running calculation and return its job ID"""
+    if job.kind == 'calculate' and job.input is None:
+        raise HTTPException(status_code=422, detail="A 'calculate' job needs an 'input'")
+    if job.kind == 'batch' and not job.records:
+        raise HTTPException(status_code=422, detail="A 'batch' job needs 'records'")
+    
+    if job.kind == 'calculate':
+        payload = {'input': job.input.dict()}
+    else:
+        payload = {'records': [record.dict() for record in job.records]}
+    client_id = request.headers.get('x-client-id') or (request.client.host if request.client else 'anonymous')
+    
+    try:
+        job_id = job_queue.submit(job.kind, payload, client_id=client_id,
+                                  priority=job.priority, ttl_seconds=job.ttl_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return {'status': 'queued', 'job_id': job_id}
+
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll a job's status and fetch its result once finished"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.delete("/api/v1/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    status = job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {'job_id': job_id, 'status': status, 'cancel_requested': status == 'running'}
+
+@app.get("/api/v1/components/{component_type}")
+async def get_components(
+    component_type: ComponentType,
+    request: Request,
+    min_power: Optional[float] = None,
+    max_power: Optional[float] = None,
+    min_voltage: Optional[float] = None,
+    max_voltage: Optional[float] = None,
+    min_capacity: Optional[float] = None,
+    max_capacity: Optional[float] = None,
+    min_current: Optional[float] = None,
+    max_current: Optional[float] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    brand: Optional[str] = Query(None, description="Comma-separated brands"),
+    type: Optional[str] = Query(None, description="Comma-separated component types"),
+    sort: Optional[str] = Query(None, description="Column to sort by; prefix with '-' for descending"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return")
+):
+    """Get available components by type, filtered, sorted and paginated server-side"""
+    from core.catalog import decode_cursor, encode_cursor, get_catalog
+    catalog = get_catalog()
+    
+    def split(value):
+        return [item.strip() for item in value.split(',') if item.strip()] if value else None
+    
+    # The response depends only on the catalog (its ratings too, if the
+    # query reads them) and the query, so the ETag can be checked before
+    # doing any work
+    version = catalog.query_version(sort, split(fields))
+    etag = '"{}-{}"'.format(version, canonical_hash([component_type.value, sorted(request.query_params.multi_items())])[:16])
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        offset = decode_cursor(cursor, version) if cursor else 0
+        page = catalog.query(
+            component_type.value,
+            ranges={
+                'power': (min_power, max_power),
+                'voltage': (min_voltage, max_voltage),
+                'capacity': (min_capacity, max_capacity),
+                'current': (min_current, max_current),
+                'price': (min_price, max_price)
+            },
+            categories={'brand': split(brand), 'type': split(type)},
+            sort=sort,
+            offset=offset,
+            limit=limit,
+            fields=split(fields)
+        )
+    except CatalogValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    next_offset = page['next_offset']
+    return render({
+        'status': 'success',
+        'component_type': component_type.value,
+        'catalog_version': catalog.version,
+        'total': page['total'],
+        'count': len(page['components']),
+        'next_cursor': encode_cursor(next_offset, version) if next_offset is not None else None,
+        'components': page['components']
+    }, request, headers=headers)
+
+@app.post("/api/v1/components/{component_type}/feedback", status_code=201)
+async def submit_component_feedback(component_type: ComponentType, feedback: ComponentFeedback):
+    """Rate a catalog component; the rating feeds the component's smoothed reliability score"""
+    from core.catalog import get_catalog
+    if feedback.component_model not in get_catalog().index(component_type.value).model_rows:
+        raise HTTPException(status_code=404, detail=f"Unknown {component_type.value} model: {feedback.component_model}")
+    
+    count, mean, score = await run_in_threadpool(
+        record_feedback, get_database(), component_type.value,
+        feedback.component_model, feedback.rating, feedback.feedback
+    )
+    await run_in_threadpool(refresh_catalog_ratings, [component_type.value])
+    return {
+        'status': 'success',
+        'component_type': component_type.value,
+        'component_model': feedback.component_model,
+        'rating_count': count,
+        'rating_mean': round(mean, 3),
+        'rating_score': round(score, 3)
+    }
 
 @app.get("/api/v1/appliances")
-async def get_appliances():
-    """Get available appliances"""
+async def get_appliances(request: Request):
+    """Get the normalized appliance library"""
+    from core.appliances import get_appliance_library
     try:
-        # **LOAD YOUR APPLIANCE DATA HERE**
-        from core.utils import load_appliance_data
-        
-        appliances_df = load_appliance_data()
-        appliances = appliances_df.to_dict('records')
-        
-        return {
-            'status': 'success',
-            'appliances': appliances
-        }
-        
-    except Exception as e:
+        library = get_appliance_library()
+    except DataNotFoundError as e:
         logger.error(f"Failed to load appliances: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    etag = f'"{library.version}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    
+    return render({
+        'status': 'success',
+        'library_version': library.version,
+        'categories': library.categories,
+        'appliances': library.records
+    }, request, headers=headers)
+
+@app.get("/api/v1/appliances/search")
+async def search_appliances(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    category: Optional[str] = None
+):
+    """Typeahead search over appliance names, tolerant of typos"""
+    from core.appliances import get_appliance_library
+    library = get_appliance_library()
+    return render({
+        'status': 'success',
+        'query': q,
+        'library_version': library.version,
+        'appliances': library.search(q, limit=limit, category=category)
+    }, request)
+
+@app.post("/api/v1/telemetry")
+async def ingest_telemetry(request: Request):
+    """
+    Bulk-ingest installed-system readings as CSV, NDJSON, JSON or msgpack.
+
+    Each reading has system_id, timestamp (epoch seconds or ISO 8601) and any
+    of generation_wh, consumption_wh, grid_import_wh (interval energy) and
+    battery_soc; calculation_id links a system to the design it was built from.
+    """
+    content_type = request.headers.get('content-type', '')
+    media_type = content_type.split(';')[0].strip().lower()
+    telemetry_format = 'msgpack' if media_type in MSGPACK_MEDIA_TYPES else detect_batch_format(content_type)
+    if telemetry_format == 'msgpack' and serialization.msgpack is None:
+        raise HTTPException(status_code=415, detail="msgpack bodies need the optional 'fast' extra")
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.TELEMETRY_MAX_BODY_BYTES:
+                raise HTTPException(status_code=413, detail="Telemetry batch too large")
+            spool.write(chunk)
+        spool.seek(0)
+        
+        store = get_telemetry_store()
+        summary = await run_in_threadpool(store.ingest, iter_telemetry_file(spool, telemetry_format))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        spool.close()
+    
+    return render({'status': 'success', **summary}, request)
+
+@app.get("/api/v1/telemetry/{system_id}")
+async def get_telemetry(
+    system_id: str,
+    request: Request,
+    resolution: str = Query('hour', pattern="^(hour|day)$"),
+    start: Optional[str] = Query(None, description="Start time (epoch seconds or ISO 8601)"),
+    end: Optional[str] = Query(None, description="End time (epoch seconds or ISO 8601)")
+):
+    """Downsampled telemetry for one installed system"""
+    try:
+        series = get_telemetry_store().series(system_id, resolution, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return render({'status': 'success', 'system_id': system_id, 'resolution': resolution, 'series': series}, request)
+
+@app.get("/api/v1/analytics/fleet")
+async def get_fleet_performance(
+    request: Request,
+    underperforming: bool = Query(False, description="Only systems flagged as underperforming"),
+    limit: int = Query(100, ge=1, le=5000)
+):
+    """Latest actual-vs-simulated comparison of installed systems, most anomalous first"""
+    from services.fleet import fleet_performance
+    # Connections are per thread, so the query opens its own in the pool thread
+    systems = await run_in_threadpool(
+        lambda: fleet_performance(get_database().connection(), underperforming, limit))
+    return render({'status': 'success', 'systems': systems}, request)
+
+@app.get("/api/v1/analytics/calculations")
+async def get_calculation_analytics(
+    request: Request,
+    group_by: str = Query('state', pattern="^(day|state|budget_band|size_band)$"),
+    days: int = Query(30, ge=1, le=366)
+):
+    """Calculation counts and averages by state, budget band, system size or day"""
+    groups = await run_in_threadpool(lambda: calculation_summary(get_database().connection(), group_by, days))
+    return render({'status': 'success', 'group_by': group_by, 'days': days, 'groups': groups}, request)
+
+@app.get("/api/v1/analytics/percentiles")
+async def get_metric_percentiles(
+    request: Request,
+    metric: str = Query('system_size_kw', pattern="^(budget|system_cost|system_size_kw|daily_consumption_kwh)$"),
+    days: int = Query(30, ge=1, le=366),
+    state: Optional[str] = None
+):
+    """Approximate percentiles of a calculation metric"""
+    result = await run_in_threadpool(lambda: metric_percentiles(get_database().connection(), metric, days, state))
+    return render({'status': 'success', 'days': days, 'state': state, **result}, request)
+
+@app.get("/api/v1/cache/stats")
+async def get_cache_stats():
+    """Get stage cache size and hit-rate metrics"""
+    stage_cache = orchestrator.stage_cache
+    return {
+        'status': 'success',
+        'enabled': stage_cache is not None,
+        'stages': stage_cache.stats() if stage_cache else {}
+    }
+
+@app.on_event("startup")
+async def load_component_ratings():
+    """
+    Load component feedback aggregates into the catalog. With warm-up on,
+    agents and data are loaded first and startup waits for both; otherwise
+    the ratings load in the background so startup is not held up by the
+    catalog.
+    """
+    global ratings_refresh
+    
+    if settings.STARTUP_WARM_UP:
+        timings = await run_in_threadpool(orchestrator.warm_up)
+        logger.info(f"Warmed up in {sum(timings.values()):.2f}s: {timings}")
+        await run_in_threadpool(refresh_catalog_ratings)
+    else:
+        ratings_refresh = asyncio.get_running_loop().run_in_executor(None, refresh_catalog_ratings)
+        ratings_refresh.add_done_callback(_log_ratings_refresh)
+
+def _log_ratings_refresh(future: asyncio.Future) -> None:
+    """Report a background ratings load that failed; nothing else awaits it"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Loading component ratings failed; catalogs keep their previous ratings",
+                     exc_info=future.exception())
+
+@app.on_event("startup")
+async def start_catalog_reloader():
+    """Swap in component catalog updates as their files change, without a restart"""
+    get_catalog_manager().start()
+
+@app.on_event("startup")
+async def start_workers():
+    """Start embedded job workers (production runs them as separate processes)"""
+    global embedded_workers
+    if settings.JOB_EMBEDDED_WORKERS > 0:
+        embedded_workers = JobWorkerPool(settings.JOB_EMBEDDED_WORKERS)
+        embedded_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop background worker pools and write out queued calculation records"""
+    shutdown_batch_executor()
+    get_catalog_manager().stop()
+    if orchestrator.recorder is not None:
+        orchestrator.recorder.stop()
+    if embedded_workers is not None:
+        embedded_workers.stop()
 
 @app.get("/api/v1/health")
 async def health_check():
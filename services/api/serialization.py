@@ -0,0 +1,71 @@
+from typing import Any, Dict, Optional
+import json
+import math
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard json encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: msgpack is only offered when installed
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/x-msgpack", "application/msgpack")
+
+def _default(value: Any) -> Any:
+    """Encode values the encoders don't handle natively (numpy scalars/arrays, sets)"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+def _finite(value: Any) -> Any:
+    """Replace NaN/inf, which JSON can't carry, with None"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+def wants_msgpack(request: Request) -> bool:
+    """True if the client accepts msgpack and it is installed"""
+    accept = request.headers.get('accept', '')
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+def encode_json(content: Any) -> bytes:
+    """Serialize to JSON bytes with the fastest available encoder"""
+    if orjson is not None:
+        # orjson writes NaN/inf as null itself
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(content), default=_default, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
+
+def encode_msgpack(content: Any) -> bytes:
+    """Serialize to msgpack bytes"""
+    return msgpack.packb(_finite(content), default=_default, use_bin_type=True)
+
+def render(content: Any, request: Request, status_code: int = 200,
+           headers: Optional[Dict[str, str]] = None) -> Response:
+    """Build a response body as msgpack or JSON depending on the Accept header"""
+    headers = {**(headers or {}), 'Vary': 'Accept'}
+
+    if wants_msgpack(request):
+        return Response(encode_msgpack(content), status_code=status_code,
+                        headers=headers, media_type=MSGPACK_MEDIA_TYPES[0])
+
+    return Response(encode_json(content), status_code=status_code,
+                    headers=headers, media_type=JSON_MEDIA_TYPE)
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value for stage durations in milliseconds"""
+    return ', '.join(f"{name};dur={duration:.3f}" for name, duration in timings.items())
@@ -0,0 +1,364 @@
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+import csv
+import io
+import json
+import logging
+import threading
+
+from pydantic import ValidationError
+
+from config.settings import settings
+from core.utils import canonical_hash
+from data.schemas.user_input_schemas import UserInput
+
+logger = logging.getLogger(__name__)
+
+# A parsed batch record, or the error that made a line unreadable
+BatchRecord = Union[Dict[str, Any], Exception]
+
+RECORD_NUMERIC_FIELDS = {'latitude': float, 'longitude': float, 'budget': float, 'backup_hours': float}
+APPLIANCE_FIELDS = {'appliance': str, 'power_rating': float, 'hours_per_day': float, 'quantity': int,
+                    'surge_factor': float}
+
+_worker_orchestrator = None
+
+def _init_worker():
+    """Build the orchestrator once per worker so its caches span the batch"""
+    global _worker_orchestrator
+    from services.feedback import refresh_catalog_ratings
+    from services.orchestrator import SolarSystemOrchestrator
+    refresh_catalog_ratings()
+    _worker_orchestrator = SolarSystemOrchestrator()
+
+def _calculate(input_data: Dict[str, Any], detail: str = 'full') -> Dict[str, Any]:
+    """Run one calculation inside a batch worker"""
+    from services.catalog_manager import get_catalog_manager
+    if _worker_orchestrator is None:
+        _init_worker()
+    get_catalog_manager().check()
+    return _worker_orchestrator.calculate_solar_system(input_data, detail)
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[BatchRecord]:
+    """Parse newline-delimited JSON records lazily"""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Line {line_number}: invalid JSON ({e})")
+
+# Characters read from a JSON body at a time, and the most a single record
+# (or any other value in the body) may span
+JSON_CHUNK_CHARS = 64 * 1024
+JSON_VALUE_MAX_CHARS = 1024 * 1024
+
+class _JsonStream:
+    """Reads consecutive JSON values from a text stream, holding only the value being parsed"""
+
+    def __init__(self, text: TextIO):
+        self.text = text
+        self.buffer = ''
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.text.read(JSON_CHUNK_CHARS)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        if len(self.buffer) > JSON_VALUE_MAX_CHARS + JSON_CHUNK_CHARS:
+            raise ValueError(f"a value is longer than {JSON_VALUE_MAX_CHARS} characters")
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at the end of the body"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected '{char}', found {found!r}" if found else f"expected '{char}' before the end")
+        self.position += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.position = end
+            return value
+
+def _json_array(stream: _JsonStream) -> Iterator[Any]:
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.expect(']')
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() == ']':
+            stream.expect(']')
+            return
+        stream.expect(',')
+
+def iter_json_records(text: TextIO) -> Iterator[BatchRecord]:
+    """
+    Records from a JSON list body (or an object with a 'records' list),
+    parsed incrementally so memory does not grow with the body.
+    """
+    stream = _JsonStream(text)
+    try:
+        if stream.peek() == '[':
+            yield from _json_array(stream)
+            return
+        if stream.peek() == '{':
+            stream.expect('{')
+            while stream.peek() != '}':
+                key = stream.value()
+                stream.expect(':')
+                if key == 'records' and stream.peek() == '[':
+                    yield from _json_array(stream)
+                    return
+                stream.value()
+                if stream.peek() != '}':
+                    stream.expect(',')
+        yield ValueError("Batch body must be a list of calculation inputs")
+    except ValueError as e:
+        yield ValueError(f"Invalid JSON body: {e}")
+
+def _coerce(value: str, cast):
+    """Convert a CSV cell, treating blanks as missing"""
+    value = (value or '').strip()
+    if value == '':
+        return None
+    return cast(float(value)) if cast is int else cast(value)
+
+def iter_csv_records(lines: Iterable[str]) -> Iterator[BatchRecord]:
+    """
+    Parse CSV records lazily.
+
+    Either one row per input with a JSON-encoded 'appliances' column, or one
+    row per appliance grouped by consecutive 'record_id' values (load survey
+    layout) with 'appliance', 'power_rating', 'hours_per_day' and 'quantity'.
+    A grouped record with any unreadable row is reported as one error rather
+    than calculated without that appliance.
+    """
+    reader = csv.DictReader(lines)
+    fieldnames = set(reader.fieldnames or [])
+    grouped = 'appliances' not in fieldnames
+    if grouped and 'record_id' not in fieldnames:
+        yield ValueError("CSV batch needs an 'appliances' column or 'record_id' grouped appliance rows")
+        return
+
+    current_id, current = None, None
+    for row in reader:
+        try:
+            record = {
+                key: _coerce(row.get(key), cast)
+                for key, cast in RECORD_NUMERIC_FIELDS.items() if row.get(key)
+            }
+            for key in ('location', 'priority'):
+                if row.get(key):
+                    record[key] = row[key].strip()
+            if row.get('system_expansion'):
+                record['system_expansion'] = row['system_expansion'].strip().lower() in ('1', 'true', 'yes')
+
+            if not grouped:
+                record['appliances'] = json.loads(row['appliances'] or '[]')
+                yield record
+                continue
+
+            appliance = {
+                key: _coerce(row.get(key), cast)
+                for key, cast in APPLIANCE_FIELDS.items() if row.get(key)
+            }
+            error = None
+        except ValueError as e:
+            if not grouped:
+                yield ValueError(f"Row {reader.line_num}: {e}")
+                continue
+            error = ValueError(f"Record {row['record_id']}, row {reader.line_num}: {e}")
+
+        if row['record_id'] != current_id:
+            if current is not None:
+                yield current
+            current_id, current = row['record_id'], error or {**record, 'appliances': []}
+        elif error is not None and not isinstance(current, Exception):
+            current = error
+        if not isinstance(current, Exception):
+            current['appliances'].append(appliance)
+
+    if current is not None:
+        yield current
+
+def iter_batch_file(file: BinaryIO, batch_format: str) -> Iterator[BatchRecord]:
+    """Parse an uploaded batch file ('ndjson', 'csv' or 'json')"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        if batch_format == 'csv':
+            yield from iter_csv_records(text)
+        elif batch_format == 'json':
+            yield from iter_json_records(text)
+        else:
+            yield from iter_ndjson_records(text)
+    finally:
+        text.detach()
+
+def detect_batch_format(content_type: str = '', filename: str = '') -> str:
+    """Pick the batch parser from a content type or file extension"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    filename = (filename or '').lower()
+
+    if content_type in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl') \
+            or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'json'
+
+class BatchCalculator:
+    """
+    Runs many calculations on a worker pool and yields results as they finish.
+
+    Each record runs the full pipeline, including its own simulation; records
+    are not simulated together. What a batch shares is each worker's catalog
+    and stage cache, so stages whose inputs repeat across records (a common
+    location's irradiance, a common sizing) are computed once per worker.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, max_in_flight: Optional[int] = None,
+                 dedup_cache_size: Optional[int] = None, max_records: Optional[int] = None,
+                 detail: str = 'full'):
+        self.executor = executor or get_batch_executor()
+        self.detail = detail
+        self.max_in_flight = max_in_flight or settings.BATCH_MAX_IN_FLIGHT
+        self.dedup_cache_size = dedup_cache_size if dedup_cache_size is not None else settings.BATCH_DEDUP_CACHE_SIZE
+        self.max_records = max_records or settings.BATCH_MAX_RECORDS
+
+    def run(self, records: Iterable[BatchRecord]) -> Iterator[Dict[str, Any]]:
+        """
+        Calculate every record, yielding one result line per input index.
+
+        Identical inputs are calculated once. Only a bounded window of
+        calculations is in flight, and only a bounded number of finished
+        results are kept for deduplication, so memory does not grow with
+        the size of the batch.
+        """
+        pending: Dict[Future, str] = {}
+        waiting: Dict[str, List[int]] = {}
+        completed: OrderedDict = OrderedDict()
+
+        try:
+            for index, record in enumerate(records):
+                if index >= self.max_records:
+                    yield {'index': index, 'status': 'error',
+                           'error': f"Batch exceeds {self.max_records} records; remaining inputs skipped"}
+                    break
+
+                if isinstance(record, Exception):
+                    yield {'index': index, 'status': 'error', 'error': str(record)}
+                    continue
+
+                try:
+                    input_data = UserInput(**record).dict()
+                except (ValidationError, TypeError) as e:
+                    yield {'index': index, 'status': 'error', 'error': str(e)}
+                    continue
+
+                key = canonical_hash(input_data)
+                if key in completed:
+                    completed.move_to_end(key)
+                    yield self._result_line(index, key, completed[key], deduplicated=True)
+                    continue
+                if key in waiting:
+                    waiting[key].append(index)
+                    continue
+
+                waiting[key] = [index]
+                pending[self.executor.submit(_calculate, input_data, self.detail)] = key
+
+                # Block only when the in-flight window is full
+                yield from self._collect(pending, waiting, completed,
+                                         block=len(pending) >= self.max_in_flight)
+
+            while pending:
+                yield from self._collect(pending, waiting, completed, block=True)
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _collect(self, pending, waiting, completed, block: bool) -> Iterator[Dict[str, Any]]:
+        """Yield result lines for calculations that have finished"""
+        if not pending:
+            return
+
+        done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Batch calculation failed: {e}")
+                result = {'status': 'error', 'error': str(e)}
+
+            if self.dedup_cache_size > 0:
+                completed[key] = result
+                while len(completed) > self.dedup_cache_size:
+                    completed.popitem(last=False)
+
+            for position, index in enumerate(waiting.pop(key)):
+                yield self._result_line(index, key, result, deduplicated=position > 0)
+
+    def _result_line(self, index: int, key: str, result: Dict[str, Any], deduplicated: bool) -> Dict[str, Any]:
+        """Format one output line"""
+        return {
+            'index': index,
+            'status': result.get('status', 'error'),
+            'input_hash': key,
+            'deduplicated': deduplicated,
+            'result': result
+        }
+
+_batch_executor: Optional[Executor] = None
+_batch_executor_lock = threading.Lock()
+
+def get_batch_executor() -> Executor:
+    """Return the shared worker pool used for batch calculations"""
+    global _batch_executor
+
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ProcessPoolExecutor(
+                    max_workers=settings.BATCH_MAX_WORKERS,
+                    initializer=_init_worker
+                )
+                logger.info(f"Batch worker pool started with {settings.BATCH_MAX_WORKERS} workers")
+    return _batch_executor
+
+def shutdown_batch_executor() -> None:
+    """Stop the shared batch worker pool"""
+    global _batch_executor
+
+    with _batch_executor_lock:
+        if _batch_executor is not None:
+            _batch_executor.shutdown(wait=False, cancel_futures=True)
+            _batch_executor = None
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import threading
+import logging
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class StageCache:
+    """Bounded LRU cache of agent results, partitioned by workflow stage"""
+
+    def __init__(self, max_sizes: Optional[Dict[str, int]] = None, default_size: int = 256):
+        self.max_sizes = dict(max_sizes or {})
+        self.default_size = default_size
+        self._entries: Dict[str, OrderedDict] = {}
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, stage: str) -> OrderedDict:
+        """Get (or create) the entry table and counters for a stage"""
+        if stage not in self._entries:
+            self._entries[stage] = OrderedDict()
+            self._metrics[stage] = {"hits": 0, "misses": 0, "evictions": 0}
+        return self._entries[stage]
+
+    def get(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a stage key, or None on a miss"""
+        with self._lock:
+            entries = self._stage(stage)
+            value = entries.get(key)
+            if value is None:
+                self._metrics[stage]["misses"] += 1
+                return None
+
+            entries.move_to_end(key)
+            self._metrics[stage]["hits"] += 1
+            return value
+
+    def put(self, stage: str, key: str, value: Dict[str, Any]) -> None:
+        """Store a stage result, evicting the least recently used entries"""
+        max_size = self.max_sizes.get(stage, self.default_size)
+        if max_size <= 0:
+            return
+
+        with self._lock:
+            entries = self._stage(stage)
+            entries[key] = value
+            entries.move_to_end(key)
+
+            while len(entries) > max_size:
+                entries.popitem(last=False)
+                self._metrics[stage]["evictions"] += 1
+
+    def clear(self, stage: Optional[str] = None) -> None:
+        """Drop cached results for one stage or for all stages"""
+        with self._lock:
+            stages = [stage] if stage else list(self._entries)
+            for name in stages:
+                self._entries.pop(name, None)
+                self._metrics.pop(name, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage size and hit-rate metrics"""
+        with self._lock:
+            stats = {}
+            for stage, entries in self._entries.items():
+                metrics = self._metrics[stage]
+                lookups = metrics["hits"] + metrics["misses"]
+                stats[stage] = {
+                    "size": len(entries),
+                    "max_size": self.max_sizes.get(stage, self.default_size),
+                    "hits": metrics["hits"],
+                    "misses": metrics["misses"],
+                    "evictions": metrics["evictions"],
+                    "hit_rate": round(metrics["hits"] / lookups, 4) if lookups else 0.0
+                }
+            return stats
+
+class CalculationStore:
+    """Bounded LRU of finished calculations (input plus per-stage results) for incremental recalculation"""
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, calculation_id: str) -> Optional[Dict[str, Any]]:
+        """Return a stored calculation snapshot, or None if unknown or evicted"""
+        with self._lock:
+            snapshot = self._entries.get(calculation_id)
+            if snapshot is not None:
+                self._entries.move_to_end(calculation_id)
+            return snapshot
+
+    def put(self, calculation_id: str, snapshot: Dict[str, Any]) -> None:
+        """Store a calculation snapshot, evicting the least recently used"""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[calculation_id] = snapshot
+            self._entries.move_to_end(calculation_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+_stage_cache: Optional[StageCache] = None
+_stage_cache_lock = threading.Lock()
+
+def get_stage_cache() -> StageCache:
+    """Return the process-wide stage cache shared by all orchestrators"""
+    global _stage_cache
+
+    if _stage_cache is None:
+        with _stage_cache_lock:
+            if _stage_cache is None:
+                _stage_cache = StageCache(
+                    max_sizes=settings.STAGE_CACHE_SIZES,
+                    default_size=settings.STAGE_CACHE_DEFAULT_SIZE
+                )
+                logger.info("Stage cache initialized")
+    return _stage_cache
+
+_calculation_store: Optional[CalculationStore] = None
+
+def get_calculation_store() -> CalculationStore:
+    """Return the process-wide store of recent calculations"""
+    global _calculation_store
+
+    if _calculation_store is None:
+        with _stage_cache_lock:
+            if _calculation_store is None:
+                _calculation_store = CalculationStore(settings.CALCULATION_STORE_SIZE)
+    return _calculation_store
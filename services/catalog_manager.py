@@ -0,0 +1,177 @@
+from typing import Iterable, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+from config.settings import settings
+from services.cache import StageCache, get_stage_cache
+
+logger = logging.getLogger(__name__)
+
+# Stages that read the component catalog. Their cache keys carry the
+# catalog version, so entries made with a replaced catalog can never be
+# hit again; they are dropped on reload to free the space.
+CATALOG_STAGES = ('panel_sizing', 'battery_sizing', 'component_matching')
+
+class CatalogManager:
+    """
+    Keeps the process's component catalog in step with its source files.
+
+    check() compares the source's file sizes and modification times with
+    the last ones seen. Once a change has been stable for one check (so a
+    file still being copied is never read) and the contents differ from
+    the current catalog's, a new catalog and its indexes are built on the
+    calling thread, rated, and swapped in with a single reference
+    assignment. refresh_ratings() swaps in a rated copy the same way; a
+    published catalog is never modified. Calculations already running keep
+    the catalog they started with; cached stage results of the old catalog
+    are dropped. start() runs check() on a background thread every interval.
+    """
+
+    def __init__(self, interval: Optional[float] = None, stage_cache: Optional[StageCache] = None,
+                 database=None):
+        self.interval = interval if interval is not None else settings.CATALOG_RELOAD_INTERVAL_SECONDS
+        self.stage_cache = stage_cache
+        self.database = database
+        self.reloads = 0
+        self._seen: Optional[Tuple] = None
+        self._checked: Optional[Tuple] = None
+        self._last_check = 0.0
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fingerprint(self, source: str) -> Tuple:
+        from core.catalog import COMPONENT_FILES
+
+        files = []
+        for filename in sorted(COMPONENT_FILES.values()):
+            try:
+                stat = os.stat(os.path.join(source, filename))
+                files.append((filename, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                files.append((filename, None, None))
+        return (os.path.abspath(source), tuple(files))
+
+    def check(self) -> bool:
+        """
+        Reload the catalog if its source changed and has since been stable;
+        True if a new one was swapped in. Calls within an interval of the
+        previous check return False straight away, so callers between jobs
+        or records need no timer of their own.
+        """
+        from core.catalog import catalog_source, loaded_catalog
+
+        with self._check_lock:
+            now = time.monotonic()
+            if self.interval <= 0 or now - self._last_check < self.interval:
+                return False
+            self._last_check = now
+            if loaded_catalog() is None:
+                # Nothing to replace: first use builds from the current files
+                return False
+            source = catalog_source()
+            fingerprint = self._fingerprint(source)
+            if fingerprint == self._checked:
+                return False
+            if fingerprint != self._seen:
+                self._seen = fingerprint
+                return False
+            self._checked = fingerprint
+            return self._reload(source)
+
+    def reload(self, source: Optional[str] = None) -> bool:
+        """Rebuild the catalog from source now if its contents changed; True if it was swapped in"""
+        from core.catalog import catalog_source
+
+        with self._check_lock:
+            return self._reload(source or catalog_source())
+
+    def _reload(self, source: str) -> bool:
+        from core.catalog import ComponentCatalog, content_version, loaded_catalog, swap_catalog
+        from services.database import get_database
+        from services.feedback import component_ratings
+
+        started = time.perf_counter()
+        try:
+            current = loaded_catalog()
+            if current is not None and current.content_version == content_version(source):
+                return False
+            catalog = ComponentCatalog(source)
+            catalog = catalog.with_ratings(component_ratings((self.database or get_database()).connection(),
+                                                             list(catalog.indexes)))
+        except Exception as e:
+            logger.error(f"Catalog reload from {source} failed; keeping the current catalog: {e}")
+            return False
+
+        previous = swap_catalog(catalog)
+        self._clear_stages(CATALOG_STAGES)
+
+        self.reloads += 1
+        logger.info(f"Catalog {previous.version if previous else None} replaced by {catalog.version} from {source} "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return True
+
+    def refresh_ratings(self, component_types: Optional[Iterable[str]] = None) -> bool:
+        """
+        Swap in a copy of the catalog carrying the current feedback aggregates
+        (for all component types, or the given ones); True if they changed.
+        Cached stage results that used the old ratings are dropped.
+        """
+        from core.catalog import get_catalog, loaded_catalog, swap_catalog
+        from services.database import get_database
+        from services.feedback import RATED_STAGES, component_ratings
+
+        with self._check_lock:
+            current = loaded_catalog() or get_catalog()
+            conn = (self.database or get_database()).connection()
+            catalog = current.with_ratings(component_ratings(conn, component_types or list(current.indexes)))
+            if catalog.ratings_version == current.ratings_version:
+                return False
+            swap_catalog(catalog)
+        self._clear_stages(RATED_STAGES)
+        return True
+
+    def _clear_stages(self, stages: Tuple[str, ...]) -> None:
+        stage_cache = self.stage_cache
+        if stage_cache is None and settings.STAGE_CACHE_ENABLED:
+            stage_cache = get_stage_cache()
+        if stage_cache is not None:
+            for stage in stages:
+                stage_cache.clear(stage)
+
+    def start(self) -> None:
+        """Check for catalog changes every interval on a background thread"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background checks"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Catalog check failed: {e}")
+
+_catalog_manager: Optional[CatalogManager] = None
+_catalog_manager_lock = threading.Lock()
+
+def get_catalog_manager() -> CatalogManager:
+    """Return the process-wide catalog manager"""
+    global _catalog_manager
+
+    if _catalog_manager is None:
+        with _catalog_manager_lock:
+            if _catalog_manager is None:
+                _catalog_manager = CatalogManager()
+    return _catalog_manager
@@ -0,0 +1,301 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+from config.settings import settings
+from services.analytics import ANALYTICS_SCHEMA, EXTRACTED_COLUMNS, RollupAccumulator, extract_columns
+from services.feedback import create_ratings_schema
+from services.telemetry import create_telemetry_schema
+
+logger = logging.getLogger(__name__)
+
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_calculations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    calculation_id TEXT,
+    location TEXT NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    budget REAL NOT NULL,
+    daily_consumption_kwh REAL,
+    system_cost REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    input_data TEXT,
+    results TEXT
+);
+CREATE TABLE IF NOT EXISTS component_feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    component_type TEXT NOT NULL,
+    component_model TEXT NOT NULL,
+    rating INTEGER CHECK(rating >= 1 AND rating <= 5),
+    feedback TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS system_performance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_calculation_id INTEGER,
+    actual_generation_kwh REAL,
+    actual_consumption_kwh REAL,
+    performance_ratio REAL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_calculation_id) REFERENCES user_calculations (id)
+);
+"""
+
+# Columns added after the first release; created on older databases
+MIGRATIONS = {
+    'user_calculations': {'calculation_id': 'TEXT', **EXTRACTED_COLUMNS}
+}
+
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_calculations_calculation_id ON user_calculations (calculation_id);
+CREATE INDEX IF NOT EXISTS idx_calculations_location ON user_calculations (location, created_at);
+CREATE INDEX IF NOT EXISTS idx_calculations_created ON user_calculations (created_at);
+CREATE INDEX IF NOT EXISTS idx_calculations_state ON user_calculations (state, created_at);
+CREATE INDEX IF NOT EXISTS idx_histograms_day ON calculation_histograms (day);
+CREATE INDEX IF NOT EXISTS idx_feedback_component ON component_feedback (component_type, component_model);
+CREATE INDEX IF NOT EXISTS idx_performance_calculation ON system_performance (user_calculation_id, recorded_at);
+"""
+
+CALCULATION_COLUMNS = (
+    'calculation_id', 'location', 'latitude', 'longitude', 'budget', 'daily_consumption_kwh',
+    'system_cost', 'created_at', 'input_data', 'results'
+) + tuple(EXTRACTED_COLUMNS)
+
+INSERT_CALCULATION = f"""
+INSERT OR IGNORE INTO user_calculations ({', '.join(CALCULATION_COLUMNS)})
+VALUES ({', '.join('?' for _ in CALCULATION_COLUMNS)})
+"""
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    """Create tables and indexes, adding any columns missing from older databases"""
+    conn.executescript(DATABASE_SCHEMA)
+    conn.executescript(ANALYTICS_SCHEMA)
+    for table, columns in MIGRATIONS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    conn.executescript(INDEXES)
+    create_ratings_schema(conn)
+    create_telemetry_schema(conn)
+
+class Database:
+    """
+    SQLite access with one long-lived WAL connection per thread.
+
+    Connections are never shared between threads or across a fork, and
+    each keeps sqlite3's prepared-statement cache warm, so the constant SQL
+    used here is compiled once per connection.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.DATABASE_PATH
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._open()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    create_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """Run one statement (autocommit)"""
+        return self.connection().execute(sql, params)
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Run a query and return rows as dicts"""
+        return [dict(row) for row in self.connection().execute(sql, params)]
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed statements as one write transaction"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> int:
+        """Write many rows in a single transaction"""
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def calculation_row(calculation_id: str, user_input: Dict[str, Any], result: Dict[str, Any],
+                    created_at: str) -> Dict[str, Any]:
+    """Flatten a finished calculation into user_calculations columns"""
+    summary = result.get('executive_summary', {})
+    return {
+        'calculation_id': calculation_id,
+        'location': user_input.get('location', ''),
+        'latitude': user_input.get('latitude'),
+        'longitude': user_input.get('longitude'),
+        'budget': user_input.get('budget', 0),
+        'daily_consumption_kwh': summary.get('daily_energy_needs'),
+        'system_cost': summary.get('recommended_system_cost'),
+        'created_at': created_at,
+        'input_data': json.dumps(user_input, default=str),
+        'results': json.dumps(result, default=str),
+        **extract_columns(user_input, result)
+    }
+
+class CalculationWriter:
+    """
+    Records calculations off the request path.
+
+    record() only enqueues; a background thread serializes and inserts the
+    queued calculations in batches, one transaction per batch that also
+    updates the analytics rollups. If the queue
+    is full the calculation is dropped (and counted) rather than blocking
+    the caller.
+    """
+
+    def __init__(self, database: Optional[Database] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_queue: Optional[int] = None):
+        self.database = database or get_database()
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.DB_WRITE_FLUSH_SECONDS
+        self.max_queue = max_queue or settings.DB_WRITE_QUEUE_SIZE
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> queue.Queue:
+        """Start the writer thread (again, after a fork)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.max_queue)
+                    self._thread = threading.Thread(target=self._run, name="calculation-writer", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def record(self, calculation_id: str, user_input: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """Queue a finished calculation for writing; never blocks"""
+        pending = self._ensure_started()
+        try:
+            pending.put_nowait((calculation_id, user_input, result, datetime.now().isoformat(sep=' ')))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Calculation writer queue full; dropped {calculation_id}")
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything queued so far is written"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        with self._queue.all_tasks_done:
+            self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def stop(self) -> None:
+        """Write what is queued and stop the writer thread"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
+            self._thread, self._pid = None, None
+
+    def _run(self) -> None:
+        pending = self._queue
+        while True:
+            item = pending.get()
+            batch = [item]
+            # Gather whatever else arrives within the flush interval
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = pending.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            records = [entry for entry in batch if entry is not None]
+            if records:
+                self._write(records)
+            for _ in batch:
+                pending.task_done()
+            if len(records) < len(batch):
+                self.database.close()
+                return
+
+    def _write(self, records: List[Tuple]) -> None:
+        """Insert a batch and fold it into the analytics rollups in the same transaction"""
+        try:
+            rows = [calculation_row(*record) for record in records]
+            rollups = RollupAccumulator()
+            with self.database.transaction() as conn:
+                for row in rows:
+                    inserted = conn.execute(INSERT_CALCULATION, [row[column] for column in CALCULATION_COLUMNS]).rowcount
+                    if inserted:  # duplicates are ignored and must not be counted twice
+                        rollups.add(row)
+                rollups.flush(conn)
+            self.written += len(records)
+        except Exception as e:
+            logger.error(f"Failed to record {len(records)} calculations: {e}")
+
+_database: Optional[Database] = None
+_writer: Optional[CalculationWriter] = None
+_singleton_lock = threading.Lock()
+
+def get_database() -> Database:
+    """Return the process-wide database handle"""
+    global _database
+
+    if _database is None:
+        with _singleton_lock:
+            if _database is None:
+                _database = Database()
+    return _database
+
+def get_calculation_writer() -> CalculationWriter:
+    """Return the process-wide calculation writer"""
+    global _writer
+
+    if _writer is None:
+        database = get_database()
+        with _singleton_lock:
+            if _writer is None:
+                _writer = CalculationWriter(database)
+    return _writer
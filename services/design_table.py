@@ -0,0 +1,253 @@
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from config.settings import settings
+from agents.battery_sizing_agent import BatterySizingAgent
+from agents.component_matching_agent import ComponentMatchingAgent, required_inverter_watts
+from agents.panel_sizing_agent import PanelSizingAgent
+from core.exceptions import DataNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Stages answered from the table, in workflow order
+TABLE_STAGES = ('panel_sizing', 'battery_sizing', 'component_matching')
+
+# Grid axes and the way a request snaps onto them: demand rounds up and the
+# solar resource rounds down, so a tabled design always covers the request
+AXIS_SNAP = {
+    'daily_consumption_kwh': 'up',
+    'peak_sun_hours': 'down',
+    'backup_hours': 'up',
+    'peak_load_watts': 'up'
+}
+
+# Workflow fields the table was built without (the agents' defaults applied);
+# requests that set them are calculated in full
+DEFAULTED_FIELDS = ('system_efficiency', 'system_voltage')
+
+def catalog_table_version() -> str:
+    """Component data version a table is built for (ratings are as of the build)"""
+    from core.catalog import get_catalog
+    return get_catalog().content_version[:16]
+
+def _build_cells(axes: Dict[str, Sequence[float]], cells: List[Tuple[int, ...]]) -> List[Dict[str, Optional[bytes]]]:
+    """
+    Run the sizing and matching agents at each grid cell.
+
+    Returns one {stage: compressed JSON result, or None if it failed} per
+    cell. Sizing results are memoized on their agents' cache keys, since
+    each depends on only two of the four axes.
+    """
+    agents = {'panel_sizing': PanelSizingAgent(), 'battery_sizing': BatterySizingAgent(),
+              'component_matching': ComponentMatchingAgent()}
+    memo: Dict[Tuple[str, str], Optional[bytes]] = {}
+    names = list(axes)
+
+    encoded = []
+    for cell in cells:
+        workflow_data = {name: axes[name][position] for name, position in zip(names, cell)}
+        results = {}
+        for stage in TABLE_STAGES:
+            agent = agents[stage]
+            key = (stage, agent.cache_key(workflow_data))
+            if key not in memo:
+                result = agent.process(workflow_data)
+                memo[key] = (zlib.compress(json.dumps(result, default=float).encode())
+                             if result.get('status') == 'success' else None)
+            results[stage] = memo[key]
+            if memo[key] is None:
+                break
+            workflow_data.update(json.loads(zlib.decompress(memo[key])))
+        encoded.append(results)
+    return encoded
+
+def _init_build_worker():
+    """Builder worker: load the current feedback ratings so matching ranks as it would live"""
+    from services.feedback import refresh_catalog_ratings
+    refresh_catalog_ratings()
+
+class DesignTable:
+    """
+    Sizing and matching results precomputed over a grid of typical requests.
+
+    For each stage, an integer array over the grid (one dimension per axis)
+    points into a pool of distinct results, each stored as compressed JSON
+    in one byte buffer; -1 marks cells where the stage failed. A lookup
+    snaps the request onto the grid and decodes the results stored there.
+    """
+
+    def __init__(self, axes: Dict[str, np.ndarray], indexes: Dict[str, np.ndarray], blob: np.ndarray,
+                 offsets: np.ndarray, catalog_version: str, metadata: Optional[Dict[str, Any]] = None):
+        self.axes = axes
+        self.indexes = indexes
+        self.blob = blob
+        self.offsets = offsets
+        self.catalog_version = catalog_version
+        self.metadata = metadata or {}
+        self._points = {name: values.tolist() for name, values in axes.items()}
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(values) for values in self.axes.values())
+
+    def snap(self, workflow_data: Dict[str, Any]) -> Optional[Tuple[int, ...]]:
+        """Grid cell for a request, or None if it falls outside the grid"""
+        if any(workflow_data.get(field) is not None for field in DEFAULTED_FIELDS):
+            return None
+
+        cell = []
+        for name, points in self._points.items():
+            value = workflow_data.get(name)
+            if not isinstance(value, (int, float)) or not points[0] <= value <= points[-1]:
+                return None
+            if AXIS_SNAP[name] == 'up':
+                cell.append(bisect_left(points, value))
+            else:
+                cell.append(bisect_right(points, value) - 1)
+
+        # Tabled inverters cover the grid point's running peak only, so a
+        # request whose start-up surge needs a larger one is calculated in full
+        peak = self._points['peak_load_watts'][cell[list(self._points).index('peak_load_watts')]]
+        if required_inverter_watts(peak, workflow_data.get('surge_peak_watts') or 0) > required_inverter_watts(peak):
+            return None
+        return tuple(cell)
+
+    def lookup(self, workflow_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Tabled stage results for a request: {'grid_point': snapped axis
+        values, 'stages': {stage: result}}, or None if the request is off-grid
+        or the grid point has no complete design.
+        """
+        cell = self.snap(workflow_data)
+        if cell is None:
+            return None
+
+        stages = {}
+        for stage in TABLE_STAGES:
+            entry = int(self.indexes[stage][cell])
+            if entry < 0:
+                return None
+            result = json.loads(zlib.decompress(self.blob[self.offsets[entry]:self.offsets[entry + 1]]))
+            # Results echo the snapped axis values; the request's own must survive the merge
+            stages[stage] = {key: value for key, value in result.items() if key not in AXIS_SNAP}
+        grid_point = {name: points[position] for (name, points), position in zip(self._points.items(), cell)}
+        return {'grid_point': grid_point, 'stages': stages}
+
+    @classmethod
+    def build(cls, axes: Optional[Dict[str, Sequence[float]]] = None, workers: Optional[int] = None,
+              chunk_size: int = 200) -> 'DesignTable':
+        """
+        Run the pipeline's sizing and matching stages over every grid cell.
+
+        Cells are spread over a process pool when workers > 1; identical
+        results are stored once.
+        """
+        started = time.perf_counter()
+        axes = axes or settings.DESIGN_TABLE_AXES
+        unknown = set(axes) ^ set(AXIS_SNAP)
+        if unknown:
+            raise ValueError(f"Design table axes must be exactly {sorted(AXIS_SNAP)}")
+        axes = {name: sorted(float(value) for value in axes[name]) for name in AXIS_SNAP}
+        workers = workers or settings.DESIGN_TABLE_WORKERS
+
+        shape = tuple(len(values) for values in axes.values())
+        cells = list(product(*(range(size) for size in shape)))
+        chunks = [cells[i:i + chunk_size] for i in range(0, len(cells), chunk_size)]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker) as pool:
+                encoded = [cell for chunk in pool.map(_build_cells, [axes] * len(chunks), chunks) for cell in chunk]
+        else:
+            encoded = [cell for chunk in chunks for cell in _build_cells(axes, chunk)]
+
+        pool_ids: Dict[str, int] = {}
+        payloads: List[bytes] = []
+        indexes = {stage: np.full(shape, -1, dtype=np.int32) for stage in TABLE_STAGES}
+        for cell, results in zip(cells, encoded):
+            for stage, payload in results.items():
+                if payload is None:
+                    continue
+                digest = hashlib.sha1(payload).hexdigest()
+                if digest not in pool_ids:
+                    pool_ids[digest] = len(payloads)
+                    payloads.append(payload)
+                indexes[stage][cell] = pool_ids[digest]
+
+        offsets = np.zeros(len(payloads) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(payload) for payload in payloads])
+        blob = np.frombuffer(b''.join(payloads), dtype=np.uint8)
+        metadata = {'cells': len(cells), 'results': len(payloads),
+                    'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'build_seconds': round(time.perf_counter() - started, 1)}
+        logger.info(f"Design table built: {metadata}")
+        return cls({name: np.array(values) for name, values in axes.items()}, indexes, blob, offsets,
+                   catalog_table_version(), metadata)
+
+    def save(self, path: str) -> None:
+        """Write the table to an .npz file"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        metadata = {**self.metadata, 'catalog_version': self.catalog_version, 'axes': list(self.axes),
+                    'stages': list(TABLE_STAGES)}
+        arrays = {f"axis_{name}": values for name, values in self.axes.items()}
+        arrays.update({f"index_{stage}": index for stage, index in self.indexes.items()})
+        with open(path, 'wb') as f:
+            np.savez(f, blob=self.blob, offsets=self.offsets, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'DesignTable':
+        """Read a table written by save()"""
+        if not os.path.exists(path):
+            raise DataNotFoundError(f"Design table not found: {path}")
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('stages') != list(TABLE_STAGES) or metadata.get('axes') != list(AXIS_SNAP):
+                raise ValueError(f"Design table at {path} has a different layout")
+            axes = {name: data[f"axis_{name}"] for name in metadata.pop('axes')}
+            indexes = {stage: data[f"index_{stage}"] for stage in metadata.pop('stages')}
+            return cls(axes, indexes, data['blob'], data['offsets'], metadata.pop('catalog_version'), metadata)
+
+def design_table_path(version: Optional[str] = None) -> str:
+    """Where the table for a catalog version lives"""
+    return settings.DESIGN_TABLE_PATH.format(version=version or catalog_table_version())
+
+_design_table: Optional[DesignTable] = None
+_design_table_lock = threading.Lock()
+
+def get_design_table() -> Optional[DesignTable]:
+    """
+    Return the table built for the current catalog contents, loading it on
+    first use, or None if no table has been built for them.
+    """
+    global _design_table
+
+    version = catalog_table_version()
+    table = _design_table
+    if table is not None and table.catalog_version == version:
+        return table
+
+    path = design_table_path(version)
+    if not os.path.exists(path):
+        return None
+    with _design_table_lock:
+        if _design_table is None or _design_table.catalog_version != version:
+            _design_table = DesignTable.load(path)
+        return _design_table
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    parser = argparse.ArgumentParser(description="Build the design lookup table for the current catalog")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    table = DesignTable.build(workers=args.workers)
+    table.save(design_table_path(table.catalog_version))
@@ -0,0 +1,105 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+import sqlite3
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Running rating totals per model, kept current by triggers on component_feedback
+# so every insert (API or otherwise) updates them in the same transaction
+RATINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS component_ratings (
+    component_type TEXT NOT NULL,
+    component_model TEXT NOT NULL,
+    ratings INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (component_type, component_model)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS trg_component_feedback_insert AFTER INSERT ON component_feedback
+WHEN NEW.rating IS NOT NULL
+BEGIN
+    INSERT INTO component_ratings (component_type, component_model, ratings, rating_sum)
+    VALUES (NEW.component_type, NEW.component_model, 1, NEW.rating)
+    ON CONFLICT (component_type, component_model) DO UPDATE SET
+        ratings = ratings + 1,
+        rating_sum = rating_sum + excluded.rating_sum;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_component_feedback_delete AFTER DELETE ON component_feedback
+WHEN OLD.rating IS NOT NULL
+BEGIN
+    UPDATE component_ratings SET ratings = ratings - 1, rating_sum = rating_sum - OLD.rating
+    WHERE component_type = OLD.component_type AND component_model = OLD.component_model;
+END;
+"""
+
+BACKFILL_RATINGS = """
+INSERT INTO component_ratings (component_type, component_model, ratings, rating_sum)
+SELECT component_type, component_model, COUNT(rating), SUM(rating)
+FROM component_feedback WHERE rating IS NOT NULL
+GROUP BY component_type, component_model
+"""
+
+# Stages whose results depend on the catalog's rating columns
+RATED_STAGES = ('component_matching',)
+
+def create_ratings_schema(conn: sqlite3.Connection) -> None:
+    """Create the rating aggregates, backfilling them from feedback recorded before they existed"""
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'component_ratings'"
+    ).fetchone()
+    conn.executescript(RATINGS_SCHEMA)
+    if not existed:
+        conn.execute(BACKFILL_RATINGS)
+
+def component_ratings(conn: sqlite3.Connection, component_types: Optional[Iterable[str]] = None,
+                      prior_weight: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Count, mean and Bayesian-smoothed score per model, grouped by component type.
+
+    The score pulls each model's mean towards its type's overall mean as if
+    it had prior_weight extra ratings at that mean, so a single 5-star rating
+    does not outrank a long record of 4.5s. Returns {type: {'default_score',
+    'models': {model: (count, mean, score)}}}; default_score (the type mean)
+    is what unrated models get.
+    """
+    prior_weight = settings.FEEDBACK_PRIOR_WEIGHT if prior_weight is None else prior_weight
+    sql = "SELECT component_type, component_model, ratings, rating_sum FROM component_ratings WHERE ratings > 0"
+    params = []
+    if component_types is not None:
+        component_types = list(component_types)
+        sql += f" AND component_type IN ({', '.join('?' for _ in component_types)})"
+        params = component_types
+
+    grouped: Dict[str, list] = {component_type: [] for component_type in component_types or []}
+    for component_type, model, count, total in conn.execute(sql, params):
+        grouped.setdefault(component_type, []).append((model, count, total))
+
+    ratings = {}
+    for component_type, rows in grouped.items():
+        count_total = sum(count for _, count, _ in rows)
+        prior_mean = sum(total for _, _, total in rows) / count_total if count_total else settings.FEEDBACK_PRIOR_MEAN
+        ratings[component_type] = {
+            'default_score': prior_mean,
+            'models': {
+                model: (count, total / count, (prior_weight * prior_mean + total) / (prior_weight + count))
+                for model, count, total in rows
+            }
+        }
+    return ratings
+
+def record_feedback(database, component_type: str, component_model: str, rating: int,
+                    feedback: Optional[str] = None) -> Tuple[int, float, float]:
+    """Store one rating and return the model's updated (count, mean, score)"""
+    with database.transaction() as conn:
+        conn.execute(
+            "INSERT INTO component_feedback (component_type, component_model, rating, feedback) VALUES (?, ?, ?, ?)",
+            (component_type, component_model, rating, feedback)
+        )
+    return component_ratings(database.connection(), [component_type])[component_type]['models'][component_model]
+
+def refresh_catalog_ratings(component_types: Optional[Iterable[str]] = None, manager=None) -> bool:
+    """Load the current rating aggregates into the process catalog (as a new catalog); True if they changed"""
+    from services.catalog_manager import get_catalog_manager
+
+    return (manager or get_catalog_manager()).refresh_ratings(component_types)
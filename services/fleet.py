@@ -0,0 +1,225 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import sqlite3
+import time
+
+import numpy as np
+
+from config.settings import settings
+from agents.irradiance_agent import IrradianceAgent
+from agents.simulation_agent import expected_generation_kwh, simulation_irradiance
+from services.cache import StageCache, get_stage_cache
+from services.database import Database, get_database
+
+logger = logging.getLogger(__name__)
+
+# Systems that can be simulated: linked to a recorded design with a known array size
+FLEET_QUERY = """
+SELECT s.system_id, s.calculation_id, c.system_size_kw, c.location, c.latitude, c.longitude
+FROM telemetry_systems s JOIN user_calculations c ON c.calculation_id = s.calculation_id
+WHERE c.system_size_kw > 0
+ORDER BY s.system_id
+"""
+
+ACTUALS_QUERY = """
+SELECT system_id, day, actual_generation_kwh FROM system_performance
+WHERE day BETWEEN ? AND ? AND actual_generation_kwh IS NOT NULL
+  AND system_id IN (SELECT value FROM json_each(?))
+"""
+
+UPSERT_FLEET = """
+INSERT OR REPLACE INTO fleet_performance
+    (system_id, calculation_id, analyzed_at, window_start, window_end, days_observed,
+     actual_generation_kwh, expected_generation_kwh, performance_ratio, anomaly_score, underperforming)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Scale of a normal distribution's MAD, so robust z-scores read like standard deviations
+MAD_SCALE = 1.4826
+
+def compare_chunk(conn: sqlite3.Connection, system_ids: Sequence[str], expected: np.ndarray,
+                  start: str) -> Dict[str, Any]:
+    """
+    Compare a chunk of systems' daily generation with the simulation.
+
+    expected is the simulated daily generation (systems × days, in kWh) for
+    the window beginning at start. Returns per-system totals over the days
+    that have telemetry, plus (ratio, system_id, day) rows for the daily
+    performance ratios.
+    """
+    end = (date.fromisoformat(start) + timedelta(days=expected.shape[1] - 1)).isoformat()
+    rows = conn.execute(ACTUALS_QUERY, (start, end, json.dumps(list(system_ids)))).fetchall()
+
+    actual = np.full(expected.shape, np.nan)
+    if rows:
+        position = {system_id: index for index, system_id in enumerate(system_ids)}
+        ids, days, values = zip(*rows)
+        offsets = (np.array(days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+        actual[[position[system_id] for system_id in ids], offsets] = values
+
+    observed = ~np.isnan(actual) & (expected > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily_ratios = np.where(observed, actual / expected, np.nan)
+
+    day_labels = np.datetime64(start, 'D') + np.arange(expected.shape[1])
+    system_index, day_index = np.nonzero(observed)
+    return {
+        'days_observed': observed.sum(axis=1),
+        'actual_kwh': np.where(observed, actual, 0).sum(axis=1),
+        'expected_kwh': np.where(observed, expected, 0).sum(axis=1),
+        'daily_ratios': [
+            (round(float(daily_ratios[i, d]), 4), system_ids[i], str(day_labels[d]))
+            for i, d in zip(system_index, day_index)
+        ]
+    }
+
+def _analyze_chunk(db_path: str, system_ids: Sequence[str], expected: np.ndarray, start: str) -> Dict[str, Any]:
+    """Pool worker entry point: compare one chunk on the worker's own connection"""
+    database = Database(db_path)
+    try:
+        return compare_chunk(database.connection(), system_ids, expected, start)
+    finally:
+        database.close()
+
+def robust_z_scores(values: np.ndarray) -> np.ndarray:
+    """Distance from the median in (MAD-estimated) standard deviations"""
+    if not len(values):
+        return values
+    median = np.median(values)
+    spread = max(float(np.median(np.abs(values - median))) * MAD_SCALE, 0.01)
+    return (values - median) / spread
+
+class FleetAnalyzer:
+    """
+    Compares installed systems' measured generation with what the simulation
+    predicts for their design and location.
+
+    Simulated daily generation is linear in array size, so one per-watt
+    figure is computed per irradiance location cell (the irradiance stage's
+    quantized cache key), at the daily irradiance the simulation agent uses,
+    and scaled by each system's capacity. Systems are compared in chunks
+    spread over a process pool.
+    """
+
+    def __init__(self, database: Optional[Database] = None, stage_cache: Optional[StageCache] = None):
+        self.database = database or get_database()
+        if stage_cache is None and settings.STAGE_CACHE_ENABLED:
+            stage_cache = get_stage_cache()
+        self.stage_cache = stage_cache
+        self.irradiance_agent = IrradianceAgent()
+        self._cells: Dict[str, float] = {}
+
+    def cell_irradiance(self, location: Dict[str, Any]) -> Tuple[str, float]:
+        """Location cell key and the daily irradiance (kWh/m²) its systems are simulated at"""
+        agent = self.irradiance_agent
+        key = agent.cache_key(location, quantize=True)
+        if key in self._cells:
+            return key, self._cells[key]
+
+        result = self.stage_cache.get('irradiance_agent', key) if self.stage_cache is not None else None
+        if result is None:
+            result = agent.process({**location, **agent.quantized_inputs(location)})
+            if self.stage_cache is not None and result.get('status') == 'success':
+                self.stage_cache.put('irradiance_agent', key, result)
+
+        self._cells[key] = simulation_irradiance(result)
+        return key, self._cells[key]
+
+    def run(self, days: Optional[int] = None, end: Optional[date] = None, workers: Optional[int] = None,
+            chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Analyze every linked system over the window ending at end (default:
+        yesterday, UTC, as today's telemetry is still arriving), store the
+        results in fleet_performance and the daily ratios in
+        system_performance, and return a run summary.
+        """
+        started = time.perf_counter()
+        days = days or settings.FLEET_ANALYSIS_DAYS
+        workers = workers or settings.FLEET_ANALYSIS_WORKERS
+        chunk_size = chunk_size or settings.FLEET_CHUNK_SIZE
+        end = end or datetime.now(timezone.utc).date() - timedelta(days=1)
+        start = (end - timedelta(days=days - 1)).isoformat()
+
+        fleet = [dict(row) for row in self.database.connection().execute(FLEET_QUERY)]
+        summary = {'window_start': start, 'window_end': end.isoformat(), 'systems': len(fleet),
+                   'analyzed': 0, 'underperforming': 0}
+        if not fleet:
+            return summary
+
+        # Simulated kWh per installed watt and day, per location cell
+        cell_index, cell_keys, location_cells = [], {}, {}
+        for system in fleet:
+            location = (system['location'], system['latitude'], system['longitude'])
+            if location not in location_cells:
+                key, _ = self.cell_irradiance(dict(zip(('location', 'latitude', 'longitude'), location)))
+                location_cells[location] = cell_keys.setdefault(key, len(cell_keys))
+            cell_index.append(location_cells[location])
+        per_watt = expected_generation_kwh(1.0, np.array([self._cells[key] for key in cell_keys]))
+        capacity = np.array([system['system_size_kw'] * 1000 for system in fleet])
+        expected = np.repeat((capacity * per_watt[cell_index])[:, None], days, axis=1)
+
+        system_ids = [system['system_id'] for system in fleet]
+        chunks = [(system_ids[i:i + chunk_size], expected[i:i + chunk_size]) for i in range(0, len(fleet), chunk_size)]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                results = list(pool.map(_analyze_chunk, *zip(*[(self.database.db_path, ids, block, start)
+                                                             for ids, block in chunks])))
+        else:
+            conn = self.database.connection()
+            results = [compare_chunk(conn, ids, block, start) for ids, block in chunks]
+
+        days_observed = np.concatenate([result['days_observed'] for result in results])
+        actual_kwh = np.concatenate([result['actual_kwh'] for result in results])
+        expected_kwh = np.concatenate([result['expected_kwh'] for result in results])
+
+        # Only systems with enough days are scored against the fleet
+        eligible = (days_observed >= settings.FLEET_MIN_DAYS) & (expected_kwh > 0)
+        ratios = np.full(len(fleet), np.nan)
+        ratios[eligible] = actual_kwh[eligible] / expected_kwh[eligible]
+        scores = np.full(len(fleet), np.nan)
+        scores[eligible] = robust_z_scores(ratios[eligible])
+        underperforming = eligible & (
+            (np.nan_to_num(ratios, nan=1.0) < settings.FLEET_MIN_PERFORMANCE_RATIO)
+            | (np.nan_to_num(scores) <= -settings.FLEET_ANOMALY_THRESHOLD)
+        )
+
+        analyzed_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        rows = [
+            (system['system_id'], system['calculation_id'], analyzed_at, start, end.isoformat(),
+             int(days_observed[i]), round(float(actual_kwh[i]), 4), round(float(expected_kwh[i]), 4),
+             None if np.isnan(ratios[i]) else round(float(ratios[i]), 4),
+             None if np.isnan(scores[i]) else round(float(scores[i]), 3),
+             int(underperforming[i]))
+            for i, system in enumerate(fleet)
+        ]
+        with self.database.transaction() as conn:
+            for result in results:
+                conn.executemany(
+                    "UPDATE system_performance SET performance_ratio = ? WHERE system_id = ? AND day = ?",
+                    result['daily_ratios']
+                )
+            conn.executemany(UPSERT_FLEET, rows)
+
+        summary.update({
+            'analyzed': int(eligible.sum()),
+            'underperforming': int(underperforming.sum()),
+            'duration_seconds': round(time.perf_counter() - started, 3)
+        })
+        logger.info(f"Fleet analysis: {summary}")
+        return summary
+
+def fleet_performance(conn: sqlite3.Connection, underperforming_only: bool = False,
+                      limit: int = 100) -> List[Dict[str, Any]]:
+    """Latest fleet analysis results, most anomalous first"""
+    sql = "SELECT * FROM fleet_performance"
+    if underperforming_only:
+        sql += " WHERE underperforming = 1"
+    sql += " ORDER BY anomaly_score IS NULL, anomaly_score LIMIT ?"
+    return [dict(row) for row in conn.execute(sql, (limit,))]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    FleetAnalyzer().run()
@@ -0,0 +1,377 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Stage events in a full calculation, for progress reporting
+CALCULATION_STAGES = 9
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculation_jobs (
+    id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    ttl_seconds INTEGER NOT NULL,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON calculation_jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_client ON calculation_jobs (client_id, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_expiry ON calculation_jobs (expires_at);
+"""
+
+class JobCancelled(Exception):
+    """Raised inside a job handler when the job was cancelled"""
+    pass
+
+class JobQueue:
+    """Durable priority job queue stored in the SQLite database"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.DATABASE_PATH
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; the queue is low-rate so connections are short-lived"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            conn.executescript(JOBS_SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def submit(self, kind: str, payload: Dict[str, Any], client_id: str = "anonymous",
+               priority: int = 0, ttl_seconds: Optional[int] = None) -> str:
+        """Queue a job and return its ID"""
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            queued = conn.execute(
+                "SELECT COUNT(*) FROM calculation_jobs WHERE client_id = ? AND status IN ('queued', 'running')",
+                (client_id,)
+            ).fetchone()[0]
+            if queued >= settings.JOB_MAX_PENDING_PER_CLIENT:
+                raise ValueError(f"Client {client_id} already has {queued} pending jobs")
+
+            conn.execute(
+                """INSERT INTO calculation_jobs (id, client_id, kind, priority, payload, ttl_seconds, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, client_id, kind, priority, json.dumps(payload),
+                 ttl_seconds or settings.JOB_RESULT_TTL_SECONDS, time.time())
+            )
+        finally:
+            conn.close()
+
+        logger.info(f"Queued {kind} job {job_id} for {client_id} (priority {priority})")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status, and its result once finished"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM calculation_jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None or self._is_expired(row):
+            return None
+        return self._to_dict(row)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job, or ask the worker to stop a running one"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM calculation_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            status = row['status']
+            if status == 'queued':
+                conn.execute(
+                    """UPDATE calculation_jobs SET status = 'cancelled', finished_at = ?,
+                       expires_at = ? + ttl_seconds WHERE id = ?""",
+                    (time.time(), time.time(), job_id)
+                )
+                status = 'cancelled'
+            elif status == 'running':
+                conn.execute("UPDATE calculation_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+            return status
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the highest-priority job whose client is under its concurrency cap"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """SELECT j.* FROM calculation_jobs j
+                   WHERE j.status = 'queued'
+                     AND (SELECT COUNT(*) FROM calculation_jobs r
+                          WHERE r.client_id = j.client_id AND r.status = 'running') < ?
+                   ORDER BY j.priority DESC, j.created_at
+                   LIMIT 1""",
+                (settings.JOB_MAX_RUNNING_PER_CLIENT,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            conn.execute(
+                "UPDATE calculation_jobs SET status = 'running', worker_id = ?, started_at = ? WHERE id = ?",
+                (worker_id, time.time(), row['id'])
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        job = self._to_dict(row)
+        job['payload'] = json.loads(row['payload'])
+        return job
+
+    def update_progress(self, job_id: str, progress: float) -> bool:
+        """Record progress (0-1); returns False if cancellation was requested"""
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE calculation_jobs SET progress = ? WHERE id = ?", (progress, job_id))
+            row = conn.execute("SELECT cancel_requested FROM calculation_jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return not (row and row['cancel_requested'])
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        """Store a job's outcome and start its expiry clock"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                """UPDATE calculation_jobs
+                   SET status = ?, result = ?, error = ?, progress = 1, finished_at = ?,
+                       expires_at = ? + ttl_seconds
+                   WHERE id = ?""",
+                (status, json.dumps(result, default=str) if result is not None else None,
+                 error, now, now, job_id)
+            )
+        finally:
+            conn.close()
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs whose results have expired"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"DELETE FROM calculation_jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) "
+                "AND expires_at < ?",
+                (*FINISHED_STATUSES, time.time())
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def requeue_stale(self, max_runtime_seconds: Optional[int] = None) -> int:
+        """Return jobs stuck in 'running' (e.g. after a worker crash) to the queue"""
+        cutoff = time.time() - (max_runtime_seconds or settings.JOB_STALE_SECONDS)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                """UPDATE calculation_jobs SET status = 'queued', worker_id = NULL, started_at = NULL
+                   WHERE status = 'running' AND started_at < ?""",
+                (cutoff,)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _is_expired(self, row: sqlite3.Row) -> bool:
+        """Finished jobs are invisible once past their expiry time"""
+        return row['status'] in FINISHED_STATUSES and row['expires_at'] is not None \
+            and row['expires_at'] < time.time()
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Public view of a job row"""
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+        job = {
+            'job_id': row['id'],
+            'client_id': row['client_id'],
+            'kind': row['kind'],
+            'priority': row['priority'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'created_at': iso(row['created_at']),
+            'started_at': iso(row['started_at']),
+            'finished_at': iso(row['finished_at'])
+        }
+        if row['status'] in FINISHED_STATUSES:
+            job['expires_at'] = iso(row['expires_at'])
+            job['result'] = json.loads(row['result']) if row['result'] else None
+            job['error'] = row['error']
+        return job
+
+def _run_calculate(orchestrator, payload: Dict[str, Any], report_progress: Callable[[float], None]) -> Any:
+    """Job handler for a single calculation, reporting progress (and checking for cancellation) after each stage"""
+    events = orchestrator.iter_calculation(payload['input'])
+    result = None
+    try:
+        for position, event in enumerate(events, start=1):
+            result = event['result']
+            if not event['final']:
+                report_progress(min(position / CALCULATION_STAGES, 0.99))
+    finally:
+        events.close()
+    return result
+
+def _run_batch(orchestrator, payload: Dict[str, Any], report_progress: Callable[[float], None]) -> Any:
+    """Job handler for a batch of calculations, run in order inside the worker"""
+    records = payload['records']
+    results = []
+    for index, record in enumerate(records):
+        results.append(orchestrator.calculate_solar_system(record))
+        report_progress((index + 1) / len(records))
+    return results
+
+JOB_HANDLERS: Dict[str, Callable] = {
+    'calculate': _run_calculate,
+    'batch': _run_batch
+}
+
+def worker_loop(worker_id: str, db_path: Optional[str] = None, stop_event=None,
+                poll_interval: Optional[float] = None, max_jobs: Optional[int] = None) -> None:
+    """Claim and run jobs until stopped"""
+    from services.catalog_manager import get_catalog_manager
+    from services.feedback import refresh_catalog_ratings
+    from services.orchestrator import SolarSystemOrchestrator
+
+    queue = JobQueue(db_path)
+    orchestrator = SolarSystemOrchestrator()
+    poll_interval = poll_interval or settings.JOB_POLL_INTERVAL_SECONDS
+    jobs_run = 0
+    last_purge = 0.0
+    if settings.STARTUP_WARM_UP:
+        orchestrator.warm_up()
+
+    # Ratings are refreshed on the purge timer, but only once a job needs
+    # the catalog, so an idle worker never loads it
+    ratings_due = True
+
+    logger.info(f"Job worker {worker_id} started")
+    while not (stop_event and stop_event.is_set()):
+        if time.time() - last_purge > 60:
+            queue.purge_expired()
+            ratings_due = True
+            last_purge = time.time()
+        # Catalog updates are picked up between jobs (at most once per interval)
+        get_catalog_manager().check()
+
+        job = queue.claim(worker_id)
+        if job is None:
+            if max_jobs is not None:
+                break
+            time.sleep(poll_interval)
+            continue
+        if ratings_due:
+            refresh_catalog_ratings()
+            ratings_due = False
+
+        def report_progress(progress: float, job_id: str = job['job_id']) -> None:
+            if not queue.update_progress(job_id, progress):
+                raise JobCancelled()
+
+        try:
+            handler = JOB_HANDLERS[job['kind']]
+            result = handler(orchestrator, job['payload'], report_progress)
+            queue.finish(job['job_id'], 'succeeded', result=result)
+        except JobCancelled:
+            logger.info(f"Job {job['job_id']} cancelled")
+            queue.finish(job['job_id'], 'cancelled')
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed: {e}")
+            queue.finish(job['job_id'], 'failed', error=str(e))
+
+        jobs_run += 1
+        if max_jobs is not None and jobs_run >= max_jobs:
+            break
+
+    logger.info(f"Job worker {worker_id} stopped")
+
+class JobWorkerPool:
+    """Pool of worker processes consuming the job queue"""
+
+    def __init__(self, num_workers: Optional[int] = None, db_path: Optional[str] = None):
+        self.num_workers = num_workers if num_workers is not None else settings.JOB_WORKERS
+        self.db_path = db_path
+        self._stop_event = multiprocessing.Event()
+        self._processes: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        """Recover orphaned jobs and start the worker processes"""
+        recovered = JobQueue(self.db_path).requeue_stale()
+        if recovered:
+            logger.warning(f"Requeued {recovered} stale jobs")
+
+        prefix = f"{os.uname().nodename}-{os.getpid()}"
+        for index in range(self.num_workers):
+            process = multiprocessing.Process(
+                target=worker_loop,
+                args=(f"{prefix}-{index}", self.db_path, self._stop_event),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self.num_workers} job workers")
+
+    def stop(self, timeout: float = 10) -> None:
+        """Ask workers to finish their current job and exit"""
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def join(self) -> None:
+        """Block until all workers exit"""
+        for process in self._processes:
+            process.join()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    pool = JobWorkerPool()
+    pool.start()
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,151 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import csv
+import logging
+import os
+
+import numpy as np
+
+from config.settings import settings
+from agents.irradiance_agent import PEAK_SUN_HOURS_RATIO, STORED_IRRADIANCE, estimate_irradiance
+from core.utils import load_component_data
+from services.sweep import SWEEP_METRICS, evaluate_designs
+
+logger = logging.getLogger(__name__)
+
+# Ways to compare every location in the zones file
+COMPARISON_GROUPINGS = ('state', 'zone')
+
+# Comparisons never call NASA POWER (one request per site would dominate the
+# run), so while /calculate uses it for coordinates the response says so
+OFFLINE_IRRADIANCE_NOTE = ("Irradiance is from stored data or the latitude-band estimate, not NASA POWER; "
+                           "a full calculation at these coordinates may use different figures")
+
+@lru_cache(maxsize=1)
+def state_table() -> List[Dict[str, Any]]:
+    """States from the geopolitical zones file with their zone and capital's coordinates"""
+    capitals = {}
+    with open(os.path.join(settings.DATA_PATH, 'state_capitals.csv'), encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            capitals[row['State'].strip()] = row
+
+    states = []
+    with open(os.path.join(settings.DATA_PATH, 'geopolitical_zones_seasonal_factor.csv'), encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            for state in (name.strip() for name in row['States'].split(',')):
+                capital = capitals.get(state)
+                if capital is None:
+                    logger.warning(f"No capital coordinates for {state}; left out of comparisons")
+                    continue
+                states.append({
+                    'location': state,
+                    'zone': row['Zone'].strip(),
+                    'capital': capital['Capital'],
+                    'latitude': float(capital['Latitude']),
+                    'longitude': float(capital['Longitude'])
+                })
+    return states
+
+def comparison_locations(by: str = 'state', coordinates: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Locations to compare: the given coordinates ({'latitude', 'longitude',
+    'name'}), else every state or every zone (placed at the mean of its
+    state capitals). Raises ValueError for an unknown grouping or too many
+    coordinates.
+    """
+    if coordinates:
+        if len(coordinates) > settings.SWEEP_MAX_POINTS:
+            raise ValueError(f"{len(coordinates)} coordinates given; the limit is {settings.SWEEP_MAX_POINTS}")
+        return [{
+            'location': site.get('name') or f"{site['latitude']:.4f}, {site['longitude']:.4f}",
+            'latitude': float(site['latitude']),
+            'longitude': float(site['longitude'])
+        } for site in coordinates]
+
+    if by not in COMPARISON_GROUPINGS:
+        raise ValueError(f"Cannot compare by '{by}'; choose from {list(COMPARISON_GROUPINGS)}")
+    if by == 'state':
+        return [dict(state) for state in state_table()]
+
+    zones = defaultdict(list)
+    for state in state_table():
+        zones[state['zone']].append(state)
+    return [{
+        'location': zone,
+        'states': [state['location'] for state in states],
+        'latitude': round(float(np.mean([state['latitude'] for state in states])), 4),
+        'longitude': round(float(np.mean([state['longitude'] for state in states])), 4)
+    } for zone, states in zones.items()]
+
+def location_irradiance(locations: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Irradiance at each location, as the irradiance agent resolves it
+    offline: stored data for a known location (or state capital) name, else
+    the latitude-band estimate. Returns arrays of daily_irradiance_kwh_m2
+    and peak_sun_hours, and each value's source.
+    """
+    stored = [STORED_IRRADIANCE.get(str(location['location']).lower())
+              or STORED_IRRADIANCE.get(str(location.get('capital', '')).lower())
+              for location in locations]
+    is_stored = np.array([data is not None for data in stored], dtype=bool)
+
+    daily = estimate_irradiance([location['latitude'] for location in locations])
+    sun_hours = daily * PEAK_SUN_HOURS_RATIO
+    daily[is_stored] = [data['daily_average'] for data in stored if data is not None]
+    sun_hours[is_stored] = [data['peak_sun_hours'] for data in stored if data is not None]
+    return {
+        'daily_irradiance_kwh_m2': daily,
+        'peak_sun_hours': sun_hours,
+        'source': np.where(is_stored, 'stored_data', 'estimated')
+    }
+
+def compare_locations(workflow_data: Dict[str, Any], locations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The recommended system at every location for one load and budget.
+
+    workflow_data is a validated request after its load stage; only the
+    irradiance differs between locations, so everything else is evaluated
+    once and the location-dependent stages run for all locations together.
+    irradiance_basis is always 'offline'; irradiance_note explains the
+    difference from /calculate when NASA POWER is enabled.
+    """
+    irradiance = location_irradiance(locations)
+    designs = evaluate_designs(workflow_data, {'peak_sun_hours': irradiance['peak_sun_hours'],
+                                               'daily_irradiance_kwh_m2': irradiance['daily_irradiance_kwh_m2']})
+    models = {component_type: load_component_data(component_type)['model'].to_numpy()
+              for component_type in ('panel', 'battery', 'inverter', 'controller')}
+
+    results = []
+    for position, location in enumerate(locations):
+        system = None
+        if designs['design_found'][position]:
+            system = {
+                'panel': {'model': models['panel'][designs['panel'][position]],
+                          'number_needed': int(designs['panel_count'][position])},
+                'battery': {'model': models['battery'][designs['battery'][position]],
+                            'number_needed': int(designs['battery_count'][position])},
+                'inverter': {'model': models['inverter'][designs['inverter'][position]]},
+                'controller': {'model': models['controller'][designs['controller'][position]]}
+            }
+        results.append({
+            **location,
+            'peak_sun_hours': float(irradiance['peak_sun_hours'][position]),
+            'daily_irradiance_kwh_m2': float(irradiance['daily_irradiance_kwh_m2'][position]),
+            'irradiance_source': str(irradiance['source'][position]),
+            'design_found': bool(designs['design_found'][position]),
+            'within_budget': bool(designs['within_budget'][position]),
+            'system': system,
+            **{metric: float(designs[metric][position]) for metric in SWEEP_METRICS}
+        })
+
+    logger.info(f"Locations compared: {designs['evaluation']}")
+    return {
+        'status': 'success',
+        'daily_consumption_kwh': workflow_data['daily_consumption_kwh'],
+        'budget': workflow_data.get('budget'),
+        'irradiance_basis': 'offline',
+        **({'irradiance_note': OFFLINE_IRRADIANCE_NOTE} if settings.NASA_POWER_ENABLED else {}),
+        'locations': results,
+        'evaluation': designs['evaluation']
+    }
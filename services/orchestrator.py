@@ -1,111 +1,435 @@
-from typing import Dict, Any, List
+from collections.abc import Mapping
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional
+import copy
+import importlib
 import logging
-from agents.input_validation_agent import InputValidationAgent
-from agents.load_calculator_agent import LoadCalculatorAgent
-from agents.irradiance_agent import IrradianceAgent
-from agents.panel_sizing_agent import PanelSizingAgent
-from agents.battery_sizing_agent import BatterySizingAgent
-from agents.component_matching_agent import ComponentMatchingAgent
-from agents.cost_optimizer_agent import CostOptimizerAgent
-from agents.simulation_agent import SimulationAgent
-from agents.report_generator_agent import ReportGeneratorAgent
+import threading
+import time
+import uuid
+from config.settings import settings
+from core.exceptions import DataNotFoundError
+from services.database import CalculationWriter, get_calculation_writer
+from services.cache import CalculationStore, StageCache, get_calculation_store, get_stage_cache
+
+if TYPE_CHECKING:
+    from services.design_table import DesignTable
 
 logger = logging.getLogger(__name__)
 
+# Agent class behind each stage, imported when the stage first runs (or on warm_up)
+AGENT_CLASSES = {
+    'input_validator': ('agents.input_validation_agent', 'InputValidationAgent'),
+    'load_calculator': ('agents.load_calculator_agent', 'LoadCalculatorAgent'),
+    'irradiance_agent': ('agents.irradiance_agent', 'IrradianceAgent'),
+    'panel_sizing': ('agents.panel_sizing_agent', 'PanelSizingAgent'),
+    'battery_sizing': ('agents.battery_sizing_agent', 'BatterySizingAgent'),
+    'component_matching': ('agents.component_matching_agent', 'ComponentMatchingAgent'),
+    'cost_optimizer': ('agents.cost_optimizer_agent', 'CostOptimizerAgent'),
+    'simulation': ('agents.simulation_agent', 'SimulationAgent'),
+    'report_generator': ('agents.report_generator_agent', 'ReportGeneratorAgent')
+}
+
+class AgentRegistry(Mapping):
+    """Agents by stage; each agent's module is imported and the agent created on first access"""
+    
+    def __init__(self, classes: Optional[Dict[str, tuple]] = None):
+        self._classes = dict(classes or AGENT_CLASSES)
+        self._agents: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def __getitem__(self, stage: str):
+        agent = self._agents.get(stage)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(stage)
+                if agent is None:
+                    module, name = self._classes[stage]
+                    agent = self._agents[stage] = getattr(importlib.import_module(module), name)()
+        return agent
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._classes)
+    
+    def __len__(self) -> int:
+        return len(self._classes)
+    
+    def loaded(self) -> List[str]:
+        """Stages whose agents have been created"""
+        return list(self._agents)
+
 class SolarSystemOrchestrator:
     """Main orchestrator for solar system calculation workflow"""
     
-    def __init__(self):
-        self.agents = {
-            'input_validator': InputValidationAgent(),
-            'load_calculator': LoadCalculatorAgent(),
-            'irradiance_agent': IrradianceAgent(),
-            'panel_sizing': PanelSizingAgent(),
-            'battery_sizing': BatterySizingAgent(),
-            'component_matching': ComponentMatchingAgent(),
-            'cost_optimizer': CostOptimizerAgent(),
-            'simulation': SimulationAgent(),
-            'report_generator': ReportGeneratorAgent()
+    def __init__(self, stage_cache: Optional[StageCache] = None,
+                 calculation_store: Optional[CalculationStore] = None,
+                 recorder: Optional[CalculationWriter] = None,
+                 design_table: Optional['DesignTable'] = None):
+        self.agents = AgentRegistry()
+        
+        if stage_cache is None and settings.STAGE_CACHE_ENABLED:
+            stage_cache = get_stage_cache()
+        self.stage_cache = stage_cache
+        self.quantize_cache_keys = settings.STAGE_CACHE_QUANTIZE
+        self.calculation_store = calculation_store or get_calculation_store()
+        
+        if recorder is None and settings.PERSIST_CALCULATIONS:
+            recorder = get_calculation_writer()
+        self.recorder = recorder
+        self.design_table = design_table
+    
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Import and create every agent and load the data they share (catalog,
+        appliance library, design table), so the first request pays no
+        loading cost. Returns the seconds each step took.
+        """
+        from core.appliances import get_appliance_library
+        from core.catalog import get_catalog
+        from services.design_table import get_design_table
+        
+        steps = {
+            'agents': lambda: [self.agents[stage] for stage in self.agents],
+            'catalog': get_catalog,
+            'appliances': get_appliance_library,
+            'design_table': (lambda: self.design_table) if self.design_table or not settings.DESIGN_TABLE_ENABLED
+                            else get_design_table
         }
+        timings = {}
+        for step, load in steps.items():
+            started = time.perf_counter()
+            load()
+            timings[step] = round(time.perf_counter() - started, 3)
+        logger.info(f"Orchestrator warmed up: {timings}")
+        return timings
+    
+    def _run_agent(self, stage: str, workflow_data: Dict[str, Any],
+                   run: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run an agent, reusing an earlier result when its declared inputs repeat.
+        
+        run tracks the calculation being built: results whose inputs match
+        the previous calculation's ('previous') are reused outright, and every
+        successful result is recorded in 'stages' for the next recalculation.
+        The agent sees the catalog the calculation started with ('catalog').
+        """
+        from core.catalog import pinned_catalog
+        
+        agent = self.agents[stage]
+        with (pinned_catalog(run['catalog']) if run else nullcontext()):
+            inputs_hash = agent.cache_key(workflow_data)
+            
+            prior = run['previous'].get(stage) if run else None
+            if inputs_hash is not None and prior and prior['inputs_hash'] == inputs_hash:
+                logger.debug(f"Reusing previous result: {stage}")
+                run['reused'].append(stage)
+                result = dict(prior['result'])
+            else:
+                result = self._compute(stage, workflow_data, inputs_hash)
+        
+        if run is not None and inputs_hash is not None and result.get('status') == 'success':
+            run['stages'][stage] = {'inputs_hash': inputs_hash, 'result': result}
+        return result
+    
+    def _tabled_design(self, workflow_data: Dict[str, Any], exact: bool) -> Optional[Dict[str, Any]]:
+        """Precomputed sizing and matching results for a request on the design table's grid"""
+        if exact:
+            return None
+        table = self.design_table
+        if table is None and settings.DESIGN_TABLE_ENABLED:
+            from services.design_table import get_design_table
+            table = get_design_table()
+        return table.lookup(workflow_data) if table is not None else None
+    
+    def _compute(self, stage: str, workflow_data: Dict[str, Any], inputs_hash: Optional[str]) -> Dict[str, Any]:
+        """Run an agent through the shared stage cache"""
+        agent = self.agents[stage]
+        key = inputs_hash
+        if key is not None and self.quantize_cache_keys:
+            key = agent.cache_key(workflow_data, quantize=True)
+        if key is None or self.stage_cache is None:
+            return agent.process(workflow_data)
+        
+        cached = self.stage_cache.get(stage, key)
+        if cached is not None:
+            logger.debug(f"Stage cache hit: {stage}")
+            return self._with_request_values(agent, cached, workflow_data)
+        
+        stage_input = workflow_data
+        if self.quantize_cache_keys:
+            # Compute on the quantized inputs so the result matches its key
+            stage_input = {**workflow_data, **agent.quantized_inputs(workflow_data)}
+        
+        result = agent.process(stage_input)
+        if result.get('status') == 'success':
+            self.stage_cache.put(stage, key, result)
+        return self._with_request_values(agent, result, workflow_data)
+    
+    def _with_request_values(self, agent, result: Dict[str, Any], workflow_data: Dict[str, Any]) -> Dict[str, Any]:
+        """A stage result with any quantized inputs it echoes (e.g. coordinates) put back to the request's values"""
+        result = dict(result)
+        for field in agent.cache_quantize:
+            if field in result and workflow_data.get(field) is not None:
+                result[field] = workflow_data[field]
+        return result
+    
+    def calculate_solar_system(self, user_input: Dict[str, Any], detail: str = 'full',
+                               exact: bool = False,
+                               timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Main calculation workflow. A timings dict, when given, is filled with
+        each stage's duration in milliseconds.
+        """
+        result = None
+        started = time.perf_counter()
+        for event in self.iter_calculation(user_input, detail, exact=exact):
+            result = event['result']
+            if timings is not None:
+                finished = time.perf_counter()
+                timings[event['stage']] = (finished - started) * 1000
+                started = finished
+        return result
     
-    def calculate_solar_system(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """Main calculation workflow"""
+    def sweep(self, user_input: Dict[str, Any], axes: List[Dict[str, Any]],
+              sensitivity: bool = False) -> Dict[str, Any]:
+        """
+        Evaluate designs over a grid of one or two input axes.
+        
+        The request is validated and its load and irradiance stages run once;
+        sizing, matching, optimization and simulation are then evaluated for
+        every grid point together. Raises ValueError for invalid axes.
+        """
+        from core.catalog import pinned_catalog
+        from services.sweep import evaluate_sweep, sweep_grid
+        
+        grid = sweep_grid(axes)
+        with pinned_catalog():
+            workflow_data, failed = self._analysed_load(user_input)
+            if failed is not None:
+                return failed
+            
+            workflow_data.update(self._run_agent('irradiance_agent', workflow_data))
+            return evaluate_sweep(workflow_data, grid, sensitivity)
+    
+    def compare_locations(self, user_input: Dict[str, Any], by: str = 'state',
+                          coordinates: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Evaluate one request's load and budget at every state or zone, or at
+        the given coordinates. The load stage runs once; irradiance and the
+        stages after it are evaluated for all locations together. Raises
+        ValueError for an unknown grouping.
+        """
+        from core.catalog import pinned_catalog
+        from services.locations import compare_locations, comparison_locations
+        
+        locations = comparison_locations(by, coordinates)
+        with pinned_catalog():
+            workflow_data, failed = self._analysed_load(user_input)
+            if failed is not None:
+                return failed
+            
+            return compare_locations(workflow_data, locations)
+    
+    def _analysed_load(self, user_input: Dict[str, Any]):
+        """Validate a request and run its load stage: (workflow data, None), or (None, the failed result)"""
+        validation_result = self.agents['input_validator'].process(user_input)
+        if validation_result['status'] != 'success':
+            return None, validation_result
+        
+        workflow_data = dict(validation_result['validated_data'])
+        load_result = self._run_agent('load_calculator', workflow_data)
+        if load_result['status'] != 'success':
+            return None, load_result
+        
+        workflow_data.update(load_result)
+        return workflow_data, None
+    
+    def recalculate(self, calculation_id: str, patch: Dict[str, Any], detail: str = 'full') -> Dict[str, Any]:
+        """Recalculate a previous calculation with a patch applied to its input"""
+        result = None
+        for event in self.iter_recalculation(calculation_id, patch, detail):
+            result = event['result']
+        return result
+    
+    def iter_recalculation(self, calculation_id: str, patch: Dict[str, Any],
+                           detail: str = 'full') -> Iterator[Dict[str, Any]]:
+        """
+        Stream a recalculation of a stored calculation with a patched input.
+        
+        Only stages whose declared inputs changed are run again; the rest
+        reuse the previous calculation's results. Raises DataNotFoundError
+        if the calculation is unknown or has been evicted.
+        """
+        previous = self.calculation_store.get(calculation_id)
+        if previous is None:
+            raise DataNotFoundError(f"Calculation not found: {calculation_id}")
+        
+        user_input = apply_input_patch(previous['input'], patch)
+        return self.iter_calculation(user_input, detail, previous=previous)
+    
+    def iter_calculation(self, user_input: Dict[str, Any], detail: str = 'full',
+                         previous: Optional[Dict[str, Any]] = None,
+                         exact: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Run the calculation workflow, yielding an event as each stage finishes.
+        
+        Each event is {'stage', 'result', 'final'}; the last event (final=True)
+        carries the report, or the error that stopped the workflow. Closing the
+        generator early stops the remaining stages. detail selects how much of
+        the report is built ('summary', 'standard' or 'full'). previous is a
+        stored calculation whose unchanged stages are reused. Requests on the
+        design table's grid take their sizing and matching results from it
+        unless exact is set. Every stage uses the component catalog current
+        when the calculation started, even if a new one is swapped in.
+        """
+        from core.catalog import get_catalog, pinned_catalog
+        
         try:
             logger.info("Starting solar system calculation")
             workflow_data = {}
+            run = {'previous': previous['stages'] if previous else {}, 'stages': {}, 'reused': [],
+                   'catalog': get_catalog()}
             
             # Step 1: Validate Input
             logger.info("Step 1: Validating input")
             validation_result = self.agents['input_validator'].process(user_input)
             if validation_result['status'] != 'success':
-                return validation_result
+                yield self._event('validation', validation_result, final=True)
+                return
             
             workflow_data.update(validation_result['validated_data'])
+            yield self._event('validation', validation_result)
             
             # Step 2: Calculate Load Requirements
             logger.info("Step 2: Calculating load requirements")
-            load_result = self.agents['load_calculator'].process(workflow_data)
+            load_result = self._run_agent('load_calculator', workflow_data, run)
             if load_result['status'] != 'success':
-                return load_result
+                yield self._event('load_analysis', load_result, final=True)
+                return
             
             workflow_data.update(load_result)
+            yield self._event('load_analysis', load_result)
             
             # Step 3: Get Irradiance Data
             logger.info("Step 3: Getting irradiance data")
-            irradiance_result = self.agents['irradiance_agent'].process(workflow_data)
+            irradiance_result = self._run_agent('irradiance_agent', workflow_data, run)
             workflow_data.update(irradiance_result)
+            yield self._event('irradiance', irradiance_result)
+            
+            # Steps 4-6 are read from the design table for typical requests
+            with pinned_catalog(run['catalog']):
+                tabled = self._tabled_design(workflow_data, exact)
+            tabled_stages = tabled['stages'] if tabled else {}
             
             # Step 4: Size Solar Panels
             logger.info("Step 4: Sizing solar panels")
-            panel_result = self.agents['panel_sizing'].process(workflow_data)
+            panel_result = tabled_stages.get('panel_sizing') or self._run_agent('panel_sizing', workflow_data, run)
             if panel_result['status'] != 'success':
-                return panel_result
+                yield self._event('panel_sizing', panel_result, final=True)
+                return
             
             workflow_data.update(panel_result)
+            yield self._event('panel_sizing', panel_result)
             
             # Step 5: Size Battery System
             logger.info("Step 5: Sizing battery system")
-            battery_result = self.agents['battery_sizing'].process(workflow_data)
+            battery_result = (tabled_stages.get('battery_sizing')
+                              or self._run_agent('battery_sizing', workflow_data, run))
             if battery_result['status'] != 'success':
-                return battery_result
+                yield self._event('battery_sizing', battery_result, final=True)
+                return
             
             workflow_data.update(battery_result)
+            yield self._event('battery_sizing', battery_result)
             
             # Step 6: Match Compatible Components
             logger.info("Step 6: Matching compatible components")
-            matching_result = self.agents['component_matching'].process(workflow_data)
+            matching_result = (tabled_stages.get('component_matching')
+                               or self._run_agent('component_matching', workflow_data, run))
             if matching_result['status'] != 'success':
-                return matching_result
+                yield self._event('configurations', matching_result, final=True)
+                return
             
             workflow_data.update(matching_result)
+            yield self._event('configurations', matching_result)
             
             # Step 7: Optimize Cost
             logger.info("Step 7: Optimizing cost")
-            optimization_result = self.agents['cost_optimizer'].process(workflow_data)
+            optimization_result = self._run_agent('cost_optimizer', workflow_data, run)
             if optimization_result['status'] != 'success':
-                return optimization_result
+                yield self._event('optimization', optimization_result, final=True)
+                return
             
             workflow_data.update(optimization_result)
+            yield self._event('optimization', optimization_result)
             
             # Step 8: Run System Simulation
             logger.info("Step 8: Running system simulation")
             if workflow_data.get('affordable_configurations'):
                 # Use best configuration for simulation
                 workflow_data['selected_configuration'] = workflow_data['affordable_configurations'][0]
-                simulation_result = self.agents['simulation'].process(workflow_data)
+                simulation_result = self._run_agent('simulation', workflow_data, run)
                 workflow_data.update(simulation_result)
+                yield self._event('simulation', simulation_result)
             
             # Step 9: Generate Report
             logger.info("Step 9: Generating report")
-            report_result = self.agents['report_generator'].process(workflow_data)
+            workflow_data['report_detail'] = detail
+            report_result = self._run_agent('report_generator', workflow_data)
+            
+            if report_result.get('status') == 'success':
+                calculation_id = uuid.uuid4().hex
+                self.calculation_store.put(calculation_id, {
+                    'input': copy.deepcopy(user_input),
+                    'stages': run['stages']
+                })
+                report_result['calculation_id'] = calculation_id
+                if previous is not None:
+                    report_result['reused_stages'] = run['reused']
+                if tabled:
+                    report_result['design_table_point'] = tabled['grid_point']
+                if self.recorder is not None:
+                    self.recorder.record(calculation_id, user_input, report_result)
             
             logger.info("Solar system calculation completed successfully")
-            return report_result
+            yield self._event('report', report_result, final=True)
             
         except Exception as e:
             logger.error(f"Workflow failed: {e}")
-            return {
+            yield self._event('error', {
                 'status': 'error',
                 'error': str(e),
                 'message': 'Solar system calculation failed'
-            }
\ No newline at end of file
+            }, final=True)
+    
+    def _event(self, stage: str, result: Dict[str, Any], final: bool = False) -> Dict[str, Any]:
+        """Progress event for one finished stage"""
+        return {'stage': stage, 'result': result, 'final': final}
+
+def apply_input_patch(user_input: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply an input delta: top-level field changes, then appliance additions,
+    per-index updates and removals (indexes refer to the previous input).
+    Raises ValueError for an index with no appliance.
+    """
+    patched = copy.deepcopy(user_input)
+    appliances = patched.get('appliances', [])
+    
+    for field, value in patch.items():
+        if field not in ('add_appliances', 'update_appliances', 'remove_appliances') and value is not None:
+            patched[field] = value
+    
+    for update in patch.get('update_appliances') or []:
+        index = update['index']
+        if not 0 <= index < len(appliances):
+            raise ValueError(f"No appliance at index {index}")
+        appliances[index].update({k: v for k, v in update.items() if k != 'index' and v is not None})
+    
+    removed = set(patch.get('remove_appliances') or [])
+    missing = sorted(index for index in removed if not 0 <= index < len(appliances))
+    if missing:
+        raise ValueError(f"No appliance at index {missing[0]}")
+    
+    patched['appliances'] = [appliance for index, appliance in enumerate(appliances) if index not in removed]
+    patched['appliances'] += [dict(appliance) for appliance in patch.get('add_appliances') or []]
+    return patched
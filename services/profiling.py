@@ -0,0 +1,320 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# A frame is (function name, file, first line); a stack runs root first
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+PROFILE_SUFFIXES = {'speedscope': '.speedscope.json', 'collapsed': '.collapsed.txt'}
+
+# Client-supplied request IDs are used in file names, so only these are accepted
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def _code_frame(code) -> Frame:
+    return (getattr(code, 'co_qualname', code.co_name), code.co_filename, code.co_firstlineno)
+
+def _frame_stack(frame) -> Stack:
+    """The call stack ending at frame, root first"""
+    stack = []
+    while frame is not None:
+        stack.append(_code_frame(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread records the watched threads'
+    stacks every interval, weighting each sample by the time since the last one.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float = 1.0):
+        self.thread_ids = {thread_id}
+        self.interval = interval_ms / 1000
+        self.stacks: Dict[Stack, float] = defaultdict(float)
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> Dict[Stack, float]:
+        self._stop.set()
+        self._sampler.join()
+        return dict(self.stacks)
+
+    def add_thread(self) -> None:
+        """Also sample the calling thread until remove_thread"""
+        self.thread_ids.add(threading.get_ident())
+
+    def remove_thread(self) -> None:
+        self.thread_ids.discard(threading.get_ident())
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[_frame_stack(frame)] += now - last
+            last = now
+
+class _ThreadTrace:
+    """
+    One thread's traced calls as a call tree: node 0 is the root, and each
+    node is its parent node plus one frame. Starts inside frame, whose
+    return is the first event after sys.setprofile.
+    """
+
+    def __init__(self, frame):
+        self.nodes: List[Tuple[int, Optional[Frame]]] = [(0, None)]
+        self.children: Dict[Tuple[int, Frame], int] = {}
+        self.time: Dict[int, float] = defaultdict(float)
+        self.path: List[int] = [0]
+        for code_frame in _frame_stack(frame):
+            self.path.append(self._child(self.path[-1], code_frame))
+        self.last = time.perf_counter()
+
+    def _child(self, parent: int, frame: Frame) -> int:
+        node = self.children.get((parent, frame))
+        if node is None:
+            node = self.children[(parent, frame)] = len(self.nodes)
+            self.nodes.append((parent, frame))
+        return node
+
+    def event(self, frame, event: str, arg: Any) -> None:
+        now = time.perf_counter()
+        path = self.path
+        self.time[path[-1]] += now - self.last
+        if event == 'call':
+            path.append(self._child(path[-1], _code_frame(frame.f_code)))
+        elif event == 'c_call':
+            path.append(self._child(path[-1], (getattr(arg, '__qualname__', repr(arg)), '<built-in>', 0)))
+        elif len(path) > 1:
+            path.pop()
+        self.last = time.perf_counter()
+
+    def stacks(self) -> Dict[Stack, float]:
+        stacks = {}
+        for node, seconds in list(self.time.items()):
+            stack = []
+            while node:
+                node, frame = self.nodes[node]
+                stack.append(frame)
+            stacks[tuple(reversed(stack))] = seconds
+        return stacks
+
+class TracingProfiler:
+    """
+    Deterministic profiler: every Python and C call on the calling thread
+    (and threads added with add_thread) is traced, charging the time
+    between events to the stack they happened in. Exact for short
+    requests, but slows the profiled request down.
+    """
+
+    # Profiled requests share the event-loop thread and its profile hook,
+    # so only one request is traced at a time
+    _active = threading.Lock()
+
+    def __init__(self, thread_id: Optional[int] = None, interval_ms: float = 0.0):
+        self._traces: List[_ThreadTrace] = []
+
+    def start(self) -> None:
+        """Trace the calling thread; raises RuntimeError while another trace runs"""
+        if not self._active.acquire(blocking=False):
+            raise RuntimeError("Another request is already being traced")
+        trace = _ThreadTrace(sys._getframe())
+        self._traces.append(trace)
+        sys.setprofile(trace.event)
+
+    def stop(self) -> Dict[Stack, float]:
+        sys.setprofile(None)
+        self._active.release()
+        stacks: Dict[Stack, float] = defaultdict(float)
+        for trace in list(self._traces):
+            for stack, seconds in trace.stacks().items():
+                stacks[stack] += seconds
+        return dict(stacks)
+
+    def add_thread(self) -> None:
+        """Also trace the calling thread until remove_thread"""
+        trace = _ThreadTrace(sys._getframe())
+        self._traces.append(trace)
+        sys.setprofile(trace.event)
+
+    def remove_thread(self) -> None:
+        sys.setprofile(None)
+
+PROFILERS = {'sampling': SamplingProfiler, 'tracing': TracingProfiler}
+
+def _label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})" if line else name
+
+def collapsed_stacks(stacks: Dict[Stack, float]) -> str:
+    """Stacks in the collapsed format of flamegraph.pl, weighted in microseconds"""
+    lines = []
+    for stack, seconds in sorted(stacks.items()):
+        weight = round(seconds * 1e6)
+        if stack and weight > 0:
+            lines.append(f"{';'.join(_label(frame).replace(';', ':') for frame in stack)} {weight}")
+    return "".join(f"{line}\n" for line in lines)
+
+def speedscope_profile(stacks: Dict[Stack, float], name: str) -> Dict[str, Any]:
+    """Stacks as a speedscope sampled profile (weights in seconds)"""
+    frames: Dict[Frame, int] = {}
+    samples, weights = [], []
+    for stack, seconds in stacks.items():
+        if stack and seconds > 0:
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(seconds)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'solar-calculator',
+        'shared': {'frames': [{'name': function, 'file': filename, 'line': line}
+                              for function, filename, line in frames]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }]
+    }
+
+def write_profile(stacks: Dict[Stack, float], path: str, output_format: str, name: str) -> str:
+    """Save stacks as speedscope JSON or collapsed stacks"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        if output_format == 'collapsed':
+            f.write(collapsed_stacks(stacks))
+        else:
+            json.dump(speedscope_profile(stacks, name), f)
+    return path
+
+# The profiler of the request being handled. Thread-pool work inherits the
+# request's context, so run_in_threadpool can add its worker thread.
+_request_profiler: ContextVar[Optional[Any]] = ContextVar('request_profiler', default=None)
+
+def _call_profiled(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    profiler = _request_profiler.get()
+    if profiler is None:
+        return func(*args, **kwargs)
+    profiler.add_thread()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.remove_thread()
+
+async def run_in_threadpool(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """fastapi's run_in_threadpool, profiling the worker thread along with a profiled request"""
+    return await _run_in_threadpool(_call_profiled, func, *args, **kwargs)
+
+async def iterate_in_threadpool(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Drive a blocking iterator from the thread pool, as run_in_threadpool runs calls"""
+    done = object()
+    while True:
+        item = await run_in_threadpool(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+def profiling_enabled() -> bool:
+    """True if any request can be profiled under the current settings"""
+    return bool(settings.PROFILE_ADMIN_TOKEN) or settings.PROFILE_SAMPLE_RATE > 0
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected requests: those carrying the
+    admin token (X-Profile header or profile query parameter) and a random
+    sample_rate fraction of the rest. The profile is saved under the
+    request ID (X-Request-ID if given, else a new one), which is returned
+    in the X-Request-ID and X-Profile response headers.
+
+    Profilers watch the event-loop thread, so they see work done by async
+    endpoints (including any concurrent requests), and the worker threads of
+    the request's services.profiling.run_in_threadpool calls. Only one
+    request is traced at a time; others arriving meanwhile run unprofiled.
+    """
+
+    def __init__(self, app, admin_token: Optional[str] = None, sample_rate: Optional[float] = None,
+                 mode: Optional[str] = None, output_format: Optional[str] = None,
+                 output_path: Optional[str] = None, interval_ms: Optional[float] = None):
+        self.app = app
+        self.admin_token = admin_token if admin_token is not None else settings.PROFILE_ADMIN_TOKEN
+        self.sample_rate = sample_rate if sample_rate is not None else settings.PROFILE_SAMPLE_RATE
+        self.mode = mode or settings.PROFILE_MODE
+        self.output_format = output_format or settings.PROFILE_FORMAT
+        self.output_path = output_path or settings.PROFILE_OUTPUT_PATH
+        self.interval_ms = interval_ms or settings.PROFILE_INTERVAL_MS
+        if self.mode not in PROFILERS:
+            raise ValueError(f"Unknown profile mode '{self.mode}'; choose from {list(PROFILERS)}")
+        if self.output_format not in PROFILE_SUFFIXES:
+            raise ValueError(f"Unknown profile format '{self.output_format}'; choose from {list(PROFILE_SUFFIXES)}")
+
+    def _requested(self, scope: Dict[str, Any]) -> bool:
+        if self.admin_token:
+            token = dict(scope.get('headers', [])).get(b'x-profile', b'').decode('latin-1')
+            if not token:
+                token = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('profile', [''])[0]
+            if token and hmac.compare_digest(token.encode(), self.admin_token.encode()):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope['headers']).get(b'x-request-id', b'').decode('latin-1')
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        filename = f"{request_id}{PROFILE_SUFFIXES[self.output_format]}"
+
+        async def tagged_send(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'x-request-id', request_id.encode()),
+                                                  (b'x-profile', filename.encode())]}
+            await send(message)
+
+        profiler = PROFILERS[self.mode](threading.get_ident(), self.interval_ms)
+        started = time.perf_counter()
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            logger.info(f"Not profiling {scope['method']} {scope['path']}: {e}")
+            await self.app(scope, receive, send)
+            return
+        token = _request_profiler.set(profiler)
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            _request_profiler.reset(token)
+            stacks = profiler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            path = write_profile(stacks, os.path.join(self.output_path, filename), self.output_format,
+                                 f"{scope['method']} {scope['path']} {request_id}")
+            logger.info(f"Profiled {scope['method']} {scope['path']} ({elapsed_ms:.1f} ms) to {path}")
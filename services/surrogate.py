@@ -0,0 +1,306 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from config.settings import settings
+from agents.irradiance_agent import IrradianceAgent
+from core.exceptions import DataNotFoundError
+from core.load_profile import LoadProfile
+
+logger = logging.getLogger(__name__)
+
+# Headline outputs the surrogate estimates; the first three are fitted in log space
+SURROGATE_TARGETS = ('system_cost', 'system_size_kw', 'battery_kwh', 'self_sufficiency')
+LOG_TARGETS = ('system_cost', 'system_size_kw', 'battery_kwh')
+_LOG_COLUMNS = [SURROGATE_TARGETS.index(target) for target in LOG_TARGETS]
+
+PRIORITIES = ('cost', 'reliability', 'efficiency', 'balanced')
+
+# Locations sampled for training; names resolve to stored irradiance, so no API calls
+SAMPLE_LOCATIONS = ('Lagos', 'Abuja', 'Kano', 'Ibadan', 'Enugu', 'Port Harcourt', 'Kaduna', 'Sokoto')
+SAMPLE_BUDGET_RANGE = (150000.0, 20000000.0)
+SAMPLE_APPLIANCE_COUNT = (1, 8)
+SAMPLE_QUANTITIES = (1, 1, 1, 1, 2, 2, 3)
+
+_irradiance_agent = IrradianceAgent()
+
+def training_targets(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Surrogate targets from a full-detail calculation result, or None if it failed.
+
+    A calculation that finds no compatible components still succeeds, with
+    an empty design; that is recorded as design_found False and no targets.
+    """
+    if result.get('status') != 'success':
+        return None
+    report = result.get('full_report') or {}
+    design = report.get('system_design') or {}
+    if not design:
+        return {'design_found': False}
+
+    battery = design.get('battery') or {}
+    totals = (report.get('performance_simulation') or {}).get('annual_totals') or {}
+    summary = result.get('executive_summary') or {}
+    try:
+        return {
+            'design_found': True,
+            'system_cost': float(summary['recommended_system_cost']),
+            'system_size_kw': float(summary['system_size_kw']),
+            'battery_kwh': float(battery['total_capacity_ah']) * float(battery['voltage']) / 1000,
+            'self_sufficiency': float(totals['self_sufficiency_ratio'])
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def input_features(input_data: Dict[str, Any]) -> np.ndarray:
+    """
+    Raw features of one calculation input.
+
+    Load figures come from the same LoadProfile the load stage builds;
+    irradiance is the location's stored value (coordinates are not looked
+    up, so an estimate never waits on the irradiance API).
+    """
+    profile = LoadProfile(input_data.get('appliances') or [])
+    irradiance = _irradiance_agent.process({'location': input_data.get('location', 'Unknown')})
+    priority = input_data.get('priority', 'balanced')
+    return np.array([
+        np.log(max(profile.total_energy_kwh, 0.01)),
+        np.log(max(profile.coincident_peak_w, 1.0)),
+        np.log(max(profile.surge_peak_w, 1.0)),
+        np.log(float(input_data.get('backup_hours', 4))),
+        np.log(float(input_data['budget'])),
+        float(irradiance['peak_sun_hours']),
+        float(bool(input_data.get('system_expansion', False))),
+        *(float(priority == name) for name in PRIORITIES[:-1])
+    ])
+
+# Continuous raw features, expanded into their pairwise products
+_CONTINUOUS = 6
+_PAIRS = np.triu_indices(_CONTINUOUS)
+
+def design_matrix(raw: np.ndarray) -> np.ndarray:
+    """Quadratic expansion of the continuous features, plus the indicator columns"""
+    continuous = raw[..., :_CONTINUOUS]
+    products = continuous[..., _PAIRS[0]] * continuous[..., _PAIRS[1]]
+    return np.concatenate([continuous, products, raw[..., _CONTINUOUS:]], axis=-1)
+
+def _fit_logistic(x: np.ndarray, labels: np.ndarray, ridge: float, iterations: int = 50) -> np.ndarray:
+    """L2-regularized logistic regression by Newton's method"""
+    weights = np.zeros(x.shape[1])
+    penalty = ridge * len(labels) * np.eye(x.shape[1])
+    for _ in range(iterations):
+        probability = 1 / (1 + np.exp(-(x @ weights)))
+        gradient = x.T @ (probability - labels) + penalty @ weights
+        hessian = (x.T * (probability * (1 - probability))) @ x + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    return weights
+
+class SurrogateModel:
+    """
+    Fast approximation of the full calculation, fitted on orchestrator results.
+
+    A logistic model on quadratic features of the inputs gives the chance
+    that the pipeline finds a compatible design at all; ridge regressions on
+    the same features estimate the headline figures of that design. Error
+    bounds are split-conformal: residual quantiles on held-out results, so
+    about `coverage` of full calculations fall inside them. Prediction is a
+    few small matrix products.
+    """
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, classifier: np.ndarray, weights: np.ndarray,
+                 bounds: np.ndarray, coverage: float, metadata: Optional[Dict[str, Any]] = None):
+        self.mean = mean
+        self.scale = scale
+        self.classifier = classifier
+        self.weights = weights
+        self.bounds = bounds
+        self.coverage = coverage
+        self.metadata = metadata or {}
+        self._log = np.array([target in LOG_TARGETS for target in SURROGATE_TARGETS])
+
+    @classmethod
+    def fit(cls, inputs: List[Dict[str, Any]], targets: List[Dict[str, Any]], coverage: float = 0.9,
+            ridge: float = 1e-3, calibration_fraction: float = 0.25, seed: int = 0) -> 'SurrogateModel':
+        """Fit on (input, training_targets) pairs, holding out calibration_fraction for the error bounds"""
+        found = np.array([bool(row['design_found']) for row in targets])
+        if found.sum() < 20:
+            raise ValueError("At least 20 calculations with a design are needed to fit the surrogate")
+
+        features = design_matrix(np.vstack([input_features(input_data) for input_data in inputs]))
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        x = np.hstack([np.ones((len(features), 1)), (features - mean) / scale])
+        classifier = _fit_logistic(x, found.astype(float), ridge)
+
+        x = x[found]
+        y = np.array([[row[target] for target in SURROGATE_TARGETS] for row, ok in zip(targets, found) if ok])
+        y[:, _LOG_COLUMNS] = np.log(np.maximum(y[:, _LOG_COLUMNS], 1e-6))
+
+        order = np.random.default_rng(seed).permutation(len(y))
+        split = int(len(y) * (1 - calibration_fraction))
+        train, calibrate = order[:split], order[split:]
+
+        penalty = ridge * len(train) * np.eye(x.shape[1])
+        penalty[0, 0] = 0
+        weights = np.linalg.solve(x[train].T @ x[train] + penalty, x[train].T @ y[train])
+
+        # Conformal quantile of the held-out absolute residuals, per target
+        residuals = np.sort(np.abs(x[calibrate] @ weights - y[calibrate]), axis=0)
+        rank = min(int(np.ceil((len(calibrate) + 1) * coverage)), len(calibrate)) - 1
+        bounds = residuals[rank]
+
+        metadata = {'samples': len(targets), 'designs': int(found.sum()), 'calibration_samples': len(calibrate),
+                    'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        return cls(mean, scale, classifier, weights, bounds, coverage, metadata)
+
+    def predict(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Probability that a design is found, and each target's estimate with
+        lower and upper bounds (describing the design, if one is found).
+        """
+        x = (design_matrix(input_features(input_data)) - self.mean) / self.scale
+        probability = 1 / (1 + np.exp(-(self.classifier[0] + x @ self.classifier[1:])))
+        values = self.weights[0] + x @ self.weights[1:]
+        lower, upper = values - self.bounds, values + self.bounds
+        values, lower, upper = (np.where(self._log, np.exp(v), v) for v in (values, lower, upper))
+
+        estimates = {}
+        for index, target in enumerate(SURROGATE_TARGETS):
+            low, estimate, high = float(lower[index]), float(values[index]), float(upper[index])
+            if target == 'self_sufficiency':
+                low, estimate, high = (min(max(v, 0.0), 1.0) for v in (low, estimate, high))
+            estimates[target] = {'estimate': round(estimate, 4), 'lower': round(low, 4), 'upper': round(high, 4)}
+        return {'design_found_probability': round(float(probability), 4), 'estimates': estimates}
+
+    def save(self, path: str) -> None:
+        """Write the coefficients and metadata to an .npz file"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        metadata = {**self.metadata, 'coverage': self.coverage, 'targets': list(SURROGATE_TARGETS)}
+        with open(path, 'wb') as f:
+            np.savez(f, mean=self.mean, scale=self.scale, classifier=self.classifier, weights=self.weights,
+                     bounds=self.bounds, metadata=np.array(json.dumps(metadata)))
+
+    @classmethod
+    def load(cls, path: str) -> 'SurrogateModel':
+        """Read a model written by save()"""
+        if not os.path.exists(path):
+            raise DataNotFoundError(f"Surrogate model not found: {path}")
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('targets') != list(SURROGATE_TARGETS):
+                raise ValueError(f"Surrogate model at {path} was trained for different targets")
+            return cls(data['mean'], data['scale'], data['classifier'], data['weights'], data['bounds'],
+                       metadata.pop('coverage'), metadata)
+
+def sample_inputs(count: int, seed: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Random but plausible calculation inputs: load surveys drawn from the appliance library"""
+    from core.appliances import get_appliance_library
+
+    records = get_appliance_library().records
+    rng = np.random.default_rng(seed)
+    low_budget, high_budget = np.log(SAMPLE_BUDGET_RANGE)
+    for _ in range(count):
+        appliances = []
+        for row in rng.choice(len(records), rng.integers(*SAMPLE_APPLIANCE_COUNT, endpoint=True), replace=False):
+            record = records[row]
+            low_hours, high_hours = max(record['min_hours'], 0.25), max(record['max_hours'], 0.25)
+            appliances.append({
+                'appliance': record['name'],
+                'power_rating': round(float(rng.uniform(record['min_power_w'], record['max_power_w'])), 1),
+                'hours_per_day': round(float(rng.uniform(low_hours, high_hours)), 2),
+                'quantity': int(rng.choice(SAMPLE_QUANTITIES)),
+                'surge_factor': float(record['surge_factor'])
+            })
+        yield {
+            'location': str(rng.choice(SAMPLE_LOCATIONS)),
+            'budget': round(float(np.exp(rng.uniform(low_budget, high_budget))), -3),
+            'appliances': appliances,
+            'backup_hours': round(float(rng.uniform(1, 24)), 1),
+            'system_expansion': bool(rng.random() < 0.3),
+            'priority': str(rng.choice(PRIORITIES))
+        }
+
+def _init_training_worker():
+    """Batch worker whose synthetic calculations are not recorded in the history"""
+    from services import batch
+    settings.PERSIST_CALCULATIONS = False
+    batch._init_worker()
+
+def generate_training_set(inputs: Iterable[Dict[str, Any]], workers: Optional[int] = None
+                          ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Run the full orchestrator over inputs in a batch pool; returns the successful (inputs, targets)"""
+    from services.batch import BatchCalculator
+
+    inputs = list(inputs)
+    workers = workers or settings.BATCH_MAX_WORKERS
+    kept_inputs, kept_targets = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_training_worker) as executor:
+        calculator = BatchCalculator(executor=executor, dedup_cache_size=0, detail='full')
+        for line in calculator.run(inputs):
+            targets = training_targets(line.get('result') or {})
+            if targets is not None:
+                kept_inputs.append(inputs[line['index']])
+                kept_targets.append(targets)
+    logger.info(f"Surrogate training set: {len(kept_targets)} of {len(inputs)} calculations succeeded")
+    return kept_inputs, kept_targets
+
+def train_surrogate(samples: Optional[int] = None, workers: Optional[int] = None, seed: int = 0,
+                    path: Optional[str] = None) -> SurrogateModel:
+    """Sample inputs, calculate them, fit the surrogate and save it"""
+    inputs, targets = generate_training_set(sample_inputs(samples or settings.SURROGATE_TRAINING_SAMPLES, seed),
+                                            workers)
+    model = SurrogateModel.fit(inputs, targets, coverage=settings.SURROGATE_COVERAGE, seed=seed)
+    model.metadata['catalog_version'] = _catalog_version()
+    model.save(path or settings.SURROGATE_MODEL_PATH)
+    logger.info(f"Surrogate saved: {model.metadata}, bounds {dict(zip(SURROGATE_TARGETS, model.bounds.round(4)))}")
+    return model
+
+def _catalog_version() -> str:
+    from core.catalog import get_catalog
+    return get_catalog().version
+
+_surrogate: Optional[SurrogateModel] = None
+_surrogate_lock = threading.Lock()
+
+# Catalog versions already warned about, so a stale model warns once per catalog
+_stale_catalogs = set()
+
+def get_surrogate() -> SurrogateModel:
+    """
+    Return the process-wide surrogate, loading it on first use (DataNotFoundError
+    if untrained). Warns when the loaded component catalog is not the one the
+    model was trained on, since its estimates then describe other components.
+    """
+    global _surrogate
+
+    if _surrogate is None:
+        with _surrogate_lock:
+            if _surrogate is None:
+                _surrogate = SurrogateModel.load(settings.SURROGATE_MODEL_PATH)
+
+    trained, current = _surrogate.metadata.get('catalog_version'), _catalog_version()
+    if trained != current and current not in _stale_catalogs:
+        _stale_catalogs.add(current)
+        logger.warning(f"Surrogate model was trained on catalog {trained}, but catalog {current} is loaded; "
+                       f"retrain it with python -m services.surrogate")
+    return _surrogate
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    parser = argparse.ArgumentParser(description="Train the quick-estimate surrogate model")
+    parser.add_argument('--samples', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    train_surrogate(args.samples, args.workers, args.seed)
@@ -0,0 +1,352 @@
+from typing import Any, Dict, List, Sequence, Tuple
+import logging
+import math
+import time
+
+import numpy as np
+
+from config.settings import settings
+from agents.component_matching_agent import MAX_RATING, required_inverter_watts
+from agents.cost_optimizer_agent import GRID_TARIFF_NAIRA_KWH, SAVINGS_SUN_HOURS
+from agents.simulation_agent import (daily_loads_kwh, expected_generation_kwh, simulate_energy_balance,
+                                     simulation_irradiance)
+from core.calculations import SolarCalculations
+from core.utils import load_component_data
+
+logger = logging.getLogger(__name__)
+
+# Inputs a sweep can vary and their accepted ranges; load_scale multiplies
+# the whole load profile (daily energy, peak load and hourly curve)
+SWEEP_FIELDS = {
+    'budget': (1.0, 1e10),
+    'backup_hours': (1.0, 72.0),
+    'load_scale': (0.05, 20.0)
+}
+DEFAULT_STEPS = 20
+
+# Surfaces returned for every grid point (NaN where no design was found)
+SWEEP_METRICS = ('system_cost', 'system_size_kw', 'battery_kwh', 'self_sufficiency',
+                 'annual_savings', 'payback_years')
+
+# Options each sizing agent recommends, and how many of the top panels,
+# batteries, inverters and controllers the matching agent combines
+RECOMMENDATIONS = 10
+MATCH_WIDTHS = (3, 3, 2, 2)
+
+# Sizing candidates (cheapest per unit of capacity) ranked exactly per requirement
+RANKING_CANDIDATES = 50
+
+# Thresholds tested against the inverter/controller catalogs at a time
+THRESHOLD_CHUNK = 128
+
+def sweep_grid(axes: Sequence[Dict[str, Any]]) -> List[Tuple[str, np.ndarray]]:
+    """
+    Expand axis specs ({'field', 'values'} or {'field', 'start', 'stop',
+    'steps'}) into sorted, distinct points. Raises ValueError for unknown or
+    repeated fields, out-of-range values and grids over SWEEP_MAX_POINTS.
+    """
+    grid: List[Tuple[str, np.ndarray]] = []
+    for axis in axes:
+        field = axis.get('field')
+        if field not in SWEEP_FIELDS:
+            raise ValueError(f"Cannot sweep '{field}'; choose from {sorted(SWEEP_FIELDS)}")
+        if any(field == name for name, _ in grid):
+            raise ValueError(f"Axis '{field}' is given more than once")
+
+        # Bound each axis before allocating it; the grid total is checked below
+        size = len(axis['values']) if axis.get('values') else axis.get('steps') or DEFAULT_STEPS
+        if size > settings.SWEEP_MAX_POINTS:
+            raise ValueError(f"Axis '{field}' has {size} points; the limit is {settings.SWEEP_MAX_POINTS}")
+
+        if axis.get('values'):
+            values = np.asarray(axis['values'], dtype=float)
+        elif axis.get('start') is not None and axis.get('stop') is not None:
+            values = np.linspace(axis['start'], axis['stop'], size)
+        else:
+            raise ValueError(f"Axis '{field}' needs 'values' or 'start' and 'stop'")
+
+        low, high = SWEEP_FIELDS[field]
+        if not np.isfinite(values).all() or values.min() < low or values.max() > high:
+            raise ValueError(f"Axis '{field}' values must be between {low:g} and {high:g}")
+        grid.append((field, np.unique(values)))
+
+    if not 1 <= len(grid) <= 2:
+        raise ValueError("A sweep takes one or two axes")
+    points = math.prod(len(values) for _, values in grid)
+    if points > settings.SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep has {points} points; the limit is {settings.SWEEP_MAX_POINTS}")
+    return grid
+
+def _columns(component_type: str, *columns: str) -> List[np.ndarray]:
+    """Catalog columns as float arrays; rating scores default to the feedback prior"""
+    df = load_component_data(component_type)
+    arrays = []
+    for column in columns:
+        if column == 'rating_score' and column not in df.columns:
+            arrays.append(np.full(len(df), float(settings.FEEDBACK_PRIOR_MEAN)))
+        else:
+            arrays.append(df[column].to_numpy(dtype=float))
+    return arrays
+
+def _rank_sizing(requirements: np.ndarray, unit_size: np.ndarray, price: np.ndarray,
+                 eligible: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The sizing agents' recommendations for each requirement.
+
+    Returns (catalog indexes, units needed), each requirements × up to
+    RECOMMENDATIONS, ordered by cost per unit of capacity with ties kept in
+    catalog order, as the agents sort them.
+    """
+    eligible = np.flatnonzero(eligible)
+    by_unit_price = np.argsort(price[eligible] / unit_size[eligible], kind='stable')
+    candidates = np.sort(eligible[by_unit_price[:RANKING_CANDIDATES]])
+
+    count = np.ceil(requirements[:, None] / unit_size[candidates])
+    total_cost = count * price[candidates]
+    total_capacity = count * unit_size[candidates]
+    cost_per_unit = np.divide(total_cost, total_capacity, out=np.zeros_like(total_cost), where=total_capacity > 0)
+    order = np.argsort(cost_per_unit, axis=1, kind='stable')[:, :RECOMMENDATIONS]
+    return candidates[order], np.take_along_axis(count, order, axis=1)
+
+def _cheapest_qualifying(capacity: np.ndarray, price: np.ndarray, rating: np.ndarray,
+                         thresholds: np.ndarray, width: int) -> np.ndarray:
+    """
+    Catalog indexes of the first `width` components rated at or above each
+    threshold, cheapest first and better rated on ties (the matching agent's
+    order); -1 where fewer qualify.
+    """
+    order = np.lexsort((-rating, price))
+    ordered = capacity[order]
+    picks = np.full((len(thresholds), width), -1)
+    for start in range(0, len(thresholds), THRESHOLD_CHUNK):
+        qualifies = ordered[None, :] >= thresholds[start:start + THRESHOLD_CHUNK, None]
+        seen = np.cumsum(qualifies, axis=1)
+        block = picks[start:start + len(qualifies)]
+        for rank in range(width):
+            hit = qualifies & (seen == rank + 1)
+            found = hit.any(axis=1)
+            block[found, rank] = order[hit.argmax(axis=1)[found]]
+    return picks
+
+def _groups(*keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct rows of the per-point keys, and each point's row"""
+    groups, group_of_point = np.unique(np.column_stack(keys), axis=0, return_inverse=True)
+    return groups, group_of_point.reshape(-1)
+
+def _leading(values: np.ndarray, width: int, fill: float) -> np.ndarray:
+    """First `width` columns, padded with fill where there are fewer"""
+    padded = np.full((len(values), width), fill, dtype=float)
+    padded[:, :min(width, values.shape[1])] = values[:, :width]
+    return padded
+
+def evaluate_designs(workflow_data: Dict[str, Any], points: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Evaluate sizing, matching, cost optimization and simulation at many points.
+
+    workflow_data is a validated request after its load stage; points maps
+    any of budget, backup_hours, load_scale, peak_sun_hours and
+    daily_irradiance_kwh_m2 to per-point values (the rest come from workflow_data). The stages follow the agents'
+    logic as array operations, each run once per distinct set of the inputs
+    it depends on: inverters per load level, panels per load level and sun
+    hours, batteries per load level and backup time, configurations per
+    panel and battery sizing, the optimizer per point and the simulation per
+    distinct selected system and irradiance.
+
+    Returns flat per-point arrays: SWEEP_METRICS (NaN where no design was
+    found), design_found, within_budget and the selected components'
+    catalog indexes ('panel', 'battery', 'inverter', 'controller'; -1 where
+    none) with the panel and battery counts, plus 'evaluation' counters.
+    """
+    started = time.perf_counter()
+    size = len(next(iter(points.values())))
+
+    def point_values(field, default):
+        if field in points:
+            return np.asarray(points[field], dtype=float)
+        return np.full(size, float(workflow_data.get(field, default)))
+
+    budget = point_values('budget', 0)
+    backup_hours = point_values('backup_hours', 24)
+    sun_hours = point_values('peak_sun_hours', workflow_data.get('peak_sun_hours'))
+    irradiance = point_values('daily_irradiance_kwh_m2', simulation_irradiance(workflow_data))
+    scales, scale_of_point = np.unique(point_values('load_scale', 1.0), return_inverse=True)
+    panel_groups, panel_group_of_point = _groups(scale_of_point, sun_hours)
+    battery_groups, battery_group_of_point = _groups(scale_of_point, backup_hours)
+    config_groups, config_group_of_point = _groups(panel_group_of_point, battery_group_of_point)
+    scale_of_panel_group = panel_groups[:, 0].astype(int)
+    panel_group = config_groups[:, 0].astype(int)
+    battery_group = config_groups[:, 1].astype(int)
+    scale_of_config_group = scale_of_panel_group[panel_group]
+
+    system_voltage = workflow_data.get('system_voltage', 12)
+    daily = workflow_data['daily_consumption_kwh'] * scales
+    peak = workflow_data['peak_load_watts'] * scales
+    surge = (workflow_data.get('surge_peak_watts') or 0) * scales
+
+    # Panel sizing, per load level and sun hours
+    power, panel_price, panel_rating = _columns('panel', 'power_rating', 'price', 'rating_score')
+    required_watts = SolarCalculations.calculate_panel_requirements(
+        daily[scale_of_panel_group], panel_groups[:, 1], workflow_data.get('system_efficiency', 0.8)
+    )
+    panel_ids, panel_count = _rank_sizing(required_watts, power, panel_price, power > 0)
+    panel_capacity = panel_count * power[panel_ids]
+    panel_cost = panel_count * panel_price[panel_ids]
+
+    # Battery sizing, per load level and backup time
+    capacity_ah, voltage, battery_price, battery_rating = _columns(
+        'battery', 'capacity_ah', 'voltage', 'price', 'rating_score'
+    )
+    required_ah = SolarCalculations.calculate_battery_requirements(
+        daily[battery_groups[:, 0].astype(int)], battery_groups[:, 1] / 24, battery_voltage=system_voltage
+    )
+    battery_ids, battery_count = _rank_sizing(required_ah, capacity_ah, battery_price,
+                                              (capacity_ah > 0) & (voltage == system_voltage))
+    battery_capacity = battery_count * capacity_ah[battery_ids]
+    battery_cost = battery_count * battery_price[battery_ids]
+
+    # Inverters for the running peak (25% margin) and surge, per load level,
+    # and controllers for the largest panel array current (at 12 V) with a
+    # 25% margin, per panel sizing
+    inverter_power, inverter_price, inverter_rating = _columns('inverter', 'power_rating', 'price', 'rating_score')
+    inverter_ids = _cheapest_qualifying(inverter_power, inverter_price, inverter_rating,
+                                        required_inverter_watts(peak, surge), MATCH_WIDTHS[2])
+    max_current, controller_price, controller_rating = _columns('controller', 'max_current', 'price', 'rating_score')
+    panel_current = (panel_capacity / 12).max(axis=1) if panel_capacity.size else np.full(len(panel_groups), np.inf)
+    controller_ids = _cheapest_qualifying(max_current, controller_price, controller_rating,
+                                          panel_current * 1.25, MATCH_WIDTHS[3])
+
+    # Component matching, per panel and battery sizing: every combination
+    # of the top options, cheapest first (missing options cost infinity)
+    def option_columns(ids, values, width, rows):
+        chosen = np.where(ids >= 0, values[np.maximum(ids, 0)], np.inf)
+        return _leading(chosen, width, np.inf)[rows]
+
+    costs = [
+        _leading(panel_cost, MATCH_WIDTHS[0], np.inf)[panel_group],
+        _leading(battery_cost, MATCH_WIDTHS[1], np.inf)[battery_group],
+        option_columns(inverter_ids, inverter_price, MATCH_WIDTHS[2], scale_of_config_group),
+        option_columns(controller_ids, controller_price, MATCH_WIDTHS[3], panel_group)
+    ]
+    ratings = [
+        _leading(panel_rating[panel_ids], MATCH_WIDTHS[0], np.nan)[panel_group],
+        _leading(battery_rating[battery_ids], MATCH_WIDTHS[1], np.nan)[battery_group],
+        option_columns(inverter_ids, inverter_rating, MATCH_WIDTHS[2], scale_of_config_group),
+        option_columns(controller_ids, controller_rating, MATCH_WIDTHS[3], panel_group)
+    ]
+    expand = [(slice(None),) + tuple(slice(None) if axis == position else None for axis in range(4))
+              for position in range(4)]
+    config_cost = sum(cost[index] for cost, index in zip(costs, expand)).reshape(len(config_groups), -1)
+    config_rating = sum(rating[index] for rating, index in zip(ratings, expand)).reshape(len(config_groups), -1)
+    reliability = np.round((config_rating / 4 - 1) / (MAX_RATING - 1), 3)
+
+    config_order = np.argsort(config_cost, axis=1, kind='stable')[:, :RECOMMENDATIONS]
+    sorted_cost = np.take_along_axis(config_cost, config_order, axis=1)
+    sorted_reliability = np.take_along_axis(reliability, config_order, axis=1)
+    configurations = np.isfinite(sorted_cost).sum(axis=1)
+
+    # Cost optimization, per point: configurations within budget (or the
+    # three closest above it), then the priority's pick among them
+    point_cost = sorted_cost[config_group_of_point]
+    affordable = (point_cost <= budget[:, None]).sum(axis=1)
+    found = configurations[config_group_of_point] > 0
+    shortlist = np.where(affordable > 0, affordable, np.minimum(3, configurations[config_group_of_point]))
+    if workflow_data.get('priority', 'balanced') == 'reliability':
+        in_shortlist = np.arange(point_cost.shape[1])[None, :] < shortlist[:, None]
+        pick = np.where(in_shortlist, sorted_reliability[config_group_of_point], -np.inf).argmax(axis=1)
+    else:
+        pick = np.zeros(size, dtype=int)
+
+    choice = np.unravel_index(config_order[config_group_of_point, pick], MATCH_WIDTHS)
+    rows = [panel_group_of_point, battery_group_of_point, scale_of_point, panel_group_of_point]
+    selected = {
+        name: np.where(found, _leading(ids, width, -1).astype(int)[row, column], -1)
+        for name, ids, width, row, column in zip(('panel', 'battery', 'inverter', 'controller'),
+                                                 (panel_ids, battery_ids, inverter_ids, controller_ids),
+                                                 MATCH_WIDTHS, rows, choice)
+    }
+    selected['panel_count'] = np.where(found, _leading(panel_count, MATCH_WIDTHS[0], 0)[rows[0], choice[0]], 0)
+    selected['battery_count'] = np.where(found, _leading(battery_count, MATCH_WIDTHS[1], 0)[rows[1], choice[1]], 0)
+
+    system_cost = np.where(found, point_cost[np.arange(size), pick], np.nan)
+    selected_capacity = selected['panel_count'] * power[selected['panel']]
+    selected_ah = selected['battery_count'] * capacity_ah[selected['battery']]
+    annual_savings = selected_capacity * SAVINGS_SUN_HOURS * 30 / 1000 * GRID_TARIFF_NAIRA_KWH * 12
+    payback_years = np.round(np.divide(system_cost, annual_savings, out=np.full(size, np.nan),
+                                       where=annual_savings > 0), 1)
+
+    # Simulation, per distinct selected system at its load level and
+    # irradiance
+    self_sufficiency = np.full(size, np.nan)
+    simulations = 0
+    if found.any():
+        systems, system_of_point = np.unique(
+            np.column_stack([scale_of_point, selected_capacity, selected_ah, irradiance])[found], axis=0, return_inverse=True
+        )
+        loads = scales[systems[:, 0].astype(int), None] * daily_loads_kwh(workflow_data.get('load_profile', {}))
+        _, grid_import = simulate_energy_balance(expected_generation_kwh(systems[:, 1], systems[:, 3]),
+                                                 loads, systems[:, 2])
+        self_sufficiency[found] = (1 - grid_import.sum(axis=1) / loads.sum(axis=1))[system_of_point.reshape(-1)]
+        simulations = len(systems)
+
+    return {
+        'system_cost': system_cost,
+        'system_size_kw': np.where(found, np.round(selected_capacity / 1000, 3), np.nan),
+        'battery_kwh': np.where(found, selected_ah * voltage[selected['battery']] / 1000, np.nan),
+        'self_sufficiency': self_sufficiency,
+        'annual_savings': np.where(found, annual_savings, np.nan),
+        'payback_years': payback_years,
+        'design_found': found,
+        'within_budget': found & (np.nan_to_num(system_cost, nan=np.inf) <= budget),
+        **selected,
+        'evaluation': {
+            'points': size,
+            'load_levels': len(scales),
+            'panel_sizings': len(panel_groups),
+            'battery_sizings': len(battery_groups),
+            'matchings': len(config_groups),
+            'simulations': simulations,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+    }
+
+def evaluate_sweep(workflow_data: Dict[str, Any], grid: List[Tuple[str, np.ndarray]],
+                   sensitivity: bool = False) -> Dict[str, Any]:
+    """
+    Response surfaces of the design metrics over a grid from sweep_grid().
+
+    workflow_data is a validated request after the load and irradiance
+    stages. Metrics are nested lists indexed like the axes; sensitivity adds
+    each metric's partial derivatives along every axis with two or more points.
+    """
+    shape = tuple(len(values) for _, values in grid)
+    mesh = np.meshgrid(*(values for _, values in grid), indexing='ij')
+    designs = evaluate_designs(workflow_data, {name: values.ravel() for (name, _), values in zip(grid, mesh)})
+    surfaces = {metric: designs[metric].reshape(shape) for metric in SWEEP_METRICS}
+
+    result = {
+        'status': 'success',
+        'axes': [{'field': name, 'values': values.tolist()} for name, values in grid],
+        'shape': list(shape),
+        'baseline': {
+            'daily_consumption_kwh': workflow_data['daily_consumption_kwh'],
+            'peak_load_watts': workflow_data['peak_load_watts'],
+            'peak_sun_hours': workflow_data['peak_sun_hours'],
+            'budget': workflow_data.get('budget'),
+            'backup_hours': workflow_data.get('backup_hours'),
+            'priority': workflow_data.get('priority', 'balanced')
+        },
+        'design_found': designs['design_found'].reshape(shape).tolist(),
+        'within_budget': designs['within_budget'].reshape(shape).tolist(),
+        'metrics': {metric: surface.tolist() for metric, surface in surfaces.items()}
+    }
+
+    if sensitivity:
+        result['sensitivity'] = {
+            metric: {name: np.gradient(surface, values, axis=position).tolist()
+                     for position, (name, values) in enumerate(grid) if len(values) > 1}
+            for metric, surface in surfaces.items()
+        }
+
+    result['evaluation'] = designs['evaluation']
+    logger.info(f"Sweep evaluated: {result['evaluation']}")
+    return result
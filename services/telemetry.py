@@ -0,0 +1,389 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import csv
+import io
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Raw readings live in one table per UTC month (telemetry_YYYYMM); retention
+# drops whole tables. Hourly rollups and the daily system_performance rows
+# are kept indefinitely. fleet_performance holds the latest actual-vs-simulated
+# assessment of each system (services.fleet).
+TELEMETRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS telemetry_systems (
+    system_id TEXT PRIMARY KEY,
+    calculation_id TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS telemetry_hourly (
+    system_id TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    generation_wh REAL NOT NULL DEFAULT 0,
+    consumption_wh REAL NOT NULL DEFAULT 0,
+    grid_import_wh REAL NOT NULL DEFAULT 0,
+    min_battery_soc REAL,
+    readings INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (system_id, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fleet_performance (
+    system_id TEXT PRIMARY KEY,
+    calculation_id TEXT,
+    analyzed_at TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    days_observed INTEGER NOT NULL,
+    actual_generation_kwh REAL NOT NULL,
+    expected_generation_kwh REAL NOT NULL,
+    performance_ratio REAL,
+    anomaly_score REAL,
+    underperforming INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Daily rollups are stored in system_performance
+PERFORMANCE_COLUMNS = {'system_id': 'TEXT', 'day': 'TEXT', 'grid_import_kwh': 'REAL', 'readings': 'INTEGER'}
+
+TELEMETRY_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_performance_system_day ON system_performance (system_id, day);
+CREATE INDEX IF NOT EXISTS idx_telemetry_systems_calculation ON telemetry_systems (calculation_id);
+CREATE INDEX IF NOT EXISTS idx_fleet_underperforming ON fleet_performance (underperforming, anomaly_score);
+"""
+
+RAW_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    system_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    generation_wh REAL,
+    consumption_wh REAL,
+    grid_import_wh REAL,
+    battery_soc REAL,
+    PRIMARY KEY (system_id, ts)
+) WITHOUT ROWID
+"""
+
+RAW_TABLE_PATTERN = re.compile(r'^telemetry_(\d{4})(\d{2})$')
+
+UPSERT_HOURLY = """
+INSERT INTO telemetry_hourly (system_id, hour, generation_wh, consumption_wh, grid_import_wh, min_battery_soc, readings)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (system_id, hour) DO UPDATE SET
+    generation_wh = generation_wh + excluded.generation_wh,
+    consumption_wh = consumption_wh + excluded.consumption_wh,
+    grid_import_wh = grid_import_wh + excluded.grid_import_wh,
+    min_battery_soc = CASE
+        WHEN min_battery_soc IS NULL THEN excluded.min_battery_soc
+        WHEN excluded.min_battery_soc IS NULL THEN min_battery_soc
+        ELSE MIN(min_battery_soc, excluded.min_battery_soc) END,
+    readings = readings + excluded.readings
+"""
+
+UPSERT_DAILY = """
+INSERT INTO system_performance
+    (system_id, day, user_calculation_id, actual_generation_kwh, actual_consumption_kwh, grid_import_kwh,
+     performance_ratio, readings, recorded_at)
+VALUES (?, ?, (SELECT c.id FROM user_calculations c JOIN telemetry_systems s ON s.calculation_id = c.calculation_id
+               WHERE s.system_id = ?), ?, ?, ?, NULL, ?, CURRENT_TIMESTAMP)
+ON CONFLICT (system_id, day) DO UPDATE SET
+    actual_generation_kwh = actual_generation_kwh + excluded.actual_generation_kwh,
+    actual_consumption_kwh = actual_consumption_kwh + excluded.actual_consumption_kwh,
+    grid_import_kwh = grid_import_kwh + excluded.grid_import_kwh,
+    user_calculation_id = COALESCE(excluded.user_calculation_id, user_calculation_id),
+    readings = readings + excluded.readings,
+    recorded_at = CURRENT_TIMESTAMP
+"""
+
+UPSERT_SYSTEM = """
+INSERT INTO telemetry_systems (system_id, calculation_id, first_seen, last_seen) VALUES (?, ?, ?, ?)
+ON CONFLICT (system_id) DO UPDATE SET
+    calculation_id = COALESCE(excluded.calculation_id, calculation_id),
+    last_seen = excluded.last_seen
+"""
+
+READING_FIELDS = ('generation_wh', 'consumption_wh', 'grid_import_wh', 'battery_soc')
+
+# Readings stamped further ahead than this are clock errors, not early
+# arrivals (a day covers local times mislabelled as UTC)
+MAX_CLOCK_SKEW_SECONDS = 86400
+
+# A parsed reading, or the error that made it unreadable
+TelemetryRecord = Union[Dict[str, Any], Exception]
+
+def create_telemetry_schema(conn: sqlite3.Connection) -> None:
+    """Create the telemetry tables and the system_performance rollup columns"""
+    conn.executescript(TELEMETRY_SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(system_performance)")}
+    for column, column_type in PERFORMANCE_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE system_performance ADD COLUMN {column} {column_type}")
+    conn.executescript(TELEMETRY_INDEXES)
+
+def raw_table(ts: int) -> str:
+    """Name of the monthly partition holding a timestamp"""
+    moment = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return f"telemetry_{moment.year:04d}{moment.month:02d}"
+
+def _day(value: Any) -> str:
+    """UTC date (YYYY-MM-DD) of a timestamp or date string"""
+    text = str(value).strip()
+    if re.match(r'^\d{4}-\d{2}-\d{2}$', text):
+        return text
+    return datetime.fromtimestamp(parse_timestamp(value), tz=timezone.utc).date().isoformat()
+
+def parse_timestamp(value: Any) -> int:
+    """Epoch seconds from epoch numbers or ISO 8601 strings (naive times are UTC)"""
+    if isinstance(value, (int, float)):
+        return _epoch(value)
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is not None:
+        return _epoch(number)
+    moment = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _epoch(value: float) -> int:
+    """Whole epoch seconds; raises ValueError for NaN and infinity"""
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid timestamp: {value}")
+    return int(value)
+
+def normalize_reading(record: Dict[str, Any]) -> Tuple[str, int, Optional[str], Tuple[Optional[float], ...]]:
+    """
+    Validate a reading; returns (system_id, ts, calculation_id, field values).
+    Timestamps must fall between the epoch and MAX_CLOCK_SKEW_SECONDS from now.
+    """
+    system_id = str(record.get('system_id') or '').strip()
+    if not system_id:
+        raise ValueError("Reading needs a system_id")
+    if record.get('timestamp') in (None, ''):
+        raise ValueError("Reading needs a timestamp")
+    ts = parse_timestamp(record['timestamp'])
+    if ts < 0:
+        raise ValueError("Reading timestamp is before 1970")
+    if ts > time.time() + MAX_CLOCK_SKEW_SECONDS:
+        raise ValueError("Reading timestamp is in the future")
+
+    values = []
+    for field in READING_FIELDS:
+        value = record.get(field)
+        value = None if value in (None, '') else float(value)
+        if value is not None and not math.isfinite(value):
+            raise ValueError(f"{field} must be a finite number")
+        if value is not None and value < 0:
+            raise ValueError(f"{field} cannot be negative")
+        values.append(value)
+    return system_id, ts, record.get('calculation_id') or None, tuple(values)
+
+def _payload_readings(payload: Any) -> List[Any]:
+    """Readings from a decoded JSON or msgpack body; raises ValueError if it holds no list"""
+    readings = payload.get('readings', []) if isinstance(payload, dict) else payload
+    if not isinstance(readings, list):
+        raise ValueError("Telemetry body must be a list of readings (or an object with a 'readings' list)")
+    return readings
+
+def iter_telemetry_file(file: BinaryIO, telemetry_format: str) -> Iterator[TelemetryRecord]:
+    """
+    Parse an uploaded telemetry body ('csv', 'ndjson', 'msgpack' or 'json').
+    Unparseable readings are yielded as errors; a JSON or msgpack body that
+    is not a list of readings raises ValueError. msgpack bodies need the
+    optional 'fast' extra; without it they raise ImportError.
+    """
+    if telemetry_format == 'msgpack':
+        import msgpack
+        try:
+            payload = msgpack.unpackb(file.read(), raw=False)
+        except Exception as e:
+            yield ValueError(f"Invalid msgpack body: {e}")
+            return
+        yield from _payload_readings(payload)
+        return
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        if telemetry_format == 'csv':
+            yield from csv.DictReader(text)
+        elif telemetry_format == 'json':
+            try:
+                payload = json.load(text)
+            except ValueError as e:
+                yield ValueError(f"Invalid JSON body: {e}")
+                return
+            yield from _payload_readings(payload)
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield ValueError(f"Line {line_number}: invalid JSON ({e})")
+    finally:
+        text.detach()
+
+class TelemetryStore:
+    """Bulk ingestion of system telemetry into monthly partitions with hourly and daily rollups"""
+
+    def __init__(self, database=None, retention_days: Optional[int] = None):
+        if database is None:
+            from services.database import get_database
+            database = get_database()
+        self.database = database
+        self.retention_days = retention_days or settings.TELEMETRY_RAW_RETENTION_DAYS
+        self._last_purge = 0.0
+
+    def ingest(self, records: Iterable[TelemetryRecord], chunk_size: int = 5000) -> Dict[str, Any]:
+        """
+        Write readings in batched transactions.
+
+        Readings already stored (same system and timestamp) are skipped, so a
+        client can safely resend a batch; only new readings reach the rollups.
+        Readings older than the retention window are rejected: their raw
+        partition may already be purged, so a resend could not be detected.
+        Energy fields are per-reading interval energy in Wh.
+        """
+        summary = {'accepted': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+        chunk: List[Tuple] = []
+        oldest = time.time() - self.retention_days * 86400
+
+        for index, record in enumerate(records):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                reading = normalize_reading(record)
+                if reading[1] < oldest:
+                    raise ValueError(f"Reading is older than the {self.retention_days}-day retention window")
+                chunk.append(reading)
+            except (ValueError, TypeError, AttributeError) as e:
+                summary['rejected'] += 1
+                if len(summary['errors']) < 20:
+                    summary['errors'].append({'index': index, 'error': str(e)})
+                continue
+
+            if len(chunk) >= chunk_size:
+                self._write(chunk, summary)
+                chunk = []
+
+        if chunk:
+            self._write(chunk, summary)
+
+        self._maybe_purge()
+        return summary
+
+    def _write(self, readings: List[Tuple], summary: Dict[str, Any]) -> None:
+        hourly: Dict[Tuple[str, int], List[Any]] = defaultdict(lambda: [0.0, 0.0, 0.0, None, 0])
+        daily: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+        systems: Dict[str, Optional[str]] = {}
+        now = time.time()
+
+        with self.database.transaction() as conn:
+            # Another process may have purged a partition, so each write
+            # creates the ones it needs rather than trusting a cache
+            for table in {raw_table(reading[1]) for reading in readings}:
+                conn.execute(RAW_TABLE_SCHEMA.format(table=table))
+            for system_id, ts, calculation_id, values in readings:
+                table = raw_table(ts)
+
+                inserted = conn.execute(
+                    f"INSERT OR IGNORE INTO {table} VALUES (?, ?, ?, ?, ?, ?)", (system_id, ts) + values
+                ).rowcount
+                if calculation_id or system_id not in systems:
+                    systems[system_id] = calculation_id or systems.get(system_id)
+                if not inserted:
+                    summary['duplicates'] += 1
+                    continue
+
+                generation, consumption, grid_import, soc = (value or 0.0 for value in values)
+                hour = hourly[(system_id, ts - ts % 3600)]
+                hour[0] += generation
+                hour[1] += consumption
+                hour[2] += grid_import
+                if values[3] is not None:
+                    hour[3] = soc if hour[3] is None else min(hour[3], soc)
+                hour[4] += 1
+
+                day = daily[(system_id, datetime.fromtimestamp(ts, tz=timezone.utc).date().isoformat())]
+                day[0] += generation / 1000
+                day[1] += consumption / 1000
+                day[2] += grid_import / 1000
+                day[3] += 1
+                summary['accepted'] += 1
+
+            conn.executemany(UPSERT_SYSTEM, [(system_id, calculation_id, now, now)
+                                             for system_id, calculation_id in systems.items()])
+            conn.executemany(UPSERT_HOURLY, [key + tuple(totals) for key, totals in hourly.items()])
+            conn.executemany(UPSERT_DAILY, [(system_id, day, system_id, *totals)
+                                            for (system_id, day), totals in daily.items()])
+
+    def _maybe_purge(self) -> None:
+        """Apply the raw retention policy at most once an hour"""
+        if time.time() - self._last_purge >= 3600:
+            self.purge_raw()
+
+    def purge_raw(self, now: Optional[float] = None) -> List[str]:
+        """Drop monthly raw partitions that ended before the retention window"""
+        now = now or time.time()
+        self._last_purge = time.time()
+        cutoff = datetime.fromtimestamp(now - self.retention_days * 86400, tz=timezone.utc)
+        cutoff_month = (cutoff.year, cutoff.month)
+
+        conn = self.database.connection()
+        dropped = []
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'telemetry_%'").fetchall():
+            match = RAW_TABLE_PATTERN.match(name)
+            if match and (int(match.group(1)), int(match.group(2))) < cutoff_month:
+                conn.execute(f"DROP TABLE {name}")
+                dropped.append(name)
+
+        if dropped:
+            logger.info(f"Dropped expired telemetry partitions: {dropped}")
+        return dropped
+
+    def series(self, system_id: str, resolution: str = 'hour', start: Optional[Any] = None,
+               end: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """Downsampled readings for one system from the hourly or daily rollups"""
+        conn = self.database.connection()
+        if resolution == 'hour':
+            sql = ("SELECT hour, generation_wh, consumption_wh, grid_import_wh, min_battery_soc, readings "
+                   "FROM telemetry_hourly WHERE system_id = ? AND hour BETWEEN ? AND ? ORDER BY hour")
+            bounds = (parse_timestamp(start) if start is not None else 0,
+                      parse_timestamp(end) if end is not None else 2 ** 62)
+        elif resolution == 'day':
+            sql = ("SELECT day, actual_generation_kwh AS generation_kwh, actual_consumption_kwh AS consumption_kwh, "
+                   "grid_import_kwh, readings FROM system_performance WHERE system_id = ? AND day BETWEEN ? AND ? ORDER BY day")
+            bounds = (_day(start) if start is not None else '0000-00-00',
+                      _day(end) if end is not None else '9999-99-99')
+        else:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        return [dict(row) for row in conn.execute(sql, (system_id,) + bounds)]
+
+_telemetry_store: Optional[TelemetryStore] = None
+_telemetry_store_lock = threading.Lock()
+
+def get_telemetry_store() -> TelemetryStore:
+    """Return the process-wide telemetry store"""
+    global _telemetry_store
+
+    if _telemetry_store is None:
+        with _telemetry_store_lock:
+            if _telemetry_store is None:
+                _telemetry_store = TelemetryStore()
+    return _telemetry_store
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    get_telemetry_store().purge_raw()
@@ -14,6 +14,7 @@ setup(
         "fastapi>=0.104.0",
         "uvicorn>=0.24.0",
         "pydantic>=2.5.0",
+        "pydantic-settings>=2.1.0",
         "pandas>=2.1.0",
         "numpy>=1.24.0",
         "requests>=2.31.0",
@@ -31,6 +32,10 @@ setup(
             "scikit-learn>=1.3.0",
             "xgboost>=2.0.0",
             "lightgbm>=4.1.0"
+        ],
+        "fast": [
+            "orjson>=3.8.0",
+            "msgpack>=1.0.0"
         ]
     },
     classifiers=[
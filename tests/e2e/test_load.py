@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from benchmarks.load_test import (DEFAULT_WORKLOAD, LatencyHistogram, load_workload, parse_server_timing,
+                                  run_load_test)
+from services.database import CalculationWriter, Database
+
+def test_histogram_keeps_percentiles_to_its_precision():
+    """
+    Tests that histogram percentiles match exact ones to three significant digits, and the .hgrm export.
+    """
+    samples = np.random.default_rng(0).lognormal(1.5, 1.0, 20000)
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    for percentile in (50, 95, 99, 99.9):
+        exact = np.percentile(samples, percentile, method='inverted_cdf')
+        assert histogram.percentile(percentile) == pytest.approx(exact, rel=2e-3, abs=1e-3)
+    assert histogram.total == 20000
+    assert histogram.summary()["max_ms"] == pytest.approx(samples.max(), abs=1e-3)
+
+    lines = histogram.percentile_distribution().splitlines()
+    assert lines[0].split() == ["Value", "Percentile", "TotalCount", "1/(1-Percentile)"]
+    assert lines[-4].split()[1:] == ["1.000000000000", "20000"]
+    assert lines[-2].startswith("#[Max")
+
+def test_workload_from_samples_and_recorded_traffic(tmp_path):
+    """
+    Tests loading the sample mix and replaying inputs recorded in a calculation-history database.
+    """
+    samples = load_workload([DEFAULT_WORKLOAD])
+    assert len(samples) >= 10 and all("appliances" in sample for sample in samples)
+
+    database = Database(str(tmp_path / "history.db"))
+    writer = CalculationWriter(database, batch_size=10)
+    for position, sample in enumerate(samples[:3]):
+        writer.record(f"calculation-{position}", sample, {"status": "success"})
+    writer.flush(timeout=5)
+    writer.stop()
+    assert load_workload([str(tmp_path / "history.db")]) == samples[:3]
+
+    assert parse_server_timing("validation;dur=0.125, panel_sizing;desc=\"x\";dur=2") == {
+        "validation": 0.125, "panel_sizing": 2.0}
+
+def test_load_test_against_local_server():
+    """
+    Tests a short closed-loop run against a locally started API, with stage timings from the server.
+    """
+    report = run_load_test(concurrency=2, requests=12, warmup=2)
+    assert report["requests"] == 12
+    assert report["errors"] == 0 and report["statuses"] == {"200": 12}
+    assert report["throughput_rps"] > 0
+    assert report["latency"]["p50_ms"] <= report["latency"]["p99_ms"] <= report["latency"]["max_ms"]
+    assert {"validation", "panel_sizing", "report"} <= set(report["stages"])
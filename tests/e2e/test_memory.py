@@ -0,0 +1,48 @@
+import pytest
+from benchmarks.load_test import DEFAULT_WORKLOAD, load_workload
+from benchmarks.memory import growth_per_thousand, soak, stage_memory
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+
+class LeakyOrchestrator:
+    """Keeps 100 kB alive per calculation."""
+
+    def __init__(self):
+        self.kept = []
+
+    def calculate_solar_system(self, user_input, detail='standard'):
+        self.kept.append(bytearray(100 * 1024))
+        return {'status': 'success'}
+
+def test_stage_memory_covers_every_stage():
+    """
+    Tests that a calculation's memory is attributed to each stage and its agent.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+    user_input = load_workload([DEFAULT_WORKLOAD])[0]
+    # Load the catalogs untraced; tracing their construction is slow
+    orchestrator.calculate_solar_system(user_input, exact=True)
+    orchestrator.stage_cache.clear()
+
+    report = stage_memory(orchestrator, user_input, exact=True)
+    assert report["status"] == "success"
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert {"validation", "load_analysis", "panel_sizing", "configurations", "report"} <= set(stages)
+    assert stages["configurations"]["agent"] == "component_matching"
+    assert all(stage["peak_bytes"] >= stage["net_bytes"] for stage in report["stages"])
+    assert report["peak_bytes"] > 0
+    assert all(site["size_diff_bytes"] > 0 for site in report["retained_sites"])
+
+def test_soak_flags_steady_growth():
+    """
+    Tests that a soak run detects memory kept per request and names the allocation site.
+    """
+    workload = load_workload([DEFAULT_WORKLOAD])
+    report = soak(LeakyOrchestrator(), workload, 40, sample_every=5)
+    assert report["failures"] == 0
+    assert [sample["request"] for sample in report["samples"]] == list(range(5, 45, 5))
+    assert report["traced_growth_bytes_per_1k"] == pytest.approx(100 * 1024 * 1000, rel=0.05)
+    assert report["growing"] is True
+    assert "test_memory.py" in report["growth_sites"][0]["site"]
+
+    assert growth_per_thousand([100, 200, 300], [5e6, 5e6, 5e6]) == pytest.approx(0, abs=1e-3)
@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.catalog import generate_catalog
+from benchmarks.suite import compare_results, run_benchmarks
+from core.catalog import COMPONENT_FILES, DEFAULT_DATA_PATH, ComponentCatalog
+
+@pytest.fixture(scope="module")
+def catalog_root(tmp_path_factory):
+    """Provides a directory for generated catalogs."""
+    return str(tmp_path_factory.mktemp("catalogs"))
+
+def test_generated_catalog_follows_raw_schema(catalog_root):
+    """
+    Tests that a generated catalog has the raw columns, the requested rows and unique IDs, and loads.
+    """
+    path = generate_catalog(200, os.path.join(catalog_root, "catalog_200"))
+    for filename in COMPONENT_FILES.values():
+        source = pd.read_csv(os.path.join(DEFAULT_DATA_PATH, filename))
+        generated = pd.read_csv(os.path.join(path, filename))
+        assert list(generated.columns) == list(source.columns)
+        assert len(generated) == 200
+        assert generated.iloc[:, 0].is_unique
+        assert (generated['price_NGN'] > 0).all()
+
+    catalog = ComponentCatalog(path)
+    assert len(catalog.index('panel')) == 200
+    # An unchanged catalog is not regenerated
+    modified = os.path.getmtime(os.path.join(path, 'panels.csv'))
+    generate_catalog(200, path)
+    assert os.path.getmtime(os.path.join(path, 'panels.csv')) == modified
+
+def test_suite_times_agents_pipeline_and_api(catalog_root):
+    """
+    Tests that a small run records the catalog, every agent, the pipeline and the API.
+    """
+    results = run_benchmarks([300], repeats=1, catalog_root=catalog_root)
+    timings = results["results"]["300"]
+    assert {"catalog.load", "agent.panel_sizing", "agent.component_matching", "agent.report_generator",
+            "pipeline.cold", "pipeline.warm", "api.calculate"} <= set(timings)
+    assert all(timing["runs"] == 1 and timing["median_ms"] >= 0 for timing in timings.values())
+    assert results["commit"]
+
+def test_slowdowns_beyond_threshold_are_flagged():
+    """
+    Tests that only slowdowns past both the threshold and the noise floor count as regressions.
+    """
+    baseline = {"results": {"5000": {"pipeline.cold": {"median_ms": 100.0}, "agent.load_calculator": {"median_ms": 0.1},
+                                     "api.calculate": {"median_ms": 100.0}}}}
+    current = {"results": {"5000": {"pipeline.cold": {"median_ms": 140.0}, "agent.load_calculator": {"median_ms": 0.5},
+                                    "api.calculate": {"median_ms": 110.0}, "catalog.load": {"median_ms": 9.0}}}}
+    regressions = compare_results(baseline, current, threshold=0.25)
+    assert [(regression["benchmark"], regression["ratio"]) for regression in regressions] == [("pipeline.cold", 1.4)]
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from benchmarks.startup import check_budgets, measure_startup, parse_importtime, top_imports
+from config.settings import settings
+from services.api import main
+from services.orchestrator import AGENT_CLASSES, SolarSystemOrchestrator
+
+IMPORTTIME_REPORT = """\
+import time: self [us] | cumulative | imported package
+import time:       230 |        230 |   _io
+import time:       120 |        120 |     numpy.core
+import time:       900 |       1020 |   numpy
+import time:        50 |       1300 | services.orchestrator
+"""
+
+def test_worker_starts_without_heavy_modules():
+    """
+    Tests that a worker is ready within its budget without loading pandas, numpy or any agent.
+    """
+    result = measure_startup('worker', runs=1)
+    assert result['heavy_modules'] == []
+    assert check_budgets([result]) == []
+    assert result['top_imports']
+
+def test_warm_up_loads_every_agent():
+    """
+    Tests that agents are created on first use, and all of them by warm-up.
+    """
+    orchestrator = SolarSystemOrchestrator()
+    assert orchestrator.agents.loaded() == []
+    timings = orchestrator.warm_up()
+    assert set(orchestrator.agents.loaded()) == set(AGENT_CLASSES)
+    assert {'agents', 'catalog', 'appliances', 'design_table'} <= set(timings)
+
+def test_background_ratings_failure_is_logged(monkeypatch, caplog):
+    """
+    Tests that a ratings load left running after startup reports its failure instead of dropping it.
+    """
+    def fail(*args, **kwargs):
+        raise RuntimeError("feedback table locked")
+
+    async def start():
+        await main.load_component_ratings()
+        await asyncio.wait([main.ratings_refresh])
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(settings, "STARTUP_WARM_UP", False)
+    monkeypatch.setattr(main, "refresh_catalog_ratings", fail)
+    monkeypatch.setattr(main, "ratings_refresh", None)
+    with caplog.at_level(logging.ERROR, logger=main.logger.name):
+        asyncio.run(start())
+    assert "Loading component ratings failed" in caplog.text
+    assert "feedback table locked" in caplog.text
+
+def test_importtime_report_and_budget_check():
+    """
+    Tests that -X importtime output is parsed with nesting depth and that budget overruns are reported.
+    """
+    modules = parse_importtime(IMPORTTIME_REPORT)
+    assert [(module['module'], module['depth']) for module in modules] == [
+        ('_io', 1), ('numpy.core', 2), ('numpy', 1), ('services.orchestrator', 0)]
+    assert [module['module'] for module in top_imports(modules)] == ['numpy', '_io']
+
+    over = check_budgets([{'target': 'api', 'wall_s': 0.8}, {'target': 'worker', 'wall_s': 0.8}], {'api': 0.5})
+    assert over == [{'target': 'api', 'wall_s': 0.8, 'budget_s': 0.5},
+                    {'target': 'worker', 'wall_s': 0.8, 'budget_s': 0.5}]
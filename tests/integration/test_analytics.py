@@ -0,0 +1,75 @@
+import json
+from datetime import date
+import pytest
+from services.analytics import calculation_summary, metric_percentiles, rebuild_rollups, resolve_state
+from services.database import CalculationWriter, Database
+
+TODAY = date.today().isoformat()
+
+def calculation(location, budget, size_kw, cost):
+    """Builds a (user_input, result) pair as the orchestrator records it."""
+    return (
+        {"location": location, "budget": budget, "appliances": []},
+        {"status": "success", "executive_summary": {
+            "system_size_kw": size_kw, "recommended_system_cost": cost, "daily_energy_needs": 3.0
+        }}
+    )
+
+@pytest.fixture
+def database(tmp_path):
+    """Provides a database with a handful of recorded calculations."""
+    db = Database(str(tmp_path / "solar.db"))
+    writer = CalculationWriter(db, flush_interval=0.05)
+    for index, (location, budget, size_kw) in enumerate([
+        ("Lagos", 800000, 0.8), ("Ikeja, Lagos", 1500000, 2.0), ("Kano", 3000000, 4.0), ("Lagos", 900000, 1.2)
+    ]):
+        writer.record(f"calc-{index}", *calculation(location, budget, size_kw, budget * 0.9))
+    writer.flush(timeout=10)
+    writer.stop()
+    yield db
+    db.close()
+
+def test_locations_resolve_to_states():
+    """
+    Tests that state names, weather-station cities and 'city, state' strings resolve.
+    """
+    assert resolve_state("kano") == "Kano"
+    assert resolve_state("Ankpa") == "Kogi"
+    assert resolve_state("Ikeja, Lagos") == "Lagos"
+    assert resolve_state("Atlantis") == "Unknown"
+
+def test_rollups_are_maintained_as_rows_are_written(database):
+    """
+    Tests that the writer updates grouped counts and averages in the same transaction.
+    """
+    by_state = {row["state"]: row for row in calculation_summary(database.connection(), "state")}
+    assert by_state["Lagos"]["calculations"] == 3
+    assert by_state["Kano"]["average_budget"] == 3000000
+
+    bands = {row["budget_band"]: row["calculations"] for row in calculation_summary(database.connection(), "budget_band")}
+    assert bands == {"0.5M-1M": 2, "1M-2.5M": 1, "2.5M-5M": 1}
+
+def test_percentiles_come_from_histograms(database):
+    """
+    Tests that histogram percentiles land within one bucket of the true value.
+    """
+    result = metric_percentiles(database.connection(), "system_size_kw", state="Lagos", percentiles=(50,))
+    assert result["count"] == 3
+    assert result["percentiles"]["p50"] == pytest.approx(1.2, rel=0.07)
+
+def test_rebuild_backfills_legacy_rows_in_one_pass(database):
+    """
+    Tests that rebuilding reproduces the rollups and extracts columns for rows without them.
+    """
+    conn = database.connection()
+    user_input, result = calculation("Kano", 6000000, 12.0, 5000000)
+    conn.execute(
+        "INSERT INTO user_calculations (location, budget, created_at, input_data, results) VALUES (?, ?, ?, ?, ?)",
+        ("Kano", 6000000, f"{TODAY} 10:00:00", json.dumps(user_input), json.dumps(result))
+    )
+
+    assert rebuild_rollups(conn, chunk_size=2) == 5
+
+    sizes = {row["size_band"]: row["calculations"] for row in calculation_summary(conn, "size_band")}
+    assert sizes == {"<1kW": 1, "1-3kW": 2, "3-5kW": 1, "10kW+": 1}
+    assert conn.execute("SELECT state FROM user_calculations WHERE calculation_id IS NULL").fetchone()[0] == "Kano"
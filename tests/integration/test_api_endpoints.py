@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from data.schemas.user_input_schemas import UserInput
+from services.api import main
+from services.api.main import app
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+
+USER_INPUT = {
+    "location": "Kano",
+    "budget": 1800000,
+    "backup_hours": 6,
+    "appliances": [
+        {"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+        {"appliance": "Ceiling Fan", "power_rating": 75, "hours_per_day": 10, "quantity": 2}
+    ]
+}
+
+@pytest.fixture
+def client():
+    """Provides an in-process API client."""
+    return TestClient(app)
+
+def parse_sse(body):
+    """Split a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_stream_emits_stage_events_in_order(client):
+    """
+    Tests that the streaming endpoint emits one event per stage, ending with the report.
+    """
+    response = client.post("/api/v1/calculate/stream", json=USER_INPUT)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    stages = [name for name, _ in events]
+    assert stages[:3] == ["validation", "load_analysis", "irradiance"]
+    assert stages[-1] == "report"
+    assert events[-1][1]["final"] is True
+    assert events[1][1]["daily_consumption_kwh"] == pytest.approx(2.04)
+
+def test_closing_the_stream_stops_remaining_stages():
+    """
+    Tests that abandoning the event iterator skips the stages after it.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+    events = orchestrator.iter_calculation(USER_INPUT)
+
+    assert next(events)["stage"] == "validation"
+    assert next(events)["stage"] == "load_analysis"
+    events.close()
+
+    assert set(orchestrator.stage_cache.stats()) == {"load_calculator"}
+
+def test_stream_cancelled_during_a_stage_stops_after_it(monkeypatch):
+    """
+    Tests that a stream cancelled while a stage runs lets that stage finish, then closes the calculation.
+    """
+    started, release, closed, ran = threading.Event(), threading.Event(), threading.Event(), []
+
+    def stages(*args, **kwargs):
+        try:
+            yield {"stage": "validation", "result": {}, "final": False}
+            started.set()
+            release.wait(5)
+            yield {"stage": "load_analysis", "result": {}, "final": False}
+            ran.append("irradiance")
+            yield {"stage": "report", "result": {}, "final": True}
+        finally:
+            closed.set()
+
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def cancel_mid_stage():
+        response = await main.calculate_solar_system_stream(UserInput(**USER_INPUT), ConnectedRequest(),
+                                                            "standard", False)
+        body = response.body_iterator
+        assert "event: validation" in await body.__anext__()
+        pending = asyncio.ensure_future(body.__anext__())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+    monkeypatch.setattr(main.orchestrator, "iter_calculation", stages)
+    asyncio.run(cancel_mid_stage())
+    assert not closed.is_set()
+    release.set()
+    assert closed.wait(5)
+    assert ran == []
+
+def test_components_are_filtered_and_revalidated_with_etag(client):
+    """
+    Tests server-side filtering and that a repeat fetch with the ETag gets a 304.
+    """
+    params = {"min_power": 5000, "brand": "Growatt", "limit": 5, "fields": "model,power_rating"}
+
+    response = client.get("/api/v1/components/inverter", params=params)
+    body = response.json()
+    assert response.status_code == 200
+    assert body["count"] == 5 and body["next_cursor"]
+    assert all(c["power_rating"] >= 5000 for c in body["components"])
+
+    repeat = client.get("/api/v1/components/inverter", params=params,
+                        headers={"If-None-Match": response.headers["etag"]})
+    assert repeat.status_code == 304
+
+def test_calculate_detail_levels_control_report_size(client):
+    """
+    Tests that the summary level omits heavy sections and full, the default, adds the columnar time series.
+    """
+    summary = client.post("/api/v1/calculate?detail=summary", json=USER_INPUT).json()
+    assert summary["detail"] == "summary"
+    assert "executive_summary" in summary
+    assert "technical_details" not in summary and "full_report" not in summary
+
+    full = client.post("/api/v1/calculate", json=USER_INPUT).json()
+    assert full["detail"] == "full"
+    daily = full["full_report"]["performance_simulation"]["daily_results"]
+    assert isinstance(daily, dict) and len(daily["day"]) == 365
+
+    assert client.post("/api/v1/calculate?detail=everything", json=USER_INPUT).status_code == 422
+
+def test_calculate_negotiates_msgpack(client):
+    """
+    Tests that clients accepting msgpack get the same report in binary form.
+    """
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post("/api/v1/calculate?detail=summary", json=USER_INPUT,
+                           headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"] == "application/x-msgpack"
+    body = msgpack.unpackb(response.content)
+    assert body["status"] == "success" and body["detail"] == "summary"
+
+def test_msgpack_telemetry_needs_the_fast_extra(client, monkeypatch):
+    """
+    Tests that a msgpack telemetry body is refused with 415 when msgpack is not installed.
+    """
+    monkeypatch.setattr(main.serialization, "msgpack", None)
+    response = client.post("/api/v1/telemetry", content=b"\x90",
+                           headers={"Content-Type": "application/x-msgpack"})
+    assert response.status_code == 415
+
+def test_appliance_search_and_library_etag(client):
+    """
+    Tests the typeahead endpoint and conditional fetches of the appliance library.
+    """
+    search = client.get("/api/v1/appliances/search", params={"q": "fridge", "limit": 3}).json()
+    assert 0 < len(search["appliances"]) <= 3
+
+    response = client.get("/api/v1/appliances")
+    assert len(response.json()["appliances"]) == 397
+    repeat = client.get("/api/v1/appliances", headers={"If-None-Match": response.headers["etag"]})
+    assert repeat.status_code == 304
@@ -0,0 +1,95 @@
+import io
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from services import batch
+from services.batch import BatchCalculator, iter_batch_file
+
+RECORD = {
+    "location": "Lagos",
+    "budget": 2000000,
+    "appliances": [{"appliance": "LED Light", "power_rating": 20, "hours_per_day": 6, "quantity": 4}]
+}
+
+@pytest.fixture
+def calculator():
+    """Provides a batch calculator backed by a small thread pool."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        yield BatchCalculator(executor=executor, max_in_flight=2)
+
+def test_duplicates_are_calculated_once(calculator):
+    """
+    Tests that identical inputs share one calculation but still get a line per index.
+    """
+    records = [RECORD, {**RECORD, "budget": 3000000}, dict(RECORD)]
+
+    lines = sorted(calculator.run(records), key=lambda line: line["index"])
+
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["deduplicated"] for line in lines] == [False, False, True]
+    assert lines[0]["input_hash"] == lines[2]["input_hash"]
+
+def test_invalid_records_do_not_stop_the_batch(calculator):
+    """
+    Tests that unreadable and invalid lines are reported in place.
+    """
+    body = "\n".join([json.dumps(RECORD), "not json", json.dumps({"budget": 1})])
+
+    lines = sorted(calculator.run(iter_batch_file(io.BytesIO(body.encode()), "ndjson")),
+                   key=lambda line: line["index"])
+
+    assert [line["status"] == "error" for line in lines[1:]] == [True, True]
+    assert "result" in lines[0]
+
+def test_csv_survey_rows_are_grouped_by_record_id():
+    """
+    Tests that one-appliance-per-row CSV uploads are grouped into inputs.
+    """
+    body = (
+        "record_id,location,budget,appliance,power_rating,hours_per_day,quantity\n"
+        "a,Lagos,200000,TV,100,5,1\n"
+        "a,Lagos,200000,Ceiling Fan,75,8,2\n"
+        "b,Kano,300000,Refrigerator,150,24,1\n"
+    )
+
+    records = list(iter_batch_file(io.BytesIO(body.encode()), "csv"))
+
+    assert [len(record["appliances"]) for record in records] == [2, 1]
+    assert records[0]["appliances"][1] == {
+        "appliance": "Ceiling Fan", "power_rating": 75.0, "hours_per_day": 8.0, "quantity": 2
+    }
+    assert records[1]["budget"] == 300000.0
+
+def test_csv_record_with_a_bad_row_is_rejected_whole():
+    """
+    Tests that a grouped record with an unreadable appliance row is one error, not a partial load.
+    """
+    body = (
+        "record_id,location,budget,appliance,power_rating,hours_per_day,quantity\n"
+        "a,Lagos,200000,TV,100,5,1\n"
+        "a,Lagos,200000,Ceiling Fan,seventy,8,2\n"
+        "a,Lagos,200000,Iron,1000,1,1\n"
+        "b,Kano,300000,Refrigerator,150,24,1\n"
+    )
+
+    records = list(iter_batch_file(io.BytesIO(body.encode()), "csv"))
+
+    assert len(records) == 2
+    assert isinstance(records[0], ValueError) and "Record a, row 3" in str(records[0])
+    assert records[1]["appliances"][0]["appliance"] == "Refrigerator"
+
+def test_json_body_is_parsed_incrementally(monkeypatch):
+    """
+    Tests that JSON list and object bodies yield records while reading in small chunks, and report a broken tail.
+    """
+    monkeypatch.setattr(batch, "JSON_CHUNK_CHARS", 7)
+    records = [RECORD, {**RECORD, "budget": 1234567.5}, {**RECORD, "location": "Kano"}]
+
+    assert list(iter_batch_file(io.BytesIO(json.dumps(records).encode()), "json")) == records
+    body = json.dumps({"note": {"x": [1, 2]}, "records": records})
+    assert list(iter_batch_file(io.BytesIO(body.encode()), "json")) == records
+
+    parsed = list(iter_batch_file(io.BytesIO(json.dumps(records)[:-30].encode()), "json"))
+    assert parsed[:2] == records[:2]
+    assert isinstance(parsed[2], ValueError) and "Invalid JSON body" in str(parsed[2])
+    assert isinstance(next(iter_batch_file(io.BytesIO(b'{"rows": []}'), "json")), ValueError)
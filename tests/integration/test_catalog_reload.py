@@ -0,0 +1,131 @@
+import os
+import shutil
+import time
+import pandas as pd
+import pytest
+from config.settings import settings
+from core.catalog import COMPONENT_FILES, DEFAULT_DATA_PATH, ComponentCatalog, get_catalog, pinned_catalog, swap_catalog
+from services.cache import StageCache
+from services.catalog_manager import CATALOG_STAGES, CatalogManager
+from services.database import Database
+from services.feedback import record_feedback
+from services.orchestrator import SolarSystemOrchestrator
+
+REQUEST = {
+    "location": "Lagos",
+    "budget": 3000000,
+    "backup_hours": 6,
+    "appliances": [
+        {"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+        {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1}
+    ]
+}
+
+def publish_snapshot(root, name, price_factor=1.0):
+    """Writes a snapshot of the raw catalog with panel prices scaled."""
+    snapshot = root / name
+    snapshot.mkdir(parents=True)
+    for filename in COMPONENT_FILES.values():
+        shutil.copy(os.path.join(DEFAULT_DATA_PATH, filename), snapshot / filename)
+    panels = pd.read_csv(snapshot / COMPONENT_FILES["panel"])
+    panels["price_NGN"] = (panels["price_NGN"] * price_factor).round().astype(int)
+    panels.to_csv(snapshot / COMPONENT_FILES["panel"], index=False)
+    return snapshot
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    """Provides a snapshot directory serving the process catalog, restored afterwards."""
+    root = tmp_path / "snapshots"
+    publish_snapshot(root, "2026-10-01")
+    monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_PATH", str(root))
+    previous = swap_catalog(ComponentCatalog(str(root / "2026-10-01")))
+    yield root
+    swap_catalog(previous)
+
+@pytest.fixture
+def manager(tmp_path):
+    """Provides a catalog manager checking every 10 ms with its own stage cache."""
+    database = Database(str(tmp_path / "solar.db"))
+    yield CatalogManager(interval=0.01, stage_cache=StageCache(), database=database)
+    database.close()
+
+def stage_result(events, stage):
+    return next(event["result"] for event in events if event["stage"] == stage)
+
+def panel_cost(events):
+    return stage_result(events, "panel_sizing")["recommended_panels"][0]["total_cost"]
+
+def test_changed_snapshot_is_swapped_in_once_stable(snapshots, manager):
+    """
+    Tests that a new snapshot replaces the catalog after one stable check and drops catalog stage results.
+    """
+    old = get_catalog()
+    manager.stage_cache.put("component_matching", "key", {"status": "success"})
+    manager.stage_cache.put("cost_optimizer", "key", {"status": "success"})
+    assert manager.reload() is False
+
+    publish_snapshot(snapshots, "2026-10-08", price_factor=2.0)
+    time.sleep(0.02)
+    assert manager.check() is False
+    assert get_catalog() is old
+    time.sleep(0.02)
+    assert manager.check() is True
+
+    new = get_catalog()
+    assert new.data_path.endswith("2026-10-08")
+    assert new.version != old.version
+    assert new.frame("panel")["price"].sum() == pytest.approx(2 * old.frame("panel")["price"].sum(), rel=1e-3)
+    stats = manager.stage_cache.stats()
+    assert all(stats[stage]["size"] == 0 for stage in CATALOG_STAGES if stage in stats)
+    assert stats["cost_optimizer"]["size"] == 1
+
+    time.sleep(0.02)
+    assert manager.check() is False
+    assert manager.reloads == 1
+
+def test_running_calculation_keeps_its_catalog(snapshots, manager):
+    """
+    Tests that a calculation finishes on the catalog it started with and later ones use the new prices.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+    before = list(orchestrator.iter_calculation(REQUEST, "summary", exact=True))
+
+    calculation = orchestrator.iter_calculation(REQUEST, "summary", exact=True)
+    events = [next(calculation)]
+    publish_snapshot(snapshots, "2026-10-08", price_factor=2.0)
+    assert manager.reload() is True
+    events += list(calculation)
+    assert panel_cost(events) == panel_cost(before)
+
+    after = list(orchestrator.iter_calculation(REQUEST, "summary", exact=True))
+    assert panel_cost(after) > panel_cost(before)
+
+def test_ratings_never_change_a_pinned_catalog(snapshots, manager):
+    """
+    Tests that a ratings refresh during a calculation leaves its catalog's versions and rows as they were.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+    before = list(orchestrator.iter_calculation(REQUEST, "summary", exact=True))
+    model = stage_result(before, "panel_sizing")["recommended_panels"][0]["model"]
+
+    with pinned_catalog() as catalog:
+        versions = (catalog.version, catalog.ratings_version)
+        rows = catalog.frame("panel").copy()
+        records = [dict(record) for record in catalog.index("panel").records]
+        calculation = orchestrator.iter_calculation(REQUEST, "summary", exact=True)
+        events = [next(calculation)]
+
+        for _ in range(10):
+            record_feedback(manager.database, "panel", model, 1)
+        assert manager.refresh_ratings() is True
+        events += list(calculation)
+
+        assert (catalog.version, catalog.ratings_version) == versions
+        pd.testing.assert_frame_equal(catalog.frame("panel"), rows)
+        assert catalog.index("panel").records == records
+    assert stage_result(events, "configurations") == stage_result(before, "configurations")
+
+    rated = get_catalog()
+    assert rated.version == versions[0] and rated.ratings_version != versions[1]
+    after = list(orchestrator.iter_calculation(REQUEST, "summary", exact=True))
+    assert stage_result(after, "configurations") != stage_result(before, "configurations")
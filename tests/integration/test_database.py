@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import pytest
+from services.database import CalculationWriter, Database, create_schema
+
+USER_INPUT = {"location": "Lagos", "latitude": 6.5, "longitude": 3.4, "budget": 2000000, "appliances": []}
+RESULT = {"status": "success", "executive_summary": {"daily_energy_needs": 4.2, "recommended_system_cost": 1500000}}
+
+@pytest.fixture
+def database(tmp_path):
+    """Provides a database in a temporary directory."""
+    db = Database(str(tmp_path / "solar.db"))
+    yield db
+    db.close()
+
+def test_connections_are_per_thread_and_in_wal_mode(database):
+    """
+    Tests that each thread gets its own WAL connection and reuses it.
+    """
+    main = database.connection()
+    assert database.connection() is main
+    assert main.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main
+
+def test_writer_batches_calculations(database):
+    """
+    Tests that queued calculations are written in batches and duplicates are ignored.
+    """
+    writer = CalculationWriter(database, batch_size=50, flush_interval=0.05)
+    for index in range(120):
+        assert writer.record(f"calc-{index}", USER_INPUT, RESULT)
+    writer.record("calc-0", USER_INPUT, RESULT)
+    writer.flush(timeout=10)
+
+    rows = database.query("SELECT calculation_id, location, system_cost FROM user_calculations ORDER BY id")
+    assert len(rows) == 120
+    assert rows[0] == {"calculation_id": "calc-0", "location": "Lagos", "system_cost": 1500000}
+    writer.stop()
+
+def test_full_queue_drops_instead_of_blocking(database):
+    """
+    Tests that record() never blocks when the writer falls behind.
+    """
+    writer = CalculationWriter(database, max_queue=1, flush_interval=0.05)
+    with database._schema_lock:  # hold the writer back while the queue fills
+        results = [writer.record(f"calc-{index}", USER_INPUT, RESULT) for index in range(20)]
+    assert not all(results) and writer.dropped > 0
+    writer.stop()
+
+def test_schema_upgrades_older_databases(tmp_path):
+    """
+    Tests that the calculation_id column and indexes are added to an existing database.
+    """
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.execute("""
+        CREATE TABLE user_calculations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, location TEXT NOT NULL, latitude REAL, longitude REAL,
+            budget REAL NOT NULL, daily_consumption_kwh REAL, system_cost REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, input_data TEXT, results TEXT
+        )
+    """)
+
+    create_schema(conn)
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(user_calculations)")}
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(user_calculations)")}
+    assert "calculation_id" in columns
+    assert "idx_calculations_location" in indexes
@@ -0,0 +1,80 @@
+import pytest
+from config.settings import settings
+from core.load_profile import LoadProfile
+from services import design_table
+from services.cache import StageCache
+from services.design_table import DesignTable, design_table_path, get_design_table
+from services.orchestrator import SolarSystemOrchestrator
+
+REQUEST = {
+    "location": "Kano", "budget": 1500000, "backup_hours": 6,
+    "appliances": [{"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+                   {"appliance": "Television", "power_rating": 100, "hours_per_day": 5, "quantity": 1}]
+}
+
+@pytest.fixture(scope="module")
+def grid():
+    """Provides axes with the request's own load figures as the lower grid points."""
+    profile = LoadProfile(REQUEST["appliances"])
+    daily, peak = profile.total_energy_kwh, profile.running_peak_w
+    return {
+        "daily_consumption_kwh": [daily, daily * 2],
+        "peak_sun_hours": [6.8],
+        "backup_hours": [6],
+        "peak_load_watts": [peak, peak * 2]
+    }
+
+@pytest.fixture(scope="module")
+def table(grid):
+    """Provides a design table built over the small grid."""
+    return DesignTable.build(grid, workers=1)
+
+def test_tabled_design_matches_the_full_pipeline(table):
+    """
+    Tests that a request on a grid point gets the same design from the table as from every stage.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache(), design_table=table)
+    tabled = orchestrator.calculate_solar_system(REQUEST, 'standard')
+    exact = orchestrator.calculate_solar_system(REQUEST, 'standard', exact=True)
+
+    assert tabled["design_table_point"]["peak_sun_hours"] == 6.8
+    assert "design_table_point" not in exact
+    assert tabled["executive_summary"] == exact["executive_summary"]
+    assert tabled["technical_details"] == exact["technical_details"]
+
+def test_requests_snap_towards_larger_designs(table, grid):
+    """
+    Tests that demand snaps up and sun hours down without leaking grid values, and that off-grid requests are not answered.
+    """
+    daily, peak = grid["daily_consumption_kwh"][0], grid["peak_load_watts"][0]
+    request = {"daily_consumption_kwh": daily * 1.5, "peak_sun_hours": 6.8, "backup_hours": 6,
+               "peak_load_watts": peak}
+    tabled = table.lookup(request)
+    point = tabled["grid_point"]
+    assert not any(set(result) & set(grid) for result in tabled["stages"].values())
+    assert point["daily_consumption_kwh"] == pytest.approx(daily * 2)
+    assert point["peak_load_watts"] == pytest.approx(peak)
+    assert table.snap({**request, "peak_load_watts": peak * 1.01}) == (1, 0, 0, 1)
+    # A start-up surge the grid point's inverter cannot carry needs the full calculation
+    assert table.snap({**request, "surge_peak_watts": peak * 2}) is not None
+    assert table.snap({**request, "surge_peak_watts": peak * 4}) is None
+
+    assert table.lookup({**request, "daily_consumption_kwh": daily * 3}) is None
+    assert table.lookup({**request, "backup_hours": 3}) is None
+    assert table.lookup({**request, "system_voltage": 24}) is None
+
+def test_table_is_loaded_for_the_current_catalog(table, tmp_path, monkeypatch):
+    """
+    Tests that the saved table is found by catalog version and answers like the built one.
+    """
+    monkeypatch.setattr(settings, "DESIGN_TABLE_PATH", str(tmp_path / "design_table_{version}.npz"))
+    monkeypatch.setattr(design_table, "_design_table", None)
+    assert get_design_table() is None
+
+    table.save(design_table_path(table.catalog_version))
+    loaded = get_design_table()
+    assert loaded is get_design_table()
+    assert loaded.shape == table.shape == (2, 1, 1, 2)
+    request = {"daily_consumption_kwh": float(table.axes["daily_consumption_kwh"][1]), "peak_sun_hours": 6.8,
+               "backup_hours": 6, "peak_load_watts": float(table.axes["peak_load_watts"][1])}
+    assert loaded.lookup(request) == table.lookup(request)
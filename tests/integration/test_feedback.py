@@ -0,0 +1,134 @@
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+from agents.component_matching_agent import ComponentMatchingAgent
+from core.catalog import ComponentCatalog, get_catalog, swap_catalog
+from services.api.main import app
+from services.cache import StageCache
+from services.catalog_manager import CatalogManager
+from services.database import Database
+from services.feedback import component_ratings, record_feedback, refresh_catalog_ratings
+
+@pytest.fixture
+def database(tmp_path):
+    """Provides an empty database."""
+    db = Database(str(tmp_path / "solar.db"))
+    yield db
+    db.close()
+
+@pytest.fixture
+def manager(database):
+    """Provides a catalog manager rating from the test database, restoring the process catalog afterwards."""
+    previous = swap_catalog(ComponentCatalog())
+    yield CatalogManager(stage_cache=StageCache(), database=database)
+    swap_catalog(previous)
+
+def test_aggregates_follow_inserts_and_deletes(database):
+    """
+    Tests that the rating totals are maintained by the feedback table's triggers.
+    """
+    for rating in (5, 4, 3):
+        record_feedback(database, "panel", "P-1", rating)
+    record_feedback(database, "panel", "P-2", 1, "Cracked on delivery")
+    database.execute("INSERT INTO component_feedback (component_type, component_model, feedback) VALUES ('panel', 'P-2', 'no rating')")
+
+    models = component_ratings(database.connection())["panel"]["models"]
+    assert models["P-1"][:2] == (3, 4.0)
+    assert models["P-2"][:2] == (1, 1.0)
+
+    database.execute("DELETE FROM component_feedback WHERE component_model = 'P-2'")
+    assert "P-2" not in component_ratings(database.connection())["panel"]["models"]
+
+def test_smoothed_score_needs_volume_to_beat_the_mean(database):
+    """
+    Tests that one perfect rating ranks below a long record of good ones.
+    """
+    record_feedback(database, "inverter", "LUCKY", 5)
+    for _ in range(40):
+        record_feedback(database, "inverter", "PROVEN", 4)
+        record_feedback(database, "inverter", "PROVEN", 5)
+    for _ in range(10):
+        record_feedback(database, "inverter", "POOR", 2)
+
+    entry = component_ratings(database.connection(), ["inverter", "battery"])
+    scores = {model: score for model, (_, _, score) in entry["inverter"]["models"].items()}
+    assert scores["PROVEN"] > scores["LUCKY"] > scores["POOR"]
+    assert entry["battery"] == {"default_score": 3.0, "models": {}}
+
+def test_existing_feedback_is_backfilled(tmp_path):
+    """
+    Tests that feedback recorded before the aggregates existed is counted once they are created.
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE component_feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, component_type TEXT NOT NULL, "
+        "component_model TEXT NOT NULL, rating INTEGER, feedback TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.executemany("INSERT INTO component_feedback (component_type, component_model, rating) VALUES (?, ?, ?)",
+                     [("battery", "B-1", 4), ("battery", "B-1", 2)])
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    assert component_ratings(db.connection())["battery"]["models"]["B-1"][:2] == (2, 3.0)
+    db.close()
+
+def test_ratings_load_into_catalog_columns(database, manager):
+    """
+    Tests that aggregates become sortable columns of a new catalog, changing only its ratings version.
+    """
+    unrated = get_catalog()
+    model = unrated.frame("controller")["model"].iloc[10]
+    for _ in range(20):
+        record_feedback(database, "controller", model, 5)
+    record_feedback(database, "controller", unrated.frame("controller")["model"].iloc[0], 1)
+
+    assert refresh_catalog_ratings(manager=manager) is True
+    catalog = get_catalog()
+    assert catalog is not unrated
+    assert catalog.version == unrated.version
+    assert catalog.ratings_version != unrated.ratings_version
+    assert unrated.frame("controller")["rating_count"].sum() == 0
+    assert refresh_catalog_ratings(manager=manager) is False
+
+    top = catalog.query("controller", sort="-rating_score", limit=1)["components"][0]
+    assert top["model"] == model
+    assert top["rating_count"] == 20
+    assert top["rating_mean"] == 5.0
+    unrated = catalog.query("controller", sort="rating_count", limit=1)["components"][0]
+    assert unrated["rating_count"] == 0
+    assert unrated["rating_mean"] is None
+
+def test_configurations_carry_reliability_scores():
+    """
+    Tests that matched configurations are scored from their components' feedback.
+    """
+    panels = get_catalog().frame("panel")
+    batteries = get_catalog().frame("battery")
+    result = ComponentMatchingAgent().process({
+        "recommended_panels": [{"model": panels["model"].iloc[0], "total_capacity": 1200, "total_cost": 400000}],
+        "recommended_batteries": [{"model": batteries["model"].iloc[0], "total_cost": 300000}],
+        "peak_load_watts": 800
+    })
+    assert result["status"] == "success"
+    assert all(0 <= config["reliability_score"] <= 1 for config in result["system_configurations"])
+
+def test_feedback_endpoint_updates_the_catalog():
+    """
+    Tests that a submitted rating is reflected in the component listing.
+    """
+    client = TestClient(app)
+    model = get_catalog().frame("battery")["model"].iloc[3]
+
+    response = client.post("/api/v1/components/battery/feedback", json={"component_model": model, "rating": 5})
+    assert response.status_code == 201
+    assert response.json()["rating_count"] >= 1
+
+    listed = client.get("/api/v1/components/battery", params={"sort": "-rating_count", "limit": 1}).json()
+    assert listed["components"][0]["model"] == model
+
+    assert client.post("/api/v1/components/battery/feedback",
+                       json={"component_model": "NO-SUCH-MODEL", "rating": 3}).status_code == 404
+    assert client.post("/api/v1/components/battery/feedback",
+                       json={"component_model": model, "rating": 6}).status_code == 422
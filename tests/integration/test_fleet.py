@@ -0,0 +1,83 @@
+from datetime import date, datetime, timezone
+import pytest
+from services.cache import StageCache
+from services.database import CalculationWriter, Database
+from services.fleet import FleetAnalyzer, fleet_performance, robust_z_scores
+from services.telemetry import TelemetryStore
+
+END = date(2026, 3, 10)
+START = int(datetime(2026, 3, 1, tzinfo=timezone.utc).timestamp())
+
+# Kano's stored irradiance is 5.8 kWh/m²/day: a 2 kW array is simulated at 9.28 kWh/day
+SIMULATED_KWH = 2000 * 5.8 * 0.8 / 1000
+
+@pytest.fixture
+def database(tmp_path):
+    """Provides a database with twelve 2 kW Kano systems reporting ten days of telemetry."""
+    db = Database(str(tmp_path / "solar.db"))
+    writer = CalculationWriter(db, flush_interval=0.05)
+    for index in range(12):
+        writer.record(f"calc-{index}", {"location": "Kano", "budget": 1500000},
+                      {"executive_summary": {"system_size_kw": 2.0}})
+    writer.flush(timeout=10)
+    writer.stop()
+
+    # sys-0 produces half of what it should; the rest are within a few percent
+    readings = [
+        {"system_id": f"sys-{index}", "calculation_id": f"calc-{index}", "timestamp": START + day * 86400 + 43200,
+         "generation_wh": SIMULATED_KWH * 1000 * (0.5 if index == 0 else 0.97 + index * 0.005)}
+        for index in range(12) for day in range(10)
+    ]
+    TelemetryStore(db, retention_days=36500).ingest(readings)
+    yield db
+    db.close()
+
+def test_underperforming_systems_are_flagged(database):
+    """
+    Tests that a system far below its simulated generation is flagged and scored.
+    """
+    summary = FleetAnalyzer(database, StageCache()).run(days=10, end=END, workers=1)
+    assert summary["systems"] == 12
+    assert summary["analyzed"] == 12
+    assert summary["underperforming"] == 1
+
+    worst = fleet_performance(database.connection(), underperforming_only=True)
+    assert [row["system_id"] for row in worst] == ["sys-0"]
+    assert worst[0]["days_observed"] == 10
+    assert worst[0]["expected_generation_kwh"] == pytest.approx(SIMULATED_KWH * 10)
+    assert worst[0]["performance_ratio"] == pytest.approx(0.5)
+    assert worst[0]["anomaly_score"] < -3
+
+def test_daily_performance_ratios_are_stored(database):
+    """
+    Tests that each day's measured-to-simulated ratio is written to system_performance.
+    """
+    FleetAnalyzer(database, StageCache()).run(days=10, end=END, workers=1)
+    ratios = database.query(
+        "SELECT day, performance_ratio FROM system_performance WHERE system_id = 'sys-0' ORDER BY day"
+    )
+    assert len(ratios) == 10
+    assert all(row["performance_ratio"] == pytest.approx(0.5) for row in ratios)
+
+def test_process_pool_matches_inline_run(database):
+    """
+    Tests that chunks analyzed in worker processes give the same results as an inline run.
+    """
+    analyzer = FleetAnalyzer(database, StageCache())
+    analyzer.run(days=10, end=END, workers=1)
+    inline = fleet_performance(database.connection(), limit=20)
+
+    analyzer.run(days=10, end=END, workers=2, chunk_size=5)
+    pooled = fleet_performance(database.connection(), limit=20)
+
+    def strip(rows):
+        return [{key: value for key, value in row.items() if key != "analyzed_at"} for row in rows]
+    assert strip(pooled) == strip(inline)
+
+def test_robust_scores_ignore_the_outlier():
+    """
+    Tests that one extreme ratio does not hide itself by inflating the spread.
+    """
+    scores = robust_z_scores(__import__("numpy").array([1.0, 0.98, 1.02, 0.99, 1.01, 0.2]))
+    assert scores[-1] < -10
+    assert abs(scores[0]) < 1
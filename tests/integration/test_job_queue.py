@@ -0,0 +1,86 @@
+import time
+import pytest
+from services.job_queue import JobCancelled, JobQueue, _run_calculate, worker_loop
+from services.orchestrator import SolarSystemOrchestrator
+
+CALCULATION = {
+    "location": "Abuja",
+    "budget": 1500000,
+    "backup_hours": 6,
+    "appliances": [{"appliance": "Ceiling Fan", "power_rating": 75, "hours_per_day": 8, "quantity": 2}]
+}
+
+@pytest.fixture
+def queue(tmp_path):
+    """Provides a job queue backed by a temporary SQLite database."""
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+def test_claims_follow_priority_then_age(queue):
+    """
+    Tests that workers take higher-priority jobs first, oldest first within a priority.
+    """
+    low = queue.submit("calculate", {"input": CALCULATION}, client_id="a", priority=0)
+    high = queue.submit("calculate", {"input": CALCULATION}, client_id="b", priority=5)
+
+    assert queue.claim("w1")["job_id"] == high
+    assert queue.claim("w1")["job_id"] == low
+    assert queue.claim("w1") is None
+
+def test_per_client_running_cap(queue, monkeypatch):
+    """
+    Tests that a client at its concurrency cap does not block other clients.
+    """
+    monkeypatch.setattr("services.job_queue.settings.JOB_MAX_RUNNING_PER_CLIENT", 1)
+    first = queue.submit("calculate", {"input": CALCULATION}, client_id="busy", priority=9)
+    queue.submit("calculate", {"input": CALCULATION}, client_id="busy", priority=9)
+    other = queue.submit("calculate", {"input": CALCULATION}, client_id="quiet")
+
+    assert queue.claim("w1")["job_id"] == first
+    assert queue.claim("w2")["job_id"] == other
+    assert queue.claim("w3") is None
+
+def test_cancel_queued_job(queue):
+    """
+    Tests that a queued job is cancelled immediately and never claimed.
+    """
+    job_id = queue.submit("calculate", {"input": CALCULATION})
+
+    assert queue.cancel(job_id) == "cancelled"
+    assert queue.get(job_id)["status"] == "cancelled"
+    assert queue.claim("w1") is None
+
+def test_worker_runs_job_and_result_expires(queue):
+    """
+    Tests that a worker stores the result and that it disappears after its TTL.
+    """
+    job_id = queue.submit("calculate", {"input": CALCULATION}, ttl_seconds=1)
+
+    worker_loop("test-worker", db_path=queue.db_path, max_jobs=1)
+
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1
+    assert "status" in job["result"]
+
+    time.sleep(1.1)
+    assert queue.get(job_id) is None
+    assert queue.purge_expired() == 1
+
+def test_running_calculation_stops_when_cancelled(queue):
+    """
+    Tests that a running single-calculation job checks for cancellation between stages.
+    """
+    job_id = queue.submit("calculate", {"input": CALCULATION})
+    queue.claim("w1")
+    stages = []
+
+    def report_progress(progress):
+        stages.append(progress)
+        if len(stages) == 2:
+            assert queue.cancel(job_id) == "running"
+        if not queue.update_progress(job_id, progress):
+            raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        _run_calculate(SolarSystemOrchestrator(), {"input": CALCULATION}, report_progress)
+    assert len(stages) == 2
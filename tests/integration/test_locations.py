@@ -0,0 +1,81 @@
+import csv
+import os
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from services.api.main import app
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+
+REQUEST = {
+    "location": "Anywhere", "budget": 900000, "backup_hours": 8,
+    "appliances": [{"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+                   {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1},
+                   {"appliance": "Television", "power_rating": 100, "hours_per_day": 5, "quantity": 1}]
+}
+
+@pytest.fixture(scope="module")
+def orchestrator():
+    """Provides an orchestrator with a private stage cache."""
+    return SolarSystemOrchestrator(stage_cache=StageCache())
+
+def test_every_state_is_compared(orchestrator):
+    """
+    Tests that each state in the zones file gets a result, and that a stored location matches its full calculation.
+    """
+    with open(os.path.join(settings.DATA_PATH, 'geopolitical_zones_seasonal_factor.csv'), encoding='utf-8') as f:
+        states = [state.strip() for row in csv.DictReader(f) for state in row['States'].split(',')]
+
+    comparison = orchestrator.compare_locations(REQUEST)
+    by_state = {location["location"]: location for location in comparison["locations"]}
+    assert sorted(by_state) == sorted(states)
+    assert comparison["evaluation"]["battery_sizings"] == 1
+
+    kano = by_state["Kano"]
+    full = orchestrator.calculate_solar_system({**REQUEST, "location": "Kano"}, 'full', exact=True)
+    design = full["full_report"]["system_design"]
+    assert kano["irradiance_source"] == "stored_data"
+    assert kano["system_cost"] == design["total_system_cost"]
+    assert kano["system"]["panel"] == {"model": design["panel"]["model"],
+                                       "number_needed": design["panel"]["number_needed"]}
+    assert kano["system"]["inverter"]["model"] == design["inverter"]["model"]
+    assert kano["self_sufficiency"] == pytest.approx(
+        full["full_report"]["performance_simulation"]["annual_totals"]["self_sufficiency_ratio"])
+
+    # Abuja's stored data covers the FCT; other states are estimated from their capital's latitude
+    assert by_state["FCT"]["peak_sun_hours"] == 6.2
+    assert by_state["Sokoto"]["irradiance_source"] == "estimated"
+    assert by_state["Sokoto"]["peak_sun_hours"] == pytest.approx(5.8 * 1.2)
+
+def test_zones_and_coordinates(orchestrator):
+    """
+    Tests comparing by geopolitical zone and at given coordinates.
+    """
+    zones = orchestrator.compare_locations(REQUEST, by='zone')["locations"]
+    assert len(zones) == 6
+    assert "Kano" in next(zone for zone in zones if zone["location"] == "North West")["states"]
+
+    sites = [{"latitude": 13.0, "longitude": 5.2, "name": "Far north"}, {"latitude": 6.5, "longitude": 3.4}]
+    compared = orchestrator.compare_locations(REQUEST, coordinates=sites)["locations"]
+    assert [site["location"] for site in compared] == ["Far north", "6.5000, 3.4000"]
+    assert [site["peak_sun_hours"] for site in compared] == pytest.approx([5.8 * 1.2, 4.8 * 1.2])
+    assert compared[0]["design_found"] is True
+
+    with pytest.raises(ValueError):
+        orchestrator.compare_locations(REQUEST, by='city')
+
+def test_location_comparison_endpoint():
+    """
+    Tests that the endpoint returns a result per location, with missing designs as null.
+    """
+    client = TestClient(app)
+    response = client.post("/api/v1/compare/locations", json={"input": REQUEST, "by": "zone"})
+    assert response.status_code == 200
+    locations = response.json()["locations"]
+    assert len(locations) == 6
+    assert all(location["system"] is None and location["system_cost"] is None
+               for location in locations if not location["design_found"])
+    assert response.json()["irradiance_basis"] == "offline"
+    assert ("irradiance_note" in response.json()) == settings.NASA_POWER_ENABLED
+
+    assert client.post("/api/v1/compare/locations", json={"input": REQUEST, "by": "city"}).status_code == 422
@@ -0,0 +1,98 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from services.api.main import app, orchestrator as api_orchestrator
+from services.profiling import ProfilingMiddleware, TracingProfiler, collapsed_stacks
+
+REQUEST = {
+    "location": "Kano", "budget": 1500000, "backup_hours": 6,
+    "appliances": [{"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+                   {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1}]
+}
+
+def test_admin_token_profiles_one_request(tmp_path):
+    """
+    Tests that only a request with the admin token is profiled, saved as speedscope JSON under its request ID.
+    """
+    client = TestClient(ProfilingMiddleware(app, admin_token="secret", sample_rate=0, mode="tracing",
+                                            output_path=str(tmp_path)))
+    # Warm the stage cache first: tracing every call of a cold calculation is slow
+    client.post("/api/v1/calculate", params={"exact": "true"}, json=REQUEST)
+    response = client.post("/api/v1/calculate", params={"exact": "true"}, json=REQUEST,
+                           headers={"X-Profile": "secret", "X-Request-ID": "customer-42"})
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "customer-42"
+    assert response.headers["x-profile"] == "customer-42.speedscope.json"
+
+    with open(tmp_path / "customer-42.speedscope.json") as f:
+        profile = json.load(f)
+    names = {frame["name"] for frame in profile["shared"]["frames"]}
+    assert "SolarSystemOrchestrator.calculate_solar_system" in names
+    assert "StageCache.get" in names
+    sampled = profile["profiles"][0]
+    assert len(sampled["samples"]) == len(sampled["weights"]) and sampled["endValue"] > 0
+
+    assert "x-profile" not in client.post("/api/v1/calculate", json=REQUEST, headers={"X-Profile": "wrong"}).headers
+    assert "x-profile" in client.get("/api/v1/health", params={"profile": "secret"}).headers
+    assert len(os.listdir(tmp_path)) == 2
+
+def test_sampled_requests_write_collapsed_stacks(tmp_path):
+    """
+    Tests that a sampling rate profiles requests without the token, writing collapsed stacks.
+    """
+    client = TestClient(ProfilingMiddleware(app, admin_token=None, sample_rate=1.0, mode="sampling",
+                                            output_format="collapsed", output_path=str(tmp_path), interval_ms=0.2))
+    api_orchestrator.stage_cache.clear()
+    response = client.post("/api/v1/calculate", params={"exact": "true"}, json=REQUEST)
+    request_id = response.headers["x-request-id"]
+    lines = (tmp_path / f"{request_id}.collapsed.txt").read_text().splitlines()
+    assert lines and all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+    assert any("SolarSystemOrchestrator.calculate_solar_system" in line for line in lines)
+
+    with pytest.raises(ValueError):
+        ProfilingMiddleware(app, mode="cprofile")
+
+def test_tracing_profiler_charges_time_to_stacks():
+    """
+    Tests that traced time lands in the stack of the function that spent it.
+    """
+    def busy():
+        return sum(value * value for value in range(20000))
+
+    profiler = TracingProfiler()
+    profiler.start()
+    busy()
+    stacks = profiler.stop()
+    busy_time = sum(seconds for stack, seconds in stacks.items() if any("busy" in frame[0] for frame in stack))
+    assert busy_time > 0
+    assert "busy (test_profiling.py:" in collapsed_stacks(stacks)
+
+def test_thread_pool_work_is_profiled(tmp_path):
+    """
+    Tests that work a profiled request hands to the thread pool shows up in its profile.
+    """
+    client = TestClient(ProfilingMiddleware(app, admin_token=None, sample_rate=1.0, mode="sampling",
+                                            output_format="collapsed", output_path=str(tmp_path), interval_ms=0.2))
+    body = {"input": REQUEST, "axes": [{"field": "budget", "start": 500000, "stop": 3000000, "steps": 40}]}
+    response = client.post("/api/v1/sweep", json=body)
+    assert response.status_code == 200
+    lines = (tmp_path / f"{response.headers['x-request-id']}.collapsed.txt").read_text().splitlines()
+    assert any("SolarSystemOrchestrator.sweep" in line for line in lines)
+
+def test_only_one_request_is_traced_at_a_time(tmp_path):
+    """
+    Tests that a second tracing profile is refused while one runs, and its request is served unprofiled.
+    """
+    client = TestClient(ProfilingMiddleware(app, admin_token=None, sample_rate=1.0, mode="tracing",
+                                            output_path=str(tmp_path)))
+    profiler = TracingProfiler()
+    profiler.start()
+    try:
+        with pytest.raises(RuntimeError):
+            TracingProfiler().start()
+        response = client.get("/api/v1/health")
+    finally:
+        profiler.stop()
+    assert response.status_code == 200 and "x-profile" not in response.headers
+    assert "x-profile" in client.get("/api/v1/health").headers
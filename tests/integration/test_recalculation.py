@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+from services.api.main import app, orchestrator as api_orchestrator
+from services.cache import CalculationStore, StageCache
+from services.orchestrator import SolarSystemOrchestrator, apply_input_patch
+
+USER_INPUT = {
+    "location": "Kano",
+    "budget": 1800000,
+    "backup_hours": 6,
+    "appliances": [
+        {"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+        {"appliance": "Ceiling Fan", "power_rating": 75, "hours_per_day": 10, "quantity": 2}
+    ]
+}
+
+@pytest.fixture
+def orchestrator():
+    """Provides an orchestrator with no shared stage cache, so reuse comes only from the previous calculation."""
+    return SolarSystemOrchestrator(stage_cache=StageCache(default_size=0), calculation_store=CalculationStore(8))
+
+def test_patch_updates_adds_and_removes_appliances():
+    """
+    Tests that appliance indexes in a patch refer to the previous input.
+    """
+    patched = apply_input_patch(USER_INPUT, {
+        "budget": 2000000,
+        "update_appliances": [{"index": 1, "quantity": 3}],
+        "remove_appliances": [0],
+        "add_appliances": [{"appliance": "Laptop", "power_rating": 65, "hours_per_day": 4, "quantity": 1}]
+    })
+
+    assert patched["budget"] == 2000000
+    assert [(a["appliance"], a["quantity"]) for a in patched["appliances"]] == [("Ceiling Fan", 3), ("Laptop", 1)]
+    assert USER_INPUT["appliances"][1]["quantity"] == 2
+
+    with pytest.raises(ValueError):
+        apply_input_patch(USER_INPUT, {"remove_appliances": [5]})
+    with pytest.raises(ValueError):
+        apply_input_patch(USER_INPUT, {"update_appliances": [{"index": -1, "quantity": 3}]})
+
+def test_budget_change_reruns_only_dependent_stages(orchestrator):
+    """
+    Tests that a budget-only patch reuses every stage that does not read the budget.
+    """
+    first = orchestrator.calculate_solar_system(USER_INPUT)
+    second = orchestrator.recalculate(first["calculation_id"], {"budget": 2500000})
+
+    assert second["status"] == "success"
+    assert "cost_optimizer" not in second["reused_stages"]
+    assert {"load_calculator", "irradiance_agent", "panel_sizing", "battery_sizing"} <= set(second["reused_stages"])
+    assert second["calculation_id"] != first["calculation_id"]
+
+def test_appliance_change_reruns_the_load_chain(orchestrator):
+    """
+    Tests that changing the load invalidates the load stage but keeps irradiance.
+    """
+    first = orchestrator.calculate_solar_system(USER_INPUT)
+    second = orchestrator.recalculate(first["calculation_id"], {"update_appliances": [{"index": 0, "quantity": 12}]})
+
+    assert second["reused_stages"] == ["irradiance_agent"]
+
+def test_recalculate_endpoint():
+    """
+    Tests the recalculation endpoint, including unknown calculation IDs.
+    """
+    client = TestClient(app)
+    first = client.post("/api/v1/calculate?detail=summary", json=USER_INPUT).json()
+
+    response = client.post(f"/api/v1/calculate/{first['calculation_id']}/recalculate?detail=summary",
+                           json={"backup_hours": 8})
+    assert response.status_code == 200
+    assert "irradiance_agent" in response.json()["reused_stages"]
+
+    assert client.post("/api/v1/calculate/unknown/recalculate", json={}).status_code == 404
+    for patch in ({"remove_appliances": [7]}, {"remove_appliances": [-1]}):
+        assert client.post(f"/api/v1/calculate/{first['calculation_id']}/recalculate", json=patch).status_code == 422
+
+def test_recalculate_endpoint_rejects_unusable_records():
+    """
+    Tests that a patch that cannot be applied to a stored input is a client error, not a 500.
+    """
+    client = TestClient(app)
+    api_orchestrator.calculation_store.put("broken", {"input": {"appliances": None}, "stages": {}})
+    response = client.post("/api/v1/calculate/broken/recalculate", json={"backup_hours": 8})
+    assert response.status_code == 422
@@ -0,0 +1,127 @@
+import logging
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from core.catalog import get_catalog
+from core.load_profile import LoadProfile
+from services import surrogate
+from services.api.main import app
+from services.orchestrator import SolarSystemOrchestrator
+from services.surrogate import SURROGATE_TARGETS, SurrogateModel, sample_inputs, training_targets
+
+def synthetic_targets(input_data, rng):
+    """Targets with a known dependence on the inputs and multiplicative noise"""
+    energy = LoadProfile(input_data['appliances']).total_energy_kwh
+    if energy > 4:
+        return {'design_found': False}
+    noise = rng.lognormal(0, 0.05, 3)
+    return {
+        'design_found': True,
+        'system_cost': 150000 * energy ** 0.8 * noise[0],
+        'system_size_kw': energy / 4.8 * noise[1],
+        'battery_kwh': energy * input_data['backup_hours'] / 24 * noise[2],
+        'self_sufficiency': min(0.9 + rng.normal(0, 0.03), 1.0)
+    }
+
+@pytest.fixture(scope="module")
+def model():
+    """Provides a surrogate fitted to synthetic targets."""
+    rng = np.random.default_rng(1)
+    inputs = list(sample_inputs(600, seed=1))
+    return SurrogateModel.fit(inputs, [synthetic_targets(input_data, rng) for input_data in inputs])
+
+def test_training_targets_from_full_reports():
+    """
+    Tests that headline figures are read from a full report, and that an empty design is recorded as such.
+    """
+    orchestrator = SolarSystemOrchestrator()
+    small = {"location": "Kano", "budget": 1500000, "backup_hours": 6,
+             "appliances": [{"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6}]}
+    targets = training_targets(orchestrator.calculate_solar_system(small, 'full'))
+    assert targets["design_found"] is True
+    assert all(targets[target] > 0 for target in SURROGATE_TARGETS)
+
+    large = {**small, "appliances": [{"appliance": "Air Conditioner", "power_rating": 2000, "hours_per_day": 12,
+                                      "quantity": 6}]}
+    assert training_targets(orchestrator.calculate_solar_system(large, 'full')) == {"design_found": False}
+    assert training_targets({"status": "error", "error": "boom"}) is None
+
+def test_bounds_cover_held_out_inputs(model):
+    """
+    Tests that the calibrated bounds contain about the requested share of unseen results.
+    """
+    rng = np.random.default_rng(2)
+    covered, correct, designs = np.zeros(len(SURROGATE_TARGETS)), 0, 0
+    inputs = list(sample_inputs(400, seed=2))
+    for input_data in inputs:
+        actual = synthetic_targets(input_data, rng)
+        predicted = model.predict(input_data)
+        correct += (predicted["design_found_probability"] > 0.5) == actual["design_found"]
+        if not actual["design_found"]:
+            continue
+        designs += 1
+        for index, target in enumerate(SURROGATE_TARGETS):
+            estimate = predicted["estimates"][target]
+            covered[index] += estimate["lower"] <= actual[target] <= estimate["upper"]
+
+    assert correct / len(inputs) > 0.9
+    assert designs > 50
+    assert all(covered / designs > 0.8)
+
+def test_saved_model_predicts_the_same(model, tmp_path):
+    """
+    Tests that a model read back from disk gives identical estimates.
+    """
+    path = str(tmp_path / "surrogate.npz")
+    model.save(path)
+    loaded = SurrogateModel.load(path)
+    input_data = next(sample_inputs(1, seed=3))
+    assert loaded.predict(input_data) == model.predict(input_data)
+    assert loaded.coverage == model.coverage
+    assert loaded.metadata["designs"] == model.metadata["designs"]
+
+def test_quick_calculation_endpoint(model, tmp_path, monkeypatch):
+    """
+    Tests that quick mode answers from the surrogate, and is unavailable without a trained model.
+    """
+    client = TestClient(app)
+    input_data = next(sample_inputs(1, seed=4))
+
+    monkeypatch.setattr(surrogate, "_surrogate", None)
+    monkeypatch.setattr(settings, "SURROGATE_MODEL_PATH", str(tmp_path / "missing.npz"))
+    assert client.post("/api/v1/calculate", params={"quick": "true"}, json=input_data).status_code == 503
+
+    path = str(tmp_path / "surrogate.npz")
+    model.save(path)
+    monkeypatch.setattr(settings, "SURROGATE_MODEL_PATH", path)
+    response = client.post("/api/v1/calculate", params={"quick": "true"}, json=input_data)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["mode"] == "quick"
+    assert body["coverage"] == 0.9
+    assert set(body["estimates"]) == set(SURROGATE_TARGETS)
+    assert 0 <= body["design_found_probability"] <= 1
+
+def test_model_from_another_catalog_warns(model, tmp_path, monkeypatch, caplog):
+    """
+    Tests that loading a surrogate trained on a different component catalog logs a warning.
+    """
+    path = str(tmp_path / "surrogate.npz")
+    monkeypatch.setattr(model, "metadata", {**model.metadata, "catalog_version": "0123456789abcdef"})
+    model.save(path)
+    monkeypatch.setattr(surrogate, "_surrogate", None)
+    monkeypatch.setattr(surrogate, "_stale_catalogs", set())
+    monkeypatch.setattr(settings, "SURROGATE_MODEL_PATH", path)
+    with caplog.at_level(logging.WARNING, logger=surrogate.logger.name):
+        assert surrogate.get_surrogate().metadata["catalog_version"] == "0123456789abcdef"
+    assert "trained on catalog 0123456789abcdef" in caplog.text
+
+    caplog.clear()
+    monkeypatch.setattr(model, "metadata", {**model.metadata, "catalog_version": get_catalog().version})
+    model.save(path)
+    monkeypatch.setattr(surrogate, "_surrogate", None)
+    monkeypatch.setattr(surrogate, "_stale_catalogs", set())
+    with caplog.at_level(logging.WARNING, logger=surrogate.logger.name):
+        surrogate.get_surrogate()
+    assert "trained on catalog" not in caplog.text
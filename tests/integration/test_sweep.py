@@ -0,0 +1,105 @@
+import math
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from services.api.main import app
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+from services.sweep import SWEEP_METRICS, evaluate_designs, sweep_grid
+
+REQUEST = {
+    "location": "Kano", "budget": 1500000, "backup_hours": 6, "priority": "reliability",
+    "appliances": [{"appliance": "LED Light", "power_rating": 15, "hours_per_day": 6, "quantity": 6},
+                   {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1}]
+}
+
+@pytest.fixture(scope="module")
+def orchestrator():
+    """Provides an orchestrator with a private stage cache."""
+    return SolarSystemOrchestrator(stage_cache=StageCache())
+
+def test_sweep_points_match_the_full_pipeline(orchestrator):
+    """
+    Tests that each point of a budget by backup-hours sweep has the design the full calculation selects.
+    """
+    budgets, backups = [300000, 1500000], [3, 13, 24]
+    sweep = orchestrator.sweep(REQUEST, [{"field": "budget", "values": budgets},
+                                         {"field": "backup_hours", "values": backups}])
+    assert sweep["shape"] == [2, 3]
+
+    for i, budget in enumerate(budgets):
+        for j, backup_hours in enumerate(backups):
+            full = orchestrator.calculate_solar_system({**REQUEST, "budget": budget, "backup_hours": backup_hours},
+                                                       'full', exact=True)
+            design = full["full_report"]["system_design"]
+            simulation = full["full_report"]["performance_simulation"]["annual_totals"]
+            assert sweep["design_found"][i][j] is True
+            assert sweep["within_budget"][i][j] == (design["total_system_cost"] <= budget)
+            assert sweep["metrics"]["system_cost"][i][j] == design["total_system_cost"]
+            assert sweep["metrics"]["system_size_kw"][i][j] == full["executive_summary"]["system_size_kw"]
+            assert sweep["metrics"]["payback_years"][i][j] == full["executive_summary"]["payback_period"]
+            assert sweep["metrics"]["self_sufficiency"][i][j] == pytest.approx(simulation["self_sufficiency_ratio"])
+
+def test_simulation_uses_the_site_irradiance(orchestrator):
+    """
+    Tests that the agent and the sweep engine simulate at the location's daily irradiance, not a fixed default.
+    """
+    workflow_data, _ = orchestrator._analysed_load(REQUEST)
+    workflow_data.update(orchestrator._run_agent('irradiance_agent', workflow_data))
+    irradiance = workflow_data["daily_irradiance_kwh_m2"]
+    designs = evaluate_designs(workflow_data, {"daily_irradiance_kwh_m2": np.array([irradiance, 2.0, 5.0])})
+    assert designs["evaluation"]["simulations"] == 3
+    assert designs["self_sufficiency"][1] < designs["self_sufficiency"][0]
+
+    full = orchestrator.calculate_solar_system(REQUEST, 'full', exact=True)
+    simulated = full["full_report"]["performance_simulation"]["annual_totals"]["self_sufficiency_ratio"]
+    assert simulated == pytest.approx(designs["self_sufficiency"][0])
+    assert simulated != pytest.approx(designs["self_sufficiency"][2])
+
+def test_load_scale_sweep_with_sensitivity(orchestrator):
+    """
+    Tests that scaling the load past the catalog leaves no design, and that partial derivatives follow the axes.
+    """
+    sweep = orchestrator.sweep(REQUEST, [{"field": "load_scale", "values": [0.5, 1, 4]},
+                                         {"field": "budget", "start": 500000, "stop": 2000000, "steps": 4}],
+                               sensitivity=True)
+    assert sweep["axes"][1]["values"] == [500000, 1000000, 1500000, 2000000]
+    assert set(sweep["metrics"]) == set(SWEEP_METRICS)
+    assert set(sweep["sensitivity"]["system_cost"]) == {"load_scale", "budget"}
+
+    costs = sweep["metrics"]["system_cost"]
+    assert costs[0][0] < costs[1][0]
+    assert sweep["design_found"][2] == [False] * 4
+    assert all(math.isnan(cost) for cost in costs[2])
+
+    # Every budget here affords the same design; cost rises with the load
+    assert sweep["sensitivity"]["system_cost"]["budget"][0] == [0] * 4
+    assert all(slope > 0 for slope in sweep["sensitivity"]["system_cost"]["load_scale"][0])
+
+def test_sweep_endpoint(monkeypatch):
+    """
+    Tests that the endpoint returns the response surface, with points lacking a design as null, and rejects oversized grids.
+    """
+    client = TestClient(app)
+    body = {"input": REQUEST, "axes": [{"field": "load_scale", "values": [1, 4]}]}
+    response = client.post("/api/v1/sweep", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["evaluation"]["points"] == 2
+    assert result["metrics"]["system_cost"][1] is None
+
+    assert client.post("/api/v1/sweep", json={**body, "axes": [{"field": "priority", "values": [1]}]}).status_code == 422
+    assert client.post("/api/v1/sweep", json={**body, "axes": [{"field": "backup_hours", "values": [100]}]}).status_code == 422
+
+    monkeypatch.setattr(settings, "SWEEP_MAX_POINTS", 10)
+    axes = [{"field": "budget", "start": 100000, "stop": 2000000, "steps": 4},
+            {"field": "backup_hours", "start": 2, "stop": 24, "steps": 4}]
+    response = client.post("/api/v1/sweep", json={**body, "axes": axes})
+    assert response.status_code == 422
+    assert "limit is 10" in response.json()["detail"]
+
+    huge = [{"field": "budget", "start": 100000, "stop": 2000000, "steps": 10 ** 12}]
+    assert client.post("/api/v1/sweep", json={**body, "axes": huge}).status_code == 422
+    with pytest.raises(ValueError, match="limit is 10"):
+        sweep_grid(huge)
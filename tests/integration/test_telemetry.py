@@ -0,0 +1,161 @@
+import io
+from datetime import datetime, timezone
+import pytest
+from services.database import CalculationWriter, Database
+from services.telemetry import TelemetryStore, iter_telemetry_file
+
+START = int(datetime(2026, 3, 1, tzinfo=timezone.utc).timestamp())
+
+def readings(system_id, hours, interval=900):
+    """Builds quarter-hourly readings of 100 Wh generation and 50 Wh consumption."""
+    return [
+        {"system_id": system_id, "timestamp": START + offset, "generation_wh": 100,
+         "consumption_wh": 50, "battery_soc": 0.9 - offset / 1e6}
+        for offset in range(0, hours * 3600, interval)
+    ]
+
+@pytest.fixture
+def database(tmp_path):
+    """Provides an empty database."""
+    db = Database(str(tmp_path / "solar.db"))
+    yield db
+    db.close()
+
+@pytest.fixture
+def store(database):
+    """Provides a telemetry store that keeps raw readings until purged explicitly."""
+    return TelemetryStore(database, retention_days=36500)
+
+def test_ingest_rolls_up_hours_and_days(store):
+    """
+    Tests that readings land in hourly and daily rollups with the right totals.
+    """
+    summary = store.ingest(readings("sys-1", 48))
+    assert summary["accepted"] == 192
+    assert summary["rejected"] == 0
+
+    hours = store.series("sys-1", "hour")
+    assert len(hours) == 48
+    assert hours[0]["generation_wh"] == 400
+    assert hours[0]["readings"] == 4
+
+    days = store.series("sys-1", "day")
+    assert [day["day"] for day in days] == ["2026-03-01", "2026-03-02"]
+    assert days[0]["generation_kwh"] == pytest.approx(9.6)
+    assert days[0]["consumption_kwh"] == pytest.approx(4.8)
+
+    assert len(store.series("sys-1", "day", start="2026-03-02")) == 1
+    assert len(store.series("sys-1", "hour", end=START + 3600)) == 2
+
+def test_resent_readings_are_not_counted_twice(store):
+    """
+    Tests that duplicate readings are skipped and leave the rollups unchanged.
+    """
+    batch = readings("sys-1", 2)
+    store.ingest(batch)
+    summary = store.ingest(batch + readings("sys-2", 1))
+    assert summary["duplicates"] == 8
+    assert summary["accepted"] == 4
+    assert store.series("sys-1", "day")[0]["generation_kwh"] == pytest.approx(0.8)
+
+def test_invalid_readings_are_rejected_individually(store):
+    """
+    Tests that bad readings are reported without failing the rest of the batch.
+    """
+    batch = readings("sys-1", 1) + [
+        {"timestamp": START},
+        {"system_id": "sys-1", "timestamp": START + 60, "generation_wh": -5},
+        {"system_id": "sys-1", "timestamp": "not a time"}
+    ]
+    summary = store.ingest(batch)
+    assert summary["accepted"] == 4
+    assert summary["rejected"] == 3
+    assert [error["index"] for error in summary["errors"]] == [4, 5, 6]
+
+def test_non_finite_and_future_readings_are_rejected(store):
+    """
+    Tests that NaN, infinite and far-future values count as rejected instead of failing the batch.
+    """
+    batch = readings("sys-1", 1) + [
+        {"system_id": "sys-1", "timestamp": "inf"},
+        {"system_id": "sys-1", "timestamp": float("nan")},
+        {"system_id": "sys-1", "timestamp": 1e15},
+        {"system_id": "sys-1", "timestamp": -86400},
+        {"system_id": "sys-1", "timestamp": START + 60, "generation_wh": "nan"},
+        {"system_id": "sys-1", "timestamp": START + 120, "consumption_wh": "inf"}
+    ]
+    summary = store.ingest(batch)
+    assert summary["accepted"] == 4
+    assert summary["rejected"] == 6
+    assert "future" in summary["errors"][2]["error"]
+    assert store.series("sys-1", "hour")[0]["readings"] == 4
+
+def test_csv_and_ndjson_bodies_parse(store):
+    """
+    Tests that CSV and NDJSON uploads are parsed into readings.
+    """
+    csv_body = b"system_id,timestamp,generation_wh,consumption_wh\nsys-1,2026-03-01T00:00:00Z,120,40\nsys-1,2026-03-01T00:15:00,80,\n"
+    ndjson_body = b'{"system_id": "sys-2", "timestamp": 1772323200, "generation_wh": 5}\nnot json\n'
+
+    assert store.ingest(iter_telemetry_file(io.BytesIO(csv_body), "csv"))["accepted"] == 2
+    summary = store.ingest(iter_telemetry_file(io.BytesIO(ndjson_body), "ndjson"))
+    assert summary["accepted"] == 1
+    assert summary["rejected"] == 1
+    assert store.series("sys-1", "hour")[0]["generation_wh"] == 200
+
+def test_expired_raw_partitions_are_dropped(store, database):
+    """
+    Tests that retention drops whole monthly raw tables but keeps the rollups.
+    """
+    store.ingest(readings("sys-1", 1))
+    store.retention_days = 90
+    assert store.purge_raw(datetime(2026, 5, 1, tzinfo=timezone.utc).timestamp()) == []
+    assert store.purge_raw(datetime(2026, 9, 1, tzinfo=timezone.utc).timestamp()) == ["telemetry_202603"]
+
+    tables = {row["name"] for row in database.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "telemetry_202603" not in tables
+    assert store.series("sys-1", "day")[0]["readings"] == 4
+
+def test_systems_link_to_their_design(database, store):
+    """
+    Tests that a reading's calculation_id links the daily rows to the recorded calculation.
+    """
+    writer = CalculationWriter(database, flush_interval=0.05)
+    writer.record("calc-1", {"location": "Lagos", "budget": 1000000}, {"executive_summary": {}})
+    writer.flush(timeout=10)
+    writer.stop()
+
+    batch = readings("sys-1", 1)
+    batch[0]["calculation_id"] = "calc-1"
+    store.ingest(batch)
+
+    row = database.query(
+        "SELECT c.calculation_id FROM system_performance p JOIN user_calculations c ON c.id = p.user_calculation_id"
+    )
+    assert row == [{"calculation_id": "calc-1"}]
+
+def test_readings_outside_retention_are_rejected(database):
+    """
+    Tests that readings older than retention are rejected and that a partition purged elsewhere is recreated.
+    """
+    recent = [{"system_id": "sys-1", "timestamp": datetime.now(timezone.utc).isoformat(), "generation_wh": 10}]
+    store, other = TelemetryStore(database, retention_days=90), TelemetryStore(database, retention_days=90)
+    assert store.ingest(recent)["accepted"] == 1
+
+    summary = store.ingest(readings("sys-1", 1))
+    assert summary["accepted"] == 0
+    assert summary["rejected"] == 4
+    assert "retention" in summary["errors"][0]["error"]
+
+    other.purge_raw(datetime.now(timezone.utc).timestamp() + 400 * 86400)
+    recent[0]["timestamp"] = datetime.now(timezone.utc).timestamp() + 1
+    assert store.ingest(recent)["accepted"] == 1
+
+def test_body_that_is_not_a_list_is_refused():
+    """
+    Tests that a JSON body holding no list of readings raises instead of failing per item.
+    """
+    with pytest.raises(ValueError):
+        list(iter_telemetry_file(io.BytesIO(b'{"readings": 5}'), "json"))
+    with pytest.raises(ValueError):
+        list(iter_telemetry_file(io.BytesIO(b'42'), "json"))
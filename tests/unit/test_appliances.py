@@ -0,0 +1,47 @@
+import pytest
+from core.appliances import get_appliance_library, parse_hours_range
+
+@pytest.fixture
+def library():
+    """Provides the shared appliance library."""
+    return get_appliance_library()
+
+@pytest.mark.parametrize("text, expected", [
+    ("0.5–2", (0.5, 2.0)),
+    ("24", (24.0, 24.0)),
+    ("<1", (0.0, 1.0)),
+])
+def test_hours_ranges_are_parsed(text, expected):
+    """
+    Tests that textual hour ranges become numeric (min, max) pairs.
+    """
+    assert parse_hours_range(text) == expected
+
+def test_library_is_fully_populated(library):
+    """
+    Tests that continuation rows inherit their appliance and get numeric defaults.
+    """
+    assert len(library) == 397
+    assert library.df["appliance"].notna().all()
+
+    twin_tub = next(r for r in library.records if r["variant"] == "Semi-Automatic (Twin Tub)")
+    assert twin_tub["appliance"] == "Washing Machine"
+    assert twin_tub["power_rating"] == 450.0 and twin_tub["hours_per_day"] == 1.25
+    assert (library.df["surge_factor"] >= 1.0).all()
+
+def test_search_ranks_prefix_matches_and_tolerates_typos(library):
+    """
+    Tests that prefix queries hit name starts first and misspellings still match.
+    """
+    assert library.search("wash mach")[0]["appliance"] == "Washing Machine"
+    assert library.search("televsion")[0]["appliance"] == "Television"
+    assert all(r["category"] == "Refrigeration Appliances"
+               for r in library.search("refrig", category="refrigeration appliances"))
+    assert library.search("   ") == []
+
+def test_category_search_fills_the_limit_with_fuzzy_matches(library):
+    """
+    Tests that prefix matches outside the category do not crowd out fuzzy matches inside it.
+    """
+    results = library.search("workstations", limit=3, category="Office & Computing Devices")
+    assert [(r["appliance"], r["variant"]) for r in results] == [("Desktop PC", "Workstation (CAD/3D)")]
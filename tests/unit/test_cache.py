@@ -0,0 +1,85 @@
+import pytest
+from config.settings import settings
+from services.cache import StageCache
+from services.orchestrator import SolarSystemOrchestrator
+from agents.panel_sizing_agent import PanelSizingAgent
+
+@pytest.fixture
+def user_input():
+    """Provides a minimal valid calculation request."""
+    return {
+        "location": "Lagos",
+        "budget": 2000000,
+        "backup_hours": 8,
+        "appliances": [
+            {"appliance": "LED Light", "power_rating": 20, "hours_per_day": 6, "quantity": 4},
+            {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1}
+        ]
+    }
+
+def test_lru_eviction_and_hit_rate():
+    """
+    Tests that each stage is bounded by its own size limit and tracks hits and misses.
+    """
+    cache = StageCache(max_sizes={"panel_sizing": 2}, default_size=1)
+
+    cache.put("panel_sizing", "a", {"status": "success"})
+    cache.put("panel_sizing", "b", {"status": "success"})
+    assert cache.get("panel_sizing", "a") is not None
+    cache.put("panel_sizing", "c", {"status": "success"})  # evicts "b"
+
+    assert cache.get("panel_sizing", "b") is None
+    stats = cache.stats()["panel_sizing"]
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_cache_key_covers_only_declared_inputs():
+    """
+    Tests that an agent's cache key ignores fields it does not read.
+    """
+    agent = PanelSizingAgent()
+    data = {"daily_consumption_kwh": 4.32, "peak_sun_hours": 5.8, "budget": 100}
+
+    assert agent.cache_key(data) == agent.cache_key({**data, "budget": 999})
+    assert agent.cache_key(data) != agent.cache_key({**data, "peak_sun_hours": 6.0})
+
+def test_quantized_keys_match_near_identical_inputs():
+    """
+    Tests that quantization lets near-identical continuous inputs share a key.
+    """
+    agent = PanelSizingAgent()
+    data = {"daily_consumption_kwh": 4.32, "peak_sun_hours": 5.8}
+    nearby = {"daily_consumption_kwh": 4.29, "peak_sun_hours": 5.81}
+
+    assert agent.cache_key(data) != agent.cache_key(nearby)
+    assert agent.cache_key(data, quantize=True) == agent.cache_key(nearby, quantize=True)
+
+def test_quantized_stages_keep_the_request_coordinates(user_input, monkeypatch):
+    """
+    Tests that with quantized keys the results carry the request's coordinates, not their cell's.
+    """
+    monkeypatch.setattr(settings, "NASA_POWER_ENABLED", False)
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+    orchestrator.quantize_cache_keys = True
+    site = {**user_input, "latitude": 6.4531, "longitude": 3.3958}
+
+    for request in (site, {**site, "latitude": 6.4602}):
+        irradiance = next(event["result"] for event in orchestrator.iter_calculation(request)
+                          if event["stage"] == "irradiance")
+        assert (irradiance["latitude"], irradiance["longitude"]) == (request["latitude"], request["longitude"])
+    assert orchestrator.stage_cache.stats()["irradiance_agent"]["hits"] == 1
+
+def test_budget_change_reuses_sizing_and_matching(user_input):
+    """
+    Tests that changing only the budget hits the cache for every stage upstream of cost optimization.
+    """
+    orchestrator = SolarSystemOrchestrator(stage_cache=StageCache())
+
+    orchestrator.calculate_solar_system(user_input)
+    orchestrator.calculate_solar_system({**user_input, "budget": 2500000})
+
+    stats = orchestrator.stage_cache.stats()
+    for stage in ["load_calculator", "irradiance_agent", "panel_sizing", "battery_sizing", "component_matching"]:
+        assert stats[stage]["hits"] == 1
+    assert stats["cost_optimizer"]["hits"] == 0
@@ -0,0 +1,51 @@
+import pytest
+from core.catalog import decode_cursor, encode_cursor, get_catalog
+from core.exceptions import ValidationError
+
+@pytest.fixture
+def catalog():
+    """Provides the shared component catalog."""
+    return get_catalog()
+
+def test_raw_columns_are_normalized_to_schema_fields(catalog):
+    """
+    Tests that catalog frames expose the component schema columns the agents read.
+    """
+    assert {"model", "power_rating", "voltage", "price", "efficiency"} <= set(catalog.frame("panel").columns)
+    assert {"model", "capacity_ah", "voltage", "price"} <= set(catalog.frame("battery").columns)
+    assert {"model", "power_rating", "input_voltage", "price"} <= set(catalog.frame("inverter").columns)
+    assert {"model", "max_current", "voltage", "price"} <= set(catalog.frame("controller").columns)
+
+def test_query_matches_a_brute_force_filter(catalog):
+    """
+    Tests that indexed range, brand and sort queries agree with a pandas filter.
+    """
+    df = catalog.frame("panel")
+    expected = df[(df.power_rating >= 300) & (df.price <= 100000) & (df.brand.str.lower() == "trina solar")]
+
+    page = catalog.query("panel", ranges={"power": (300, None), "price": (None, 100000)},
+                         categories={"brand": ["TRINA SOLAR"]}, sort="price", limit=500)
+
+    assert page["total"] == len(expected)
+    assert [c["model"] for c in page["components"]] == list(expected.sort_values("price", kind="stable").model)
+
+def test_pagination_and_projection(catalog):
+    """
+    Tests that pages are contiguous and only the requested fields are returned.
+    """
+    first = catalog.query("inverter", sort="-power_rating", limit=10, fields=["model", "power_rating"])
+    second = catalog.query("inverter", sort="-power_rating", offset=first["next_offset"], limit=10,
+                           fields=["model", "power_rating"])
+
+    assert set(first["components"][0]) == {"model", "power_rating"}
+    assert first["components"][-1]["power_rating"] >= second["components"][0]["power_rating"]
+
+def test_cursor_is_bound_to_catalog_version():
+    """
+    Tests that cursors from another catalog version are rejected.
+    """
+    cursor = encode_cursor(50, "v1")
+
+    assert decode_cursor(cursor, "v1") == 50
+    with pytest.raises(ValidationError):
+        decode_cursor(cursor, "v2")
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from agents.component_matching_agent import ComponentMatchingAgent, required_inverter_watts
+from agents.load_calculator_agent import LoadCalculatorAgent
+from core.load_profile import LoadProfile, classify_appliance
+from core.utils import load_component_data
+
+APPLIANCES = [
+    {"appliance": "LED Bulb", "power_rating": 10, "hours_per_day": 6, "quantity": 4},
+    {"appliance": "Refrigerator", "power_rating": 150, "hours_per_day": 24, "quantity": 1},
+    {"appliance": "Air Conditioner", "power_rating": 1000, "hours_per_day": 8, "quantity": 1, "surge_factor": 3.0},
+]
+
+@pytest.mark.parametrize("name, category", [
+    ("LED TV", "electronics"),
+    ("LED Bulb", "lighting"),
+    ("Ceiling Fan", "cooling"),
+    ("Split unit air conditioner", "air_conditioning"),
+    ("Chest Freezer", "refrigeration"),
+    ("Sewing Machine", "other"),
+])
+def test_appliances_are_classified_by_keyword_order(name, category):
+    """
+    Tests that the precompiled matcher picks the first category in priority order.
+    """
+    assert classify_appliance(name) == category
+
+def test_profile_energy_matches_duty_cycled_totals():
+    """
+    Tests that the hourly curve integrates to the duty-cycled daily energy.
+    """
+    profile = LoadProfile(APPLIANCES)
+
+    expected_kwh = (10 * 4 * 6 + 150 * 0.4 * 24 + 1000 * 0.6 * 8) / 1000
+    assert profile.total_energy_kwh == pytest.approx(expected_kwh)
+    assert profile.hourly_w.sum() / 1000 == pytest.approx(expected_kwh)
+    assert profile.annual_hourly_w().shape == (8760,)
+
+def test_coincident_running_and_surge_peaks():
+    """
+    Tests that the coincident peak stays below the running peak, which surge raises by the largest start.
+    """
+    profile = LoadProfile(APPLIANCES)
+
+    assert profile.coincident_peak_w < profile.running_peak_w < profile.connected_load_w == 1190
+    assert profile.coincident_peak_w == pytest.approx(profile.hourly_w.max())
+    # The lights come on after the air conditioner's hours, so only it and the fridge overlap
+    assert profile.running_peak_w == 1150
+    assert profile.surge_peak_w == pytest.approx(profile.running_peak_w + 2000)
+    assert np.all(profile.hourly_w >= 60)  # the fridge never switches off
+
+def test_short_high_wattage_loads_size_the_inverter():
+    """
+    Tests that brief kitchen loads count at full power for the running peak and the inverter.
+    """
+    appliances = [
+        {"appliance": "Refrigerator", "power_rating": 200, "hours_per_day": 24, "quantity": 1},
+        {"appliance": "Microwave", "power_rating": 1200, "hours_per_day": 0.5, "quantity": 1},
+        {"appliance": "Electric Kettle", "power_rating": 2000, "hours_per_day": 0.25, "quantity": 1},
+        {"appliance": "LED Bulb", "power_rating": 10, "hours_per_day": 6, "quantity": 5},
+    ]
+    load = LoadCalculatorAgent().process({"appliances": appliances})
+    assert load["load_profile"]["coincident_peak_watts"] < 2000
+    assert load["peak_load_watts"] == 3400  # fridge, microwave and kettle in the same breakfast hour
+    assert load["surge_peak_watts"] == pytest.approx(3400 + 400)
+
+    single = LoadProfile([{"appliance": "Water Pump", "power_rating": 750, "hours_per_day": 0.1, "quantity": 2}])
+    assert single.surge_peak_w == pytest.approx(3 * 750 * 2)
+
+    inverters = ComponentMatchingAgent()._find_suitable_inverters(
+        load_component_data("inverter"), required_inverter_watts(load["peak_load_watts"], load["surge_peak_watts"]))
+    assert inverters and all(inverter["power_rating"] >= 3400 * 1.25 for inverter in inverters)
@@ -1,10 +1,30 @@
 import streamlit as st
 import requests
 import json
+import os
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Backend API the UI talks to; override with SOLAR_API_URL
+API_BASE_URL = os.environ.get("SOLAR_API_URL", "http://localhost:8000").rstrip("/")
+REQUEST_TIMEOUT = (3.05, 120)  # (connect, read) seconds
+CACHE_TTL_SECONDS = 3600
+
+# Progress labels for the streaming endpoint's stage events
+STAGE_LABELS = {
+    'validation': "Validated input",
+    'load_analysis': "Calculated load requirements",
+    'irradiance': "Fetched solar irradiance",
+    'panel_sizing': "Sized solar panels",
+    'battery_sizing': "Sized battery bank",
+    'configurations': "Matched compatible components",
+    'optimization': "Optimized cost",
+    'simulation': "Simulated a year of operation",
+    'report': "Generated report"
+}
 
 # Page config
 st.set_page_config(
@@ -43,6 +63,163 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+class CalculationError(Exception):
+    """The API could not produce a report (raised so failures are not cached)"""
+    pass
+
+@st.cache_resource
+def get_session():
+    """Keep-alive HTTP session shared by every rerun and browser session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.3, allowed_methods=["GET"])
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+def api_get(path, params=None):
+    """GET an API resource as JSON"""
+    response = get_session().get(f"{API_BASE_URL}{path}", params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner="Loading appliance library...")
+def load_appliance_library():
+    """Appliance library from the API, fetched once and shared by all sessions"""
+    payload = api_get("/api/v1/appliances")
+    return pd.DataFrame(payload['appliances']), payload['categories']
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_component_catalog(component_type):
+    """Model, brand, price and rating of every catalog component of one type, indexed by model"""
+    records, cursor = [], None
+    while True:
+        params = {'fields': 'model,brand,price,rating_score,rating_count', 'limit': 500}
+        if cursor:
+            params['cursor'] = cursor
+        page = api_get(f"/api/v1/components/{component_type}", params)
+        records.extend(page['components'])
+        cursor = page.get('next_cursor')
+        if not cursor:
+            break
+    return pd.DataFrame(records).drop_duplicates('model').set_index('model')
+
+def canonical_json(data):
+    """Stable serialization used as the cache key for an input"""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+
+@st.cache_data(show_spinner=False)
+def appliance_summary(appliances_json):
+    """Appliance table with daily energy, and its totals"""
+    appliance_df = pd.DataFrame(json.loads(appliances_json))
+    appliance_df['Daily Energy (kWh)'] = (
+        appliance_df['power_rating'] *
+        appliance_df['hours_per_day'] *
+        appliance_df['quantity']
+    ) / 1000
+    
+    total_power = (appliance_df['power_rating'] * appliance_df['quantity']).sum()
+    total_daily_energy = appliance_df['Daily Energy (kWh)'].sum()
+    return appliance_df, total_power, total_daily_energy
+
+def iter_sse(response):
+    """(event, data) pairs from a Server-Sent Events response"""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if event is not None:
+                yield event, json.loads("\n".join(data))
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=64, show_spinner=False)
+def calculate(input_json):
+    """
+    Run a calculation through the streaming endpoint, listing stages as they finish.
+    
+    Cached on the canonical input: reruns with unchanged inputs replay the
+    result (and its progress list) without contacting the API.
+    """
+    with st.status("Calculating optimal solar system...", expanded=True) as status:
+        with get_session().post(
+            f"{API_BASE_URL}/api/v1/calculate/stream",
+            params={'detail': 'standard'},
+            data=input_json,
+            headers={'Content-Type': 'application/json', 'Accept': 'text/event-stream'},
+            stream=True,
+            timeout=REQUEST_TIMEOUT
+        ) as response:
+            if response.status_code == 422:
+                raise CalculationError(f"Invalid input: {response.json().get('detail')}")
+            response.raise_for_status()
+            
+            result = None
+            for stage, data in iter_sse(response):
+                if data.pop('final', False):
+                    result = data
+                    break
+                status.write(f"✓ {STAGE_LABELS.get(stage, stage)}")
+        
+        if result is None or result.get('status') != 'success':
+            status.update(label="Calculation failed", state="error")
+            raise CalculationError((result or {}).get('error', 'No report returned'))
+        
+        status.write(f"✓ {STAGE_LABELS['report']}")
+        status.update(label="Calculation complete", state="complete", expanded=False)
+    return result
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=256, show_spinner=False)
+def quick_estimate(input_json):
+    """Surrogate-model estimates for an input, or None if the API has no model to answer with"""
+    try:
+        response = get_session().post(
+            f"{API_BASE_URL}/api/v1/calculate",
+            params={'quick': 'true'},
+            data=input_json,
+            headers={'Content-Type': 'application/json'},
+            timeout=REQUEST_TIMEOUT
+        )
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+def display_quick_estimate(estimate):
+    """Instant estimate metrics, each with its calibrated range"""
+    values = estimate['estimates']
+    st.subheader("⚡ Instant Estimate")
+    st.caption(f"From a model trained on full calculations: about {estimate['coverage']:.0%} of "
+               "full calculations fall inside the ranges shown. Calculate for the detailed design.")
+    if estimate['design_found_probability'] < 0.5:
+        st.warning("The catalog is unlikely to have compatible components for this load; "
+                   "the figures below show what the design would need.")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        cost = values['system_cost']
+        st.metric("System Cost", f"₦{cost['estimate']:,.0f}")
+        st.caption(f"₦{cost['lower']:,.0f} – ₦{cost['upper']:,.0f}")
+    with col2:
+        size = values['system_size_kw']
+        st.metric("Panel Capacity", f"{size['estimate']:.2f} kW")
+        st.caption(f"{size['lower']:.2f} – {size['upper']:.2f} kW")
+    with col3:
+        battery = values['battery_kwh']
+        st.metric("Battery Storage", f"{battery['estimate']:.1f} kWh")
+        st.caption(f"{battery['lower']:.1f} – {battery['upper']:.1f} kWh")
+    with col4:
+        ratio = values['self_sufficiency']
+        st.metric("Self-Sufficiency", f"{ratio['estimate']:.0%}")
+        st.caption(f"{ratio['lower']:.0%} – {ratio['upper']:.0%}")
+
 def main():
     # Header
     st.markdown("""
@@ -84,18 +261,11 @@ def main():
     # Main content area
     st.header("⚡ Appliance Selection")
     
-    # **LOAD YOUR APPLIANCE DATA HERE**
-    # Placeholder appliance data - replace with your actual data loading
-    sample_appliances = [
-        {"appliance": "LED Light", "power_rating": 20},
-        {"appliance": "Ceiling Fan", "power_rating": 75},
-        {"appliance": "Refrigerator", "power_rating": 150},
-        {"appliance": "TV (32 inch)", "power_rating": 100},
-        {"appliance": "Laptop", "power_rating": 65},
-        {"appliance": "Air Conditioner", "power_rating": 1500},
-        {"appliance": "Washing Machine", "power_rating": 500},
-        {"appliance": "Microwave", "power_rating": 1000}
-    ]
+    try:
+        library, categories = load_appliance_library()
+    except requests.RequestException as e:
+        st.error(f"Cannot reach the calculator API at {API_BASE_URL}: {e}")
+        return
     
     # Dynamic appliance input
     if 'appliances' not in st.session_state:
@@ -103,55 +273,46 @@ def main():
     
     # Add appliance form
     with st.expander("➕ Add Appliances", expanded=True):
+        category = st.selectbox("Category", ["All categories"] + categories)
+        options = library if category == "All categories" else library[library['category'] == category]
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            selected_appliance = st.selectbox(
-                "Select Appliance",
-                [app["appliance"] for app in sample_appliances]
-            )
+            selected_name = st.selectbox("Select Appliance", options['name'].tolist())
         
-        # Get power rating for selected appliance
-        power_rating = next(
-            (app["power_rating"] for app in sample_appliances 
-             if app["appliance"] == selected_appliance), 100
-        )
+        # Library defaults: midpoints of the typical power and usage ranges
+        selected = options[options['name'] == selected_name].iloc[0]
         
         with col2:
-            power_input = st.number_input("Power (W)", value=power_rating, min_value=1)
+            power_input = st.number_input("Power (W)", value=float(selected['power_rating']), min_value=1.0)
         
         with col3:
-            hours_input = st.number_input("Hours/Day", value=8.0, min_value=0.1, step=0.5)
+            hours_input = st.number_input("Hours/Day", value=float(selected['hours_per_day']),
+                                          min_value=0.1, max_value=24.0, step=0.5)
         
         with col4:
             quantity_input = st.number_input("Quantity", value=1, min_value=1)
         
         if st.button("Add Appliance"):
             st.session_state.appliances.append({
-                "appliance": selected_appliance,
+                "appliance": selected_name,
                 "power_rating": power_input,
                 "hours_per_day": hours_input,
-                "quantity": quantity_input
+                "quantity": quantity_input,
+                "surge_factor": float(selected['surge_factor'])
             })
     
     # Display added appliances
     if st.session_state.appliances:
         st.subheader("📋 Selected Appliances")
         
-        appliance_df = pd.DataFrame(st.session_state.appliances)
-        appliance_df['Daily Energy (kWh)'] = (
-            appliance_df['power_rating'] * 
-            appliance_df['hours_per_day'] * 
-            appliance_df['quantity']
-        ) / 1000
-        
+        appliance_df, total_power, total_daily_energy = appliance_summary(canonical_json(st.session_state.appliances))
         st.dataframe(appliance_df, use_container_width=True)
         
         # Summary metrics
         col1, col2, col3 = st.columns(3)
         
-        total_power = appliance_df['power_rating'].sum()
-        total_daily_energy = appliance_df['Daily Energy (kWh)'].sum()
         estimated_cost = total_daily_energy * 45 * 30  # ₦45/kWh * 30 days
         
         with col1:
@@ -166,82 +327,58 @@ def main():
             st.session_state.appliances = []
             st.rerun()
     
+    input_json = canonical_json({
+        "location": location,
+        "latitude": latitude,
+        "longitude": longitude,
+        "budget": budget,
+        "appliances": st.session_state.appliances,
+        "backup_hours": backup_hours,
+        "system_expansion": expansion_planned,
+        "priority": priority
+    })
+    
+    # Estimates follow every input change without running the full calculation
+    if location and st.session_state.appliances and budget > 0:
+        estimate = quick_estimate(input_json)
+        if estimate:
+            display_quick_estimate(estimate)
+    
     # Calculate button
     if st.button("🔍 Calculate Solar System", type="primary", use_container_width=True):
         if not location or not st.session_state.appliances:
             st.error("Please provide location and select at least one appliance")
         else:
-            with st.spinner("Calculating optimal solar system..."):
-                # Prepare input data
-                input_data = {
-                    "location": location,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "budget": budget,
-                    "appliances": st.session_state.appliances,
-                    "backup_hours": backup_hours,
-                    "system_expansion": expansion_planned,
-                    "priority": priority
-                }
-                
-                # **REPLACE WITH YOUR API CALL OR ORCHESTRATOR**
-                # For demo purposes, we'll simulate the calculation
-                result = simulate_calculation(input_data)
-                
-                if result.get('status') == 'success':
-                    display_results(result)
-                else:
-                    st.error(f"Calculation failed: {result.get('error', 'Unknown error')}")
+            st.session_state.calculated_input = input_json
+    
+    # Results stay on screen across reruns; unchanged inputs hit the cache
+    calculated_input = st.session_state.get('calculated_input')
+    if calculated_input:
+        if calculated_input != input_json:
+            st.info("Inputs have changed since this calculation. Calculate again to update the results.")
+        try:
+            result = calculate(calculated_input)
+        except CalculationError as e:
+            st.error(f"Calculation failed: {e}")
+        except requests.RequestException as e:
+            st.error(f"Calculation failed: cannot reach the calculator API ({e})")
+        else:
+            display_results(result)
 
-def simulate_calculation(input_data):
-    """Simulate calculation results - REPLACE WITH ACTUAL API CALL"""
-    # This is a placeholder - replace with actual orchestrator call
-    # or API request to your FastAPI backend
-    
-    total_daily_energy = sum(
-        (app['power_rating'] * app['hours_per_day'] * app['quantity']) / 1000 
-        for app in input_data['appliances']
-    )
-    
-    # Simulated results
-    return {
-        'status': 'success',
-        'executive_summary': {
-            'recommended_system_cost': input_data['budget'] * 0.8,
-            'daily_energy_needs': total_daily_energy,
-            'projected_annual_savings': 240000,
-            'payback_period': 6.5,
-            'key_benefits': [
-                'Reduce electricity costs by ₦240,000 annually',
-                f'Meet {total_daily_energy:.1f} kWh daily energy needs',
-                'Reduce carbon footprint by 2.1 tons CO2/year',
-                'Energy independence from grid instability'
-            ]
-        },
-        'technical_details': {
-            'solar_panels': {
-                'model': 'Sample 400W Panel',
-                'total_capacity': 2400,
-                'number_needed': 6
-            },
-            'battery_system': {
-                'model': 'Sample 200Ah Battery',
-                'total_capacity_ah': 400,
-                'number_needed': 2
-            },
-            'inverter': {
-                'model': 'Sample 3000W Inverter',
-                'power_rating': 3000
-            }
-        },
-        'financial_analysis': {
-            'initial_investment': input_data['budget'] * 0.8,
-            'annual_savings_year_1': 240000,
-            'payback_period_years': 6.5,
-            'roi_percentage': 15.4,
-            'net_savings_25_years': 4800000
-        }
-    }
+def component_rating(component_type, model):
+    """Catalog brand and feedback rating line for a component ('' if unknown)"""
+    try:
+        catalog = load_component_catalog(component_type)
+    except requests.RequestException:
+        return ""
+    if model not in catalog.index:
+        return ""
+    
+    component = catalog.loc[model]
+    brand = component.get('brand') or 'Unknown brand'
+    if component.get('rating_count'):
+        return f"{brand} · ★ {component['rating_score']:.1f} ({component['rating_count']} ratings)"
+    return f"{brand} · not yet rated"
 
 def display_results(result):
     """Display calculation results"""
@@ -276,7 +413,7 @@ def display_results(result):
     with col4:
         st.metric(
             "Payback Period",
-            f"{summary.get('payback_period', 0):.1f} years"
+            f"{summary.get('payback_period') or 0:.1f} years"
         )
     
     # Key Benefits
@@ -296,18 +433,21 @@ def display_results(result):
         st.subheader("Solar Panels")
         panel_info = technical.get('solar_panels', {})
         st.write(f"**Model:** {panel_info.get('model', 'N/A')}")
+        st.caption(component_rating('panel', panel_info.get('model')))
         st.write(f"**Total Capacity:** {panel_info.get('total_capacity', 0):,} W")
         st.write(f"**Number Needed:** {panel_info.get('number_needed', 0)}")
         
         st.subheader("Inverter")
         inverter_info = technical.get('inverter', {})
         st.write(f"**Model:** {inverter_info.get('model', 'N/A')}")
+        st.caption(component_rating('inverter', inverter_info.get('model')))
         st.write(f"**Power Rating:** {inverter_info.get('power_rating', 0):,} W")
     
     with col2:
         st.subheader("Battery System")
         battery_info = technical.get('battery_system', {})
         st.write(f"**Model:** {battery_info.get('model', 'N/A')}")
+        st.caption(component_rating('battery', battery_info.get('model')))
         st.write(f"**Total Capacity:** {battery_info.get('total_capacity_ah', 0)} Ah")
         st.write(f"**Number Needed:** {battery_info.get('number_needed', 0)}")
     
@@ -324,28 +464,15 @@ def display_results(result):
         st.metric("ROI Percentage", f"{financial.get('roi_percentage', 0):.1f}%")
     
     with col2:
-        st.metric("Payback Period", f"{financial.get('payback_period_years', 0):.1f} years")
+        st.metric("Payback Period", f"{financial.get('payback_period_years') or 0:.1f} years")
         st.metric("Net Savings (25 years)", f"₦{financial.get('net_savings_25_years', 0):,.0f}")
     
     # Savings Chart
     st.subheader("📈 Cumulative Savings Projection")
     
-    # Generate 25-year projection
-    years = list(range(1, 26))
-    annual_savings = financial.get('annual_savings_year_1', 240000)
-    initial_cost = financial.get('initial_investment', 400000)
-    
-    cumulative_savings = []
-    for year in years:
-        inflation_factor = 1.05 ** year  # 5% annual inflation
-        yearly_savings = annual_savings * inflation_factor
-        
-        if year == 1:
-            cumulative = yearly_savings - initial_cost
-        else:
-            cumulative = cumulative_savings[-1] + yearly_savings
-        
-        cumulative_savings.append(cumulative)
+    # 25-year projection computed by the API's report
+    cumulative_savings = financial.get('cumulative_savings', [])
+    years = list(range(1, len(cumulative_savings) + 1))
     
     # Create chart
     fig = go.Figure()
@@ -357,7 +484,7 @@ def display_results(result):
         line=dict(color='#2ecc71', width=3)
     ))
     
-    fig.add_hline(y=0, line_dash="dash", line_color="red", 
+    fig.add_hline(y=0, line_dash="dash", line_color="red",
                   annotation_text="Break-even point")
     
     fig.update_layout(
@@ -370,14 +497,12 @@ def display_results(result):
     st.plotly_chart(fig, use_container_width=True)
     
     # Download report button
-    if st.button("📥 Download Detailed Report"):
-        report_json = json.dumps(result, indent=2)
-        st.download_button(
-            label="Download Report (JSON)",
-            data=report_json,
-            file_name=f"solar_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
-        )
+    st.download_button(
+        label="📥 Download Detailed Report (JSON)",
+        data=json.dumps(result, indent=2),
+        file_name=f"solar_report_{result.get('calculation_id', datetime.now().strftime('%Y%m%d_%H%M%S'))}.json",
+        mime="application/json"
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()